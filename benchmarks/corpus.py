@@ -0,0 +1,99 @@
+"""合成测试语料：生成不同尺寸、页数和DPI的“扫描件”PDF与图片
+
+页面内容由随机种子决定，同样的参数每次生成相同的文件，便于在不同版本之间对比。
+
+用法:
+    python -m benchmarks.corpus corpus/                          # 默认语料
+    python -m benchmarks.corpus corpus/ --dpi 150 300 --pages 1 20 --images 4
+"""
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+PAPER_INCHES = {"a4": (8.27, 11.69), "letter": (8.5, 11.0), "a3": (11.69, 16.54)}
+DEFAULT_DPIS = (150, 200, 300)
+DEFAULT_PAGES = (1, 10)
+DEFAULT_IMAGES = 2  # 每种DPI生成的图片数（PNG 和 JPEG 交替）
+
+
+def paper_size(paper, dpi):
+    """纸张在给定DPI下的像素尺寸 (宽, 高)"""
+    width, height = PAPER_INCHES[paper]
+    return int(width * dpi), int(height * dpi)
+
+
+def make_synthetic_page(index, size=(1654, 2339), shading=0.0):
+    """生成一页“扫描件”灰度图（带噪声的文字行），默认 A4 @ 200 DPI
+
+    shading > 0 时叠加从左上到右下变暗的光照（0.3 表示右下角暗30%）。
+    """
+    width, height = size
+    scale = width / 1654  # 文字行高和字宽随分辨率缩放
+    line, glyph = max(4, int(48 * scale)), max(3, int(36 * scale))
+    margin = int(150 * scale)
+    rng = np.random.default_rng(index)
+    page = rng.normal(240, 6, (height, width)).clip(0, 255).astype(np.uint8)
+    for row in range(int(120 * scale), height - int(120 * scale), line):
+        right = width - margin - int((row * 7 + index * 31) % 400 * scale)
+        for left in range(margin, right, glyph):
+            cv2.rectangle(page, (left, row), (min(left + int(glyph * 0.73), right), row + int(line * 0.46)), 40, -1)
+    if shading:
+        ys = np.linspace(0.0, 0.5, height, dtype=np.float32)[:, None]
+        xs = np.linspace(0.0, 0.5, width, dtype=np.float32)[None, :]
+        page = (page * (1.0 - shading * (ys + xs))).astype(np.uint8)
+    return page
+
+
+def make_scan_pdf(path, pages, dpi=200, paper="a4", seed=0):
+    """多页扫描件PDF：每页是一张 JPEG 压缩的灰度图像（与扫描仪输出的PDF相同），奇数页光照不均"""
+    from PIL import Image
+
+    size = paper_size(paper, dpi)
+    images = [Image.fromarray(make_synthetic_page(seed + i, size, shading=0.3 if i % 2 else 0.0))
+              for i in range(pages)]
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=dpi)
+
+
+def make_scan_image(path, dpi=200, paper="a4", seed=0):
+    """单页扫描图片，格式由扩展名决定"""
+    gray = make_synthetic_page(seed, paper_size(paper, dpi), shading=0.3)
+    cv2.imwrite(path, cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+
+
+def generate(directory, dpis=DEFAULT_DPIS, pages=DEFAULT_PAGES, images=DEFAULT_IMAGES, paper="a4"):
+    """在 directory 中生成语料，返回生成的文件路径列表（已存在的文件不再重新生成）"""
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for dpi in dpis:
+        for page_count in pages:
+            path = os.path.join(directory, f"scan_{paper}_{dpi}dpi_{page_count}p.pdf")
+            if not os.path.exists(path):
+                make_scan_pdf(path, page_count, dpi, paper, seed=dpi + page_count)
+            files.append(path)
+        for i in range(images):
+            ext = ".png" if i % 2 == 0 else ".jpg"
+            path = os.path.join(directory, f"scan_{paper}_{dpi}dpi_{i + 1}{ext}")
+            if not os.path.exists(path):
+                make_scan_image(path, dpi, paper, seed=dpi + i)
+            files.append(path)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="输出目录")
+    parser.add_argument("--dpi", type=int, nargs="+", default=list(DEFAULT_DPIS), help="页面分辨率列表")
+    parser.add_argument("--pages", type=int, nargs="*", default=list(DEFAULT_PAGES), help="PDF页数列表")
+    parser.add_argument("--images", type=int, default=DEFAULT_IMAGES, help="每种DPI的图片数")
+    parser.add_argument("--paper", choices=list(PAPER_INCHES), default="a4")
+    args = parser.parse_args(argv)
+
+    files = generate(args.directory, args.dpi, args.pages, args.images, args.paper)
+    total = sum(os.path.getsize(f) for f in files)
+    print(f"已生成 {len(files)} 个文件（{total / 1024 / 1024:.1f}MB）: {os.path.abspath(args.directory)}")
+
+
+if __name__ == "__main__":
+    main()
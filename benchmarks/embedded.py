@@ -0,0 +1,80 @@
+"""扫描件PDF基准：直接解码嵌入图像对比 pdftoppm 栅格化
+
+对合成的扫描件PDF（每页一张 JPEG，扫描分辨率 --scan-dpi）或指定的PDF，按 --dpi 依次取出全部灰度页，
+报告两条路径的页/秒，以及阈值处理后两者结果不同的像素比例（重采样方式不同带来的差异）。
+
+用法:
+    python -m benchmarks.embedded                       # 合成 20 页，扫描 300 DPI，输出 200 DPI
+    python -m benchmarks.embedded --scan-dpi 200        # 扫描分辨率与 --dpi 相同，不做重采样
+    python -m benchmarks.embedded scan.pdf --json embedded.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import engine
+import perf
+from benchmarks import corpus
+from benchmarks.pipeline import git_version
+
+
+def run(file_path, page_count, dpi, embedded_images):
+    """取出全部页面，返回 (秒数, {页码: 阈值结果}, 计时器)"""
+    timer = perf.StageTimer()
+    results = {}
+    start = time.perf_counter()
+    for i, gray in engine.iter_pdf_gray_pages(file_path, page_count, dpi=dpi, timer=timer,
+                                              embedded_images=embedded_images):
+        results[i] = engine.apply_threshold(gray, engine.DEFAULT_THRESHOLD, out=gray)
+    return time.perf_counter() - start, results, timer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", nargs="?", help="要测试的PDF（默认生成合成PDF）")
+    parser.add_argument("--pages", type=int, default=20, help="合成PDF的页数")
+    parser.add_argument("--scan-dpi", type=int, default=300, help="合成PDF的扫描分辨率")
+    parser.add_argument("--dpi", type=int, default=200, help="输出分辨率")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        file_path = args.pdf
+        if not file_path:
+            file_path = os.path.join(work_dir, "scan.pdf")
+            corpus.make_scan_pdf(file_path, args.pages, args.scan_dpi)
+        page_count = engine.pdf_page_count(file_path)
+        direct_s, direct, timer = run(file_path, page_count, args.dpi, True)
+        raster_s, rasterized, _ = run(file_path, page_count, args.dpi, False)
+
+    counters = timer.summary()["counters"]
+    embedded_pages = counters.get("embedded_pages", 0)
+    diffs = [float(np.mean(direct[i] != rasterized[i])) for i in direct if direct[i].shape == rasterized[i].shape]
+    print(f"{page_count} 页，输出 {args.dpi} DPI；直接解码 {embedded_pages} 页，栅格化 {page_count - embedded_pages} 页")
+    print(f"嵌入图像直接解码: {direct_s:.2f}s  {page_count / direct_s:.2f} 页/秒")
+    print(f"pdftoppm 栅格化:  {raster_s:.2f}s  {page_count / raster_s:.2f} 页/秒  （{raster_s / direct_s:.1f} 倍耗时）")
+    if diffs:
+        print(f"阈值结果不同的像素: 平均 {np.mean(diffs):.3%}  最多 {max(diffs):.3%}")
+    if len(diffs) != len(direct):
+        print(f"{len(direct) - len(diffs)} 页尺寸不同，未比较", file=sys.stderr)
+
+    if args.json:
+        report = {"version": git_version(), "pages": page_count, "dpi": args.dpi, "embedded_pages": embedded_pages,
+                  "direct_s": direct_s, "rasterize_s": raster_s,
+                  "pixel_diff_mean": float(np.mean(diffs)) if diffs else None,
+                  "pixel_diff_max": max(diffs) if diffs else None,
+                  "fallbacks": {name[len(perf.FALLBACK_PREFIX):]: value for name, value in counters.items()
+                                if name.startswith(perf.FALLBACK_PREFIX)}}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""输出编码基准：各输出格式的文件大小和编码耗时
+
+用法:
+    python -m benchmarks.encoders
+    python -m benchmarks.encoders --pages 20 --threshold 180
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import encoders
+import engine
+from benchmarks.corpus import make_synthetic_page
+
+
+def encode_pages(fmt, pages, output_dir, dpi):
+    """编码全部页面，返回输出总字节数"""
+    if encoders.is_container(fmt):
+        file_path = os.path.join(output_dir, "bench" + encoders.format_extension(fmt))
+        with encoders.open_container(fmt, file_path, dpi) as writer:
+            for page in pages:
+                writer.add_page(page)
+        return os.path.getsize(file_path)
+    total = 0
+    for page in pages:
+        total += len(encoders.encode_page(fmt, page, ".png", dpi))
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=10, help="合成页面数")
+    parser.add_argument("--threshold", type=int, default=engine.DEFAULT_THRESHOLD, help="阈值")
+    parser.add_argument("--dpi", type=int, default=engine.DEFAULT_DPI)
+    args = parser.parse_args(argv)
+
+    pages = [engine.apply_threshold(make_synthetic_page(i), args.threshold) for i in range(args.pages)]
+    raw = sum(page.nbytes for page in pages)
+    print(f"页数: {args.pages}  未压缩: {raw / 1024 / 1024:.1f}MB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = None
+        for fmt in encoders.OUTPUT_FORMATS:
+            start = time.perf_counter()
+            size = encode_pages(fmt, pages, tmp, args.dpi)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or size
+            print(f"{fmt:<11} {size / 1024:10.1f}KB  {size / baseline:6.1%}  "
+                  f"{elapsed * 1000 / args.pages:7.1f}ms/页")
+
+
+if __name__ == "__main__":
+    main()
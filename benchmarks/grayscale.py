@@ -0,0 +1,112 @@
+"""灰度转换基准：旧的 RGB→numpy→BGR→灰度 路径对比直接输出灰度并原地阈值处理
+
+对每页报告耗时和 numpy/OpenCV 分配峰值（tracemalloc；PIL 内部的解码缓冲不计入，
+旧路径的实际占用还要再加一份RGB整页）。峰值以灰度整页大小为单位（“帧”）。
+
+用法:
+    python -m benchmarks.grayscale                 # 合成页面（模拟 pdftoppm 输出的 PPM/PGM 和 PNG 图片）
+    python -m benchmarks.grayscale scan.pdf        # 真实PDF（需要 poppler）
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import engine
+from benchmarks.corpus import make_synthetic_page
+
+
+def legacy_from_pil(page, threshold_value):
+    """旧实现：PIL(RGB) -> np.array -> 翻转并复制为BGR -> 灰度 -> 阈值"""
+    bgr = np.array(page)[:, :, ::-1].copy()
+    return engine.apply_threshold(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), threshold_value)
+
+
+def legacy_ppm(path, threshold_value):
+    from PIL import Image
+    with Image.open(path) as page:
+        page.load()
+        return legacy_from_pil(page, threshold_value)
+
+
+def direct_pgm(path, threshold_value):
+    """新实现：解码为单通道后原地阈值处理"""
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    return engine.apply_threshold(gray, threshold_value, out=gray)
+
+
+def legacy_image(path, threshold_value):
+    return engine.apply_threshold(engine.to_gray(cv2.imread(path)), threshold_value)
+
+
+def legacy_pdf(path, threshold_value, dpi):
+    for _, page in engine.iter_pdf_pages(path, dpi=dpi):
+        legacy_from_pil(page, threshold_value)
+
+
+def direct_pdf(path, threshold_value, dpi):
+    for _, gray in engine.iter_pdf_gray_pages(path, dpi=dpi):
+        engine.apply_threshold(gray, threshold_value, out=gray)
+
+
+def measure(func, *args, repeat=1):
+    """返回 (最快耗时, 分配峰值字节)；计时不开启 tracemalloc，避免其开销影响结果"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def report(label, legacy, direct, frame_bytes, pages=1):
+    (old_time, old_peak), (new_time, new_peak) = legacy, direct
+    print(f"{label}")
+    print(f"  旧: {old_time * 1000 / pages:7.1f}ms/页  峰值 {old_peak / frame_bytes:4.1f} 帧")
+    print(f"  新: {new_time * 1000 / pages:7.1f}ms/页  峰值 {new_peak / frame_bytes:4.1f} 帧  "
+          f"加速 {old_time / new_time:.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", nargs="?", help="要测试的PDF（默认只测试合成页面）")
+    parser.add_argument("--threshold", type=int, default=engine.DEFAULT_THRESHOLD, help="阈值")
+    parser.add_argument("--dpi", type=int, default=engine.DEFAULT_DPI)
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快一次")
+    args = parser.parse_args(argv)
+
+    gray = make_synthetic_page(0)
+    frame_bytes = gray.nbytes
+    bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    with tempfile.TemporaryDirectory() as tmp:
+        ppm, pgm, png = (os.path.join(tmp, "page" + ext) for ext in (".ppm", ".pgm", ".png"))
+        cv2.imwrite(ppm, bgr)
+        cv2.imwrite(pgm, gray)
+        cv2.imwrite(png, bgr)
+
+        report("PDF页面（pdftoppm 输出的 PPM -> 灰度PGM）",
+               measure(legacy_ppm, ppm, args.threshold, repeat=args.repeat),
+               measure(direct_pgm, pgm, args.threshold, repeat=args.repeat), frame_bytes)
+        report("图片（PNG，IMREAD_COLOR -> IMREAD_GRAYSCALE）",
+               measure(legacy_image, png, args.threshold, repeat=args.repeat),
+               measure(direct_pgm, png, args.threshold, repeat=args.repeat), frame_bytes)
+
+    if args.pdf:
+        pages = engine.pdf_page_count(args.pdf)
+        legacy = measure(legacy_pdf, args.pdf, args.threshold, args.dpi)
+        direct = measure(direct_pdf, args.pdf, args.threshold, args.dpi)
+        first = next(engine.iter_pdf_gray_pages(args.pdf, last_page=1, dpi=args.dpi))[1]
+        report(f"{os.path.basename(args.pdf)}（{pages}页，含栅格化）", legacy, direct, first.nbytes, pages)
+
+
+if __name__ == "__main__":
+    main()
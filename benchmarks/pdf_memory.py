@@ -0,0 +1,49 @@
+"""流式PDF管线的峰值内存基准：不同页数的文档在独立进程中处理，对比峰值RSS
+
+用法:
+    python -m benchmarks.pdf_memory --pages 10 50 200
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import engine
+import perf
+from benchmarks.pdf_render import make_synthetic_pdf
+
+
+def run_child(file_path, output_dir):
+    """子进程：处理一个PDF并输出 页数 耗时 峰值内存"""
+    page_count = engine.pdf_page_count(file_path)
+    start = time.perf_counter()
+    engine.process_file(file_path, page_count, output_dir, engine.BatchOptions())
+    print(page_count, time.perf_counter() - start, perf.peak_rss_bytes() or 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200], help="合成PDF的页数列表")
+    parser.add_argument("--child", nargs=2, metavar=("PDF", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            file_path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            make_synthetic_pdf(file_path, pages)
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.pdf_memory", "--child", file_path, os.path.join(tmp, "out")],
+                check=True, capture_output=True, text=True
+            )
+            page_count, elapsed, peak = result.stdout.split()
+            print(f"{page_count:>5} 页  {float(elapsed):7.2f}s  峰值内存 {perf.format_bytes(int(peak))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""PDF栅格化基准：旧的“先整本转换取页数 + 每页一个 pdftoppm”对比单遍分块转换
+
+用法:
+    python -m benchmarks.pdf_render                    # 生成 30 页的测试PDF
+    python -m benchmarks.pdf_render scan.pdf --repeat 3
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import engine
+
+
+def make_synthetic_pdf(path, pages, size=(1654, 2339)):
+    """用PIL生成多页“扫描件”PDF（默认 A4 @ 200 DPI）"""
+    from PIL import Image, ImageDraw
+
+    images = []
+    for i in range(pages):
+        img = Image.new("RGB", size, (245, 243, 238))
+        draw = ImageDraw.Draw(img)
+        for row in range(120, size[1] - 120, 48):
+            draw.rectangle([150, row, size[0] - 150 - (row * 7 + i * 31) % 400, row + 22], fill=(40, 40, 40))
+        images.append(img)
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=200)
+
+
+def render_legacy(file_path):
+    """旧实现：整本转换一次只为取页数，再逐页各转换一次"""
+    total_pages = len(engine.convert_from_path(file_path))
+    for i in range(total_pages):
+        engine.convert_from_path(file_path, first_page=i + 1, last_page=i + 1)[0]
+    return total_pages
+
+
+def render_single_pass(file_path):
+    """新实现：pdfinfo 取页数，分块单遍转换"""
+    total_pages = engine.pdf_page_count(file_path)
+    for _ in engine.iter_pdf_pages(file_path, total_pages):
+        pass
+    return total_pages
+
+
+def best_of(func, file_path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = func(file_path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return pages, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", nargs="?", help="要测试的PDF（默认生成合成PDF）")
+    parser.add_argument("--pages", type=int, default=30, help="合成PDF的页数")
+    parser.add_argument("--repeat", type=int, default=1, help="重复次数，取最快一次")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = args.pdf
+        if file_path is None:
+            file_path = os.path.join(tmp, "synthetic.pdf")
+            make_synthetic_pdf(file_path, args.pages)
+
+        pages, legacy = best_of(render_legacy, file_path, args.repeat)
+        _, single = best_of(render_single_pass, file_path, args.repeat)
+
+    print(f"页数: {pages}")
+    print(f"旧实现（N+1 次转换）: {legacy:.2f}s  {pages / legacy:.2f} 页/秒")
+    print(f"单遍分块转换:         {single:.2f}s  {pages / single:.2f} 页/秒")
+    print(f"加速比: {legacy / single:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""处理管线基准：在合成语料上分阶段计时，报告吞吐量、延迟分位数和峰值内存
+
+每个输入文件在独立的子进程中用 engine.process_file 处理（与批量处理相同的代码路径），峰值RSS互不影响。
+阶段计时来自 BatchOptions.timer（perf.StageTimer）：rasterize（pdftoppm 栅格化）、gray（解码为灰度）、
+threshold、encode、write；每页的延迟是该页各阶段耗时之和（分块栅格化的耗时计入块内第一页）。
+--json 输出机器可读的结果（含版本号），用于跟踪不同版本之间的性能变化。
+
+用法:
+    python -m benchmarks.pipeline                              # 临时生成默认语料
+    python -m benchmarks.pipeline --corpus corpus/ --json bench.json
+    python -m benchmarks.pipeline --corpus-dpi 300 --pages 50 --images 0 -m sauvola -f tiff-g4
+    python -m benchmarks.pipeline --queue-size 0                # 关闭流水线，与逐页串行处理对比
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import encoders
+import engine
+import perf
+import pipeline
+import thresholds
+from benchmarks import corpus
+
+
+def run_child(file_path, output_dir, options_json):
+    """子进程：处理一个文件，输出一行JSON结果"""
+    params = json.loads(options_json)
+    options = engine.BatchOptions(params["threshold"], render_threads=params["render_threads"], dpi=params["dpi"],
+                                  output_format=params["format"], threshold_method=params["method"],
+                                  block_size=params["block_size"], queue_size=params["queue_size"])
+    options.timer = timer = perf.StageTimer()
+    os.makedirs(output_dir, exist_ok=True)
+    page_count = engine.file_page_count(file_path)
+    start = time.perf_counter()
+    engine.process_file(file_path, page_count, output_dir, options)
+    wall = time.perf_counter() - start
+
+    result = timer.summary()
+    result["wall_seconds"] = wall
+    result["pages_per_sec"] = result["pages"] / wall if wall else None
+    result["peak_rss_bytes"] = perf.peak_rss_bytes()
+    print(json.dumps(result))
+
+
+def git_version():
+    """当前代码版本（git describe），不在 git 仓库中时返回 None"""
+    try:
+        result = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def run_case(file_path, output_dir, params):
+    """在子进程中处理一个文件，失败时返回 None 并输出错误"""
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.pipeline", "--child", file_path, output_dir, json.dumps(params)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()
+        print(f"{os.path.basename(file_path)}: 处理失败 {error[-1] if error else ''}", file=sys.stderr)
+        return None
+    case = json.loads(result.stdout.strip().splitlines()[-1])
+    case["file"] = os.path.basename(file_path)
+    case["bytes"] = os.path.getsize(file_path)
+    return case
+
+
+def print_case(case):
+    stages = case["stages"]
+    total = sum(stages.values()) or 1
+    shares = " ".join(f"{name} {stages.get(name, 0) / total:4.0%}" for name in perf.STAGES)
+    print(f"{case['file']:<30} {case['pages']:>4} 页 {case['wall_seconds']:7.2f}s {case['pages_per_sec']:7.2f} 页/秒  "
+          f"p50 {case['p50_ms']:7.1f}ms  p95 {case['p95_ms']:7.1f}ms  "
+          f"峰值 {perf.format_bytes(case['peak_rss_bytes'])}  [{shares}]")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="语料目录（不存在的文件按下面的参数生成；默认使用临时目录）")
+    parser.add_argument("--corpus-dpi", type=int, nargs="+", default=list(corpus.DEFAULT_DPIS),
+                        help="生成语料的页面分辨率列表")
+    parser.add_argument("--pages", type=int, nargs="*", default=list(corpus.DEFAULT_PAGES), help="生成的PDF页数列表")
+    parser.add_argument("--images", type=int, default=corpus.DEFAULT_IMAGES, help="每种DPI生成的图片数")
+    parser.add_argument("--dpi", type=engine.resolve_dpi, default=engine.DEFAULT_DPI, help="PDF栅格化分辨率")
+    parser.add_argument("-t", "--threshold", type=int, default=engine.DEFAULT_THRESHOLD)
+    parser.add_argument("-m", "--method", choices=list(thresholds.METHODS), default=thresholds.DEFAULT_METHOD)
+    parser.add_argument("--block-size", type=int, default=thresholds.DEFAULT_BLOCK_SIZE)
+    parser.add_argument("-f", "--format", choices=list(encoders.OUTPUT_FORMATS), default=encoders.DEFAULT_FORMAT)
+    parser.add_argument("--render-threads", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=pipeline.DEFAULT_QUEUE_SIZE,
+                        help="流水线队列容量，0 为逐页串行（用于对比）")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    parser.add_argument("--child", nargs=3, metavar=("FILE", "OUTPUT", "OPTIONS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    params = {"threshold": args.threshold, "render_threads": args.render_threads, "dpi": args.dpi,
+              "format": args.format, "method": args.method, "block_size": args.block_size,
+              "queue_size": args.queue_size}
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = args.corpus or os.path.join(tmp, "corpus")
+        files = corpus.generate(corpus_dir, args.corpus_dpi, args.pages, args.images)
+        cases = []
+        for file_path in files:
+            case = run_case(file_path, os.path.join(tmp, "output"), params)
+            if case is None:
+                continue
+            print_case(case)
+            cases.append(case)
+
+    pages = sum(case["pages"] for case in cases)
+    wall = sum(case["wall_seconds"] for case in cases)
+    print(f"合计: {pages} 页 {wall:.2f}s {pages / wall if wall else 0:.2f} 页/秒")
+
+    if args.json:
+        report = {
+            "version": git_version(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "options": params,
+            "totals": {"pages": pages, "wall_seconds": wall, "pages_per_sec": pages / wall if wall else None},
+            "cases": cases,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
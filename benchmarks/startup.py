@@ -0,0 +1,126 @@
+"""界面启动基准：导入 main（创建窗口之前的全部导入）的耗时，以及后台导入较慢模块的耗时
+
+每次测量启动一个新的 Python 进程（-X importtime），取最快一次。导入 main 时不应加载
+OpenCV、numpy、Pillow 或 pdf2image（见 main.load_modules），加载了其中任何一个时以状态码1退出；
+--max-ms 另外限制导入 main 的耗时，用于防止启动变慢。
+
+用法:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 10 --max-ms 300 --json startup.json
+    python -m benchmarks.startup --window          # 同时测量到窗口显示的时间（需要图形界面）
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.pipeline import git_version
+
+HEAVY_MODULES = ("cv2", "numpy", "PIL", "pdf2image")  # 创建窗口之前不应导入的模块
+TOP_IMPORTS = 8  # 报告耗时最多的几个导入
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中运行：分别计时导入 main、后台导入和（可选）创建并显示窗口
+CHILD_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+heavy = [name for name in {heavy!r} if name in sys.modules]
+window = None
+if {window!r}:
+    root = main.TkinterDnD.Tk()
+    app = main.ThresholdGUI(root)
+    root.update()
+    window = time.perf_counter() - start
+    root.destroy()
+loading = time.perf_counter()
+getattr(main, "load_modules", lambda: None)()  # 旧版本没有 load_modules，便于比较
+print(json.dumps({{"import_main": imported - start, "load_modules": time.perf_counter() - loading,
+                  "window": window, "heavy": heavy}}))
+"""
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 的输出，返回 [(模块, 自身微秒, 累计微秒, 缩进层级)]"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), level))
+    return entries
+
+
+def measure_once(window=False):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             CHILD_CODE.format(heavy=HEAVY_MODULES, window=window)],
+                            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "子进程失败")
+    timing = json.loads(result.stdout.strip().splitlines()[-1])
+    # main 之前的导入是解释器启动本身；main 之后的是 load_modules 或创建窗口导入的
+    entries = parse_importtime(result.stderr)
+    names = [entry[0] for entry in entries]
+    end = names.index("main") if "main" in names else len(entries)
+    start = end
+    while start > 0 and entries[start - 1][3] > 0:
+        start -= 1
+    # main 直接导入的模块（-X importtime 按导入完成的顺序输出，子模块在 main 之前）
+    timing["top_imports"] = sorted(((name, cumulative) for name, _, cumulative, level in entries[start:end]
+                                    if level == 1), key=lambda item: -item[1])[:TOP_IMPORTS]
+    return timing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快一次")
+    parser.add_argument("--window", action="store_true", help="同时测量创建并显示主窗口的时间")
+    parser.add_argument("--max-ms", type=float, help="导入 main 超过此毫秒数时以状态码1退出")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    try:
+        runs = [measure_once(args.window) for _ in range(max(1, args.repeat))]
+    except RuntimeError as e:
+        print(f"测量失败: {e}", file=sys.stderr)
+        return 2
+    best = min(runs, key=lambda run: run["import_main"])
+    heavy = sorted({name for run in runs for name in run["heavy"]})
+
+    print(f"导入 main:      {best['import_main'] * 1000:7.1f}ms（{len(runs)} 次中最快）")
+    if args.window:
+        print(f"窗口显示:       {min(run['window'] for run in runs) * 1000:7.1f}ms")
+    print(f"后台导入模块:   {min(run['load_modules'] for run in runs) * 1000:7.1f}ms（窗口显示后进行，不阻塞界面）")
+    print("导入 main 时耗时最多的模块:")
+    for name, cumulative in best["top_imports"]:
+        print(f"  {name:<20} {cumulative / 1000:7.1f}ms")
+
+    failed = False
+    if heavy:
+        print(f"导入 main 时加载了较慢的模块: {', '.join(heavy)}", file=sys.stderr)
+        failed = True
+    if args.max_ms is not None and best["import_main"] * 1000 > args.max_ms:
+        print(f"导入 main 超过 {args.max_ms:g}ms", file=sys.stderr)
+        failed = True
+
+    if args.json:
+        report = {
+            "version": git_version(),
+            "import_main_ms": best["import_main"] * 1000,
+            "window_ms": min(run["window"] for run in runs) * 1000 if args.window else None,
+            "load_modules_ms": min(run["load_modules"] for run in runs) * 1000,
+            "heavy_modules": heavy,
+            "top_imports": [{"module": name, "ms": cumulative / 1000} for name, cumulative in best["top_imports"]],
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
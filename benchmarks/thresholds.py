@@ -0,0 +1,57 @@
+"""阈值方法基准：各方法在不同页面尺寸和线程数下的吞吐量
+
+用法:
+    python -m benchmarks.thresholds
+    python -m benchmarks.thresholds --dpi 200 300 --methods sauvola niblack --threads 1 4
+"""
+import argparse
+import os
+import time
+
+import engine
+import thresholds
+from benchmarks.corpus import make_synthetic_page, paper_size
+
+
+def make_uneven_page(dpi):
+    """A4 合成扫描页，叠加从左上到右下变暗的光照，用于体现局部方法的差异"""
+    return make_synthetic_page(0, paper_size("a4", dpi), shading=0.5)
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dpi", type=int, nargs="+", default=[150, 200, 300], help="A4 页面的分辨率")
+    parser.add_argument("--methods", nargs="+", choices=list(thresholds.METHODS), default=list(thresholds.METHODS))
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1], help="分块线程数")
+    parser.add_argument("--block-size", type=int, default=thresholds.DEFAULT_BLOCK_SIZE)
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快一次")
+    args = parser.parse_args(argv)
+
+    threads = sorted(set(args.threads))
+    print(f"{'方法':<18} {'DPI':>4} {'像素':>10} " + " ".join(f"{f'{n}线程 ms/页':>14}" for n in threads)
+          + f" {'MPix/s':>8}")
+    for dpi in args.dpi:
+        gray = make_uneven_page(dpi)
+        out = gray.copy()
+        for method in args.methods:
+            times = [best_of(lambda: thresholds.apply(gray, method, engine.DEFAULT_THRESHOLD, args.block_size,
+                                                      out=out, threads=n), args.repeat)
+                     for n in threads]
+            height, width = gray.shape
+            print(f"{method:<18} {dpi:>4} {f'{width}x{height}':>10} "
+                  + " ".join(f"{t * 1000:14.1f}" for t in times)
+                  + f" {gray.size / min(times) / 1e6:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""常驻服务基准：文件放入监视目录到结果写出的延迟，与每个文件单独运行一次 cli.py 对比
+
+依次把合成的扫描件（图片，--pdf-pages 大于0时另加PDF）移入常驻服务（service.WatchService）监视的目录，
+每次等到结果写出后再放下一个，记录每个文件从到达到写出的延迟（包含 --settle 的稳定等待时间）；
+再对同样的文件逐个运行 python cli.py FILE（包含启动解释器、导入模块和创建进程池的耗时）。
+
+用法:
+    python -m benchmarks.watch
+    python -m benchmarks.watch --files 20 --workers 4 --settle 0.5 --json watch.json
+    python -m benchmarks.watch --pdf-pages 8 --polling
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import engine
+import perf
+import service
+from benchmarks import corpus
+from benchmarks.pipeline import git_version
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMEOUT = 120  # 等待单个结果的最长秒数
+
+
+def wait_for(path, timeout=TIMEOUT):
+    deadline = time.perf_counter() + timeout
+    while not os.path.exists(path):
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"等待结果超时: {path}")
+        time.sleep(0.005)
+
+
+def make_files(directory, count, pdf_pages, dpi):
+    files = []
+    for i in range(count):
+        path = os.path.join(directory, f"scan_{i + 1}.png")
+        corpus.make_scan_image(path, dpi, seed=i)
+        files.append(path)
+    if pdf_pages:
+        path = os.path.join(directory, "scan.pdf")
+        corpus.make_scan_pdf(path, pdf_pages, dpi)
+        files.append(path)
+    return files
+
+
+def expected_output(output_dir, file_path):
+    """文件最后写出的结果（PDF为最后一页）"""
+    page_count = engine.file_page_count(file_path)
+    return engine.output_path_for(output_dir, file_path, page_count, page_count=page_count)
+
+
+def measure_service(files, work_dir, workers, settle, polling):
+    input_dir = os.path.join(work_dir, "watch_in")
+    output_dir = os.path.join(work_dir, "watch_out")
+    os.makedirs(input_dir)
+    options = engine.BatchOptions(timer=perf.StageTimer(), input_root=input_dir)
+    watcher = service.WatchService(input_dir, output_dir, options, workers=workers, settle=settle, polling=polling)
+    start = time.perf_counter()
+    watcher.start()
+    startup = time.perf_counter() - start
+    latencies = []
+    try:
+        for file_path in files:
+            target = os.path.join(input_dir, os.path.basename(file_path))
+            start = time.perf_counter()
+            os.replace(file_path, target)  # 同一文件系统内的重命名，相当于扫描仪写完后改名
+            wait_for(expected_output(output_dir, target))
+            latencies.append(time.perf_counter() - start)
+            os.replace(target, file_path)  # 放回原处，供单独运行时使用
+    finally:
+        watcher.stop()
+    return startup, latencies, watcher.watcher.mode
+
+
+def measure_cold(files, work_dir, workers):
+    output_dir = os.path.join(work_dir, "cold_out")
+    latencies = []
+    for file_path in files:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "cli.py", file_path, "-o", output_dir, "-j", str(workers), "-q"],
+                       cwd=ROOT, check=True, capture_output=True)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def describe(latencies):
+    return {"p50_s": perf.percentile(latencies, 50), "p95_s": perf.percentile(latencies, 95),
+            "max_s": max(latencies), "files": len(latencies)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=10, help="图片数量")
+    parser.add_argument("--pdf-pages", type=int, default=0, help="另加一个此页数的PDF（需要 poppler）")
+    parser.add_argument("--dpi", type=int, default=200, help="合成页面的分辨率")
+    parser.add_argument("--workers", type=int, default=2, help="进程数（两种方式相同）")
+    parser.add_argument("--settle", type=float, default=0.5, help="常驻服务的稳定等待时间（秒）")
+    parser.add_argument("--polling", action="store_true", help="常驻服务使用轮询")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_dir = os.path.join(work_dir, "files")
+        os.makedirs(source_dir)
+        files = make_files(source_dir, args.files, args.pdf_pages, args.dpi)
+        startup, warm, mode = measure_service(files, work_dir, args.workers, args.settle, args.polling)
+        cold = measure_cold(files, work_dir, args.workers)
+
+    warm_stats, cold_stats = describe(warm), describe(cold)
+    print(f"常驻服务（{mode}，稳定等待 {args.settle:g}s）: 启动 {startup:.2f}s，"
+          f"到达到写出 p50 {warm_stats['p50_s']:.2f}s  p95 {warm_stats['p95_s']:.2f}s  最长 {warm_stats['max_s']:.2f}s")
+    print(f"每个文件运行一次 cli.py:            "
+          f"p50 {cold_stats['p50_s']:.2f}s  p95 {cold_stats['p95_s']:.2f}s  最长 {cold_stats['max_s']:.2f}s")
+    print(f"扣除稳定等待后，常驻服务的 p50 延迟为单独运行的 "
+          f"{max(0.0, warm_stats['p50_s'] - args.settle) / cold_stats['p50_s']:.0%}")
+
+    if args.json:
+        report = {"version": git_version(), "workers": args.workers, "settle_s": args.settle, "mode": mode,
+                  "service_startup_s": startup, "service": warm_stats, "cold": cold_stats}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
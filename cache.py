@@ -0,0 +1,176 @@
+"""批量处理的磁盘结果缓存（不依赖 tkinter）
+
+两级缓存：
+- 页面缓存：(文件内容哈希, 页码, DPI) -> 灰度页面（PNG无损，快速压缩）
+- 输出缓存：(页面键, 阈值, 输出格式) -> 编码后的输出文件内容
+输入未变化时直接使用缓存结果，不再重新栅格化和阈值处理。
+缓存总大小超过上限时按最近访问时间淘汰。
+"""
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+import engine
+from manifest import sha256_file
+
+DEFAULT_CACHE_BYTES = 2 * 1024 * 1024 * 1024  # 默认缓存上限 2GB
+
+
+class ResultCache:
+    """基于目录的内容寻址缓存，可以传给工作进程（统计在各进程中独立计数后合并）"""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = self.empty_stats()
+
+    def __getstate__(self):
+        # 传给工作进程时统计从0开始，完成后由主进程合并
+        state = self.__dict__.copy()
+        state["stats"] = self.empty_stats()
+        return state
+
+    @staticmethod
+    def empty_stats():
+        return {"page_hits": 0, "page_misses": 0, "output_hits": 0, "output_misses": 0}
+
+    def merge_stats(self, stats):
+        for key, value in stats.items():
+            self.stats[key] += value
+
+    def report(self):
+        """命中/未命中统计文本"""
+        s = self.stats
+        return (f"缓存: 页面 命中 {s['page_hits']} / 未命中 {s['page_misses']}，"
+                f"输出 命中 {s['output_hits']} / 未命中 {s['output_misses']}")
+
+    # ---- 键 ----
+
+    def file_hash(self, file_path):
+        """文件内容的 SHA-256；按 (路径, 大小, 修改时间) 记住结果，未修改的文件不再重复读取"""
+        st = os.stat(file_path)
+        stat_key = hashlib.sha1(
+            f"{os.path.abspath(file_path)}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8")
+        ).hexdigest()
+        data = self._read("stat", stat_key, ".txt")
+        if data is not None:
+            return data.decode("ascii").strip()
+
+        file_hash = sha256_file(file_path)
+        self._write_atomic(self._path("stat", stat_key, ".txt"), file_hash.encode("ascii"))
+        return file_hash
+
+    @staticmethod
+    def page_key(file_hash, page_number, dpi, source=None):
+        """页面键：同一文件内容、页码、DPI和页面来源得到同一个键（source 为 None 时与没有来源的旧键相同）"""
+        key = f"{file_hash}|{page_number}|{dpi}"
+        if source:
+            key = f"{key}|{source}"
+        return hashlib.sha256(key.encode("ascii")).hexdigest()
+
+    @staticmethod
+    def output_key(page_key, threshold_value, output_ext):
+        return hashlib.sha256(f"{page_key}|{threshold_value}|{output_ext}".encode("ascii")).hexdigest()
+
+    # ---- 读写 ----
+
+    def has_page(self, page_key):
+        """页面是否已缓存（不存在时计为一次未命中）"""
+        if os.path.isfile(self._path("pages", page_key, ".png")):
+            return True
+        self.stats["page_misses"] += 1
+        return False
+
+    def has_output(self, output_key):
+        """输出是否已缓存（不存在时计为一次未命中）"""
+        if os.path.isfile(self._path("outputs", output_key, ".bin")):
+            return True
+        self.stats["output_misses"] += 1
+        return False
+
+    def get_page(self, page_key):
+        """读取缓存的灰度页面，不存在时返回 None"""
+        data = self._read("pages", page_key, ".png")
+        if data is None:
+            self.stats["page_misses"] += 1
+            return None
+        self.stats["page_hits"] += 1
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+
+    def put_page(self, page_key, gray_image):
+        data = cv2.imencode('.png', gray_image, [cv2.IMWRITE_PNG_COMPRESSION, 1])[1]
+        self._write_atomic(self._path("pages", page_key, ".png"), data.tobytes())
+
+    def get_output(self, output_key):
+        """读取缓存的编码结果（bytes），不存在时返回 None"""
+        data = self._read("outputs", output_key, ".bin")
+        if data is None:
+            self.stats["output_misses"] += 1
+        else:
+            self.stats["output_hits"] += 1
+        return data
+
+    def put_output(self, output_key, data):
+        self._write_atomic(self._path("outputs", output_key, ".bin"), bytes(data))
+
+    def _path(self, kind, key, suffix):
+        return os.path.join(self.cache_dir, kind, key[:2], key + suffix)
+
+    def _read(self, kind, key, suffix):
+        path = self._path(kind, key, suffix)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)  # 记录访问时间，用于LRU淘汰
+        except OSError:
+            pass
+        return data
+
+    @staticmethod
+    def _write_atomic(path, data):
+        """先写临时文件再重命名，并发写入同一键时不会读到半个文件"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        engine.write_bytes(path, data)
+
+    # ---- 淘汰 ----
+
+    def evict(self):
+        """总大小超过上限时，按最近访问时间从旧到新删除页面、输出和文件哈希缓存，返回删除的字节数
+
+        文件哈希缓存（stat/）被删除后，下次只需重新计算一次哈希。
+        """
+        entries = []
+        total = 0
+        for kind in ("pages", "outputs", "stat"):
+            root = os.path.join(self.cache_dir, kind)
+            if not os.path.isdir(root):
+                continue
+            for prefix in os.scandir(root):
+                if not prefix.is_dir():
+                    continue
+                for entry in os.scandir(prefix.path):
+                    if entry.name.endswith(".tmp"):
+                        continue
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+
+        removed = 0
+        if total <= self.max_bytes:
+            return removed
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += size
+        return removed
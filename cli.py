@@ -0,0 +1,300 @@
+"""命令行批量处理入口（无需图形界面）
+
+示例:
+    python cli.py                              # 处理 ./input，结果保存到 ./output
+    python cli.py scans/*.pdf -t 180 -o out -j 8
+    python cli.py scans --dpi ocr              # 按用途选择分辨率（300 DPI）
+    python cli.py scans -m sauvola             # 光照不均的扫描件使用局部阈值
+    python cli.py archive --include "*.pdf" --exclude "drafts"   # 递归扫描，按通配符筛选
+    python cli.py samples --sweep 100-220:20   # 每页输出多个阈值的结果和一张对比图，用于挑选阈值
+    python cli.py scans --skip-blank --auto-crop   # 跳过空白分隔页，其余页裁剪到内容
+    python cli.py scans --native-dpi           # 扫描件PDF按扫描分辨率输出，不重采样
+    python cli.py scans --watch -j 4           # 常驻服务：监视 scans，新文件写入完成后立即处理
+"""
+import argparse
+import contextlib
+import glob
+import itertools
+import os
+import signal
+import sys
+import time
+
+import discovery
+import encoders
+import engine
+import pagestats
+import perf
+import pipeline
+import rasters
+import thresholds
+from defaults import POLL_INTERVAL, SERVICE_HOST, SERVICE_PORT, SETTLE_SECONDS
+from cache import ResultCache
+
+
+def expand_inputs(inputs, include=None, exclude=None, recursive=True):
+    """逐个产出输入文件：目录递归扫描其中所有支持的文件（见 discovery.iter_input_files），
+    通配符在此展开（兼容Windows cmd），重复的文件只产出一次"""
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            files = discovery.iter_input_files(item, include, exclude, recursive)
+        elif glob.has_magic(item):
+            files = (f for f in glob.iglob(item) if os.path.isfile(f) and engine.is_supported(f))
+        elif os.path.isfile(item):
+            files = [item]
+        else:
+            print(f"跳过不存在的输入: {item}", file=sys.stderr)
+            continue
+        for f in files:
+            key = os.path.abspath(f)
+            if key not in seen:
+                seen.add(key)
+                yield f
+
+
+def dpi_arg(value):
+    try:
+        return engine.resolve_dpi(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的DPI: {value}")
+
+
+def stage_workers_arg(value):
+    """阶段=线程数，如 encode=2"""
+    name, sep, count = value.partition("=")
+    if not sep or name not in engine.PIPELINE_STAGES or not count.isdigit() or int(count) < 1:
+        raise argparse.ArgumentTypeError(
+            f"无效的阶段线程数: {value}（格式为 阶段=线程数，阶段为 {'/'.join(engine.PIPELINE_STAGES)}）")
+    return name, int(count)
+
+
+def sweep_arg(value):
+    import sweep
+
+    try:
+        return sweep.parse_thresholds(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="图像/PDF 阈值处理 - 保留白色（批量命令行版）")
+    parser.add_argument("inputs", nargs="*", default=["input"],
+                        help="输入文件、目录或通配符（默认: input）")
+    parser.add_argument("-t", "--threshold", type=int, default=engine.DEFAULT_THRESHOLD,
+                        help=f"阈值 0-255（默认: {engine.DEFAULT_THRESHOLD}）")
+    parser.add_argument("-m", "--method", choices=list(thresholds.METHODS), default=thresholds.DEFAULT_METHOD,
+                        help="阈值方法: " + "，".join(f"{k}={v}" for k, v in thresholds.METHODS.items())
+                             + "（默认: global，即使用 -t 的固定阈值）")
+    parser.add_argument("--block-size", type=int, default=thresholds.DEFAULT_BLOCK_SIZE,
+                        help=f"局部阈值方法的窗口边长（像素，默认: {thresholds.DEFAULT_BLOCK_SIZE}）")
+    parser.add_argument("-k", type=float, default=None,
+                        help="局部阈值方法的系数（adaptive 为常数C，默认: "
+                             + "，".join(f"{k}={v}" for k, v in thresholds.DEFAULT_K.items()) + "）")
+    parser.add_argument("--sweep", type=sweep_arg, metavar="LIST",
+                        help="阈值扫描：每页只转换一次，输出列表中每个阈值的结果（文件名加 _t阈值）和一张缩略对比图（_sheet.png），"
+                             "如 120,140,160 或 100-200:20（起-止:步长）；此时忽略 -t/-m、缓存、续做和 -j")
+    parser.add_argument("--include", action="append", metavar="PATTERN",
+                        help="只处理文件名或相对路径匹配此通配符的文件，可重复（不区分大小写）")
+    parser.add_argument("--exclude", action="append", metavar="PATTERN",
+                        help="跳过文件名或相对路径匹配此通配符的文件和目录，可重复")
+    parser.add_argument("--no-recursive", action="store_true", help="只处理输入目录的第一层")
+    parser.add_argument("-o", "--output", default="output", help="输出目录（默认: output）")
+    parser.add_argument("-j", "--workers", type=int, default=engine.DEFAULT_WORKERS,
+                        help=f"并行进程数（默认: CPU核数 {engine.DEFAULT_WORKERS}）")
+    parser.add_argument("--dpi", type=dpi_arg, default=engine.DEFAULT_DPI,
+                        help=f"PDF栅格化分辨率，数字或用途名 "
+                             f"{'/'.join(f'{k}={v}' for k, v in engine.DPI_PRESETS.items())}"
+                             f"（默认: {engine.DEFAULT_DPI}）")
+    parser.add_argument("--no-embedded-images", action="store_true",
+                        help="PDF每页都用 pdftoppm 栅格化（默认只有一张铺满页面的扫描图像的页直接解码该图像，需要 pypdf）")
+    parser.add_argument("--native-dpi", action="store_true",
+                        help="直接解码的PDF页面按扫描分辨率输出，不缩放到 --dpi（其余页面仍按 --dpi 栅格化）")
+    parser.add_argument("--render-threads", type=int, default=1,
+                        help="每个进程转换PDF时使用的 pdftoppm 线程数（默认: 1）")
+    parser.add_argument("--stage-workers", type=stage_workers_arg, action="append", metavar="STAGE=N",
+                        help=f"PDF页面流水线某阶段的线程数，可重复，如 --stage-workers write=4（阶段: {'/'.join(engine.PIPELINE_STAGES)}，"
+                             f"默认各1个）")
+    parser.add_argument("--queue-size", type=int, default=pipeline.DEFAULT_QUEUE_SIZE,
+                        help=f"流水线阶段之间的队列容量（页，默认: {pipeline.DEFAULT_QUEUE_SIZE}；0 表示逐页串行处理）")
+    parser.add_argument("--strip-min-mp", type=float, default=rasters.STRIP_MIN_PIXELS / 1e6, metavar="MP",
+                        help="不小于此像素数（百万）的TIFF页面按条带读取和写出，内存占用与页面大小无关"
+                             f"（仅 {'/'.join(encoders.STRIP_FORMATS)} 格式，默认: {rasters.STRIP_MIN_PIXELS / 1e6:.0f}）")
+    parser.add_argument("--page-stats", action="store_true",
+                        help=f"统计每页的灰度直方图、墨迹比例和内容边界框，写入输出目录的 {pagestats.STATS_NAME}")
+    parser.add_argument("--skip-blank", action="store_true", help="跳过空白页（不编码、不写出，隐含 --page-stats）")
+    parser.add_argument("--auto-crop", action="store_true", help="结果裁剪到内容边界框后再编码（隐含 --page-stats）")
+    parser.add_argument("--blank-ink", type=float, default=pagestats.BLANK_INK * 100, metavar="PERCENT",
+                        help="墨迹（灰度不大于 -t 阈值的像素）不超过页面此百分比时视为空白页"
+                             f"（默认: {pagestats.BLANK_INK * 100:g}）")
+    parser.add_argument("--cache-dir", help="结果缓存目录，重复运行时跳过未变化的输入（默认不使用缓存）")
+    parser.add_argument("--cache-size", type=int, default=2048, help="缓存上限（MB，默认: 2048）")
+    parser.add_argument("-f", "--format", choices=list(encoders.OUTPUT_FORMATS), default=encoders.DEFAULT_FORMAT,
+                        help="输出格式: " + "，".join(f"{k}={v}" for k, v in encoders.OUTPUT_FORMATS.items()))
+    parser.add_argument("--resume", action="store_true",
+                        help="续做：只处理任务清单(manifest.jsonl)中缺失或过期的项")
+    parser.add_argument("--stats", metavar="PATH",
+                        help="结束后写出各阶段耗时和计数的报告（.csv 为CSV，其余为JSON）")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="用 cProfile 分析本次运行并写入 PATH（-j 大于1时只分析主进程）")
+    parser.add_argument("--watch", action="store_true",
+                        help="常驻服务：监视输入目录（只能指定一个目录），新文件写入完成后立即用预热的进程池处理，"
+                             "已完成的文件按任务清单跳过；Ctrl+C 停止")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS, metavar="SECONDS",
+                        help=f"文件大小和修改时间保持不变多久后视为写入完成（默认: {SETTLE_SECONDS:g}）")
+    parser.add_argument("--polling", action="store_true",
+                        help="定时扫描目录而不使用 inotify（挂载的网络共享上需要）")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL, metavar="SECONDS",
+                        help=f"轮询间隔（默认: {POLL_INTERVAL:g}）")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT,
+                        help=f"常驻服务在 {SERVICE_HOST} 上的 HTTP 接口端口，0 表示不开启"
+                             f"（默认: {SERVICE_PORT}）")
+    parser.add_argument("--socket", metavar="PATH", help="常驻服务的接口改用此 Unix 套接字")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不输出逐页进度")
+    return parser
+
+
+def make_options(args, input_root=None):
+    cache = ResultCache(args.cache_dir, args.cache_size * 1024 * 1024) if args.cache_dir else None
+    return engine.BatchOptions(args.threshold, render_threads=args.render_threads, dpi=args.dpi, cache=cache,
+                               resume=args.resume, output_format=args.format, threshold_method=args.method,
+                               block_size=args.block_size, k=args.k,
+                               threshold_threads=max(1, (os.cpu_count() or 1) // args.workers),
+                               timer=perf.StageTimer(), stage_workers=dict(args.stage_workers or []),
+                               queue_size=args.queue_size, input_root=input_root,
+                               strip_min_pixels=int(args.strip_min_mp * 1e6), page_stats=args.page_stats,
+                               skip_blank=args.skip_blank, auto_crop=args.auto_crop,
+                               blank_ink=args.blank_ink / 100, embedded_images=not args.no_embedded_images,
+                               native_dpi=args.native_dpi)
+
+
+def run_watch(args):
+    """--watch：运行常驻服务直到 Ctrl+C（或 SIGTERM）"""
+    if len(args.inputs) != 1 or not os.path.isdir(args.inputs[0]):
+        print("--watch 需要且只能指定一个输入目录", file=sys.stderr)
+        return 2
+    if args.sweep:
+        print("--watch 不能与 --sweep 同时使用", file=sys.stderr)
+        return 2
+    import service  # 只有常驻服务需要 http.server 和 inotify
+
+    input_dir = args.inputs[0]
+
+    def log(message):
+        print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+    options = make_options(args, input_dir)
+    watcher = service.WatchService(input_dir, args.output, options, workers=args.workers, include=args.include,
+                                   exclude=args.exclude, recursive=not args.no_recursive, settle=args.settle,
+                                   polling=args.polling, poll_interval=args.poll_interval,
+                                   log=None if args.quiet else log)
+    ready = watcher.start()
+    server = None
+    try:
+        if args.socket or args.port:
+            server = service.serve_http(watcher, port=args.port, socket_path=args.socket)
+        log(f"已启动 {ready} 个工作进程，正在监视 {os.path.abspath(input_dir)}（{watcher.watcher.mode}），"
+            f"结果保存到 {os.path.abspath(args.output)}")
+        if server:
+            log(f"接口: {args.socket or f'http://{service.DEFAULT_HOST}:{server.server_address[1]}'}")
+        signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+        while not watcher.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        log("正在停止...")
+    finally:
+        if server:
+            service.close_http(server)
+        watcher.stop()
+    print(options.timer.format())
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not 0 <= args.threshold <= 255:
+        print("阈值必须在 0-255 之间", file=sys.stderr)
+        return 2
+    if args.workers < 1 or args.render_threads < 1:
+        print("并行进程数和线程数必须大于 0", file=sys.stderr)
+        return 2
+    if args.queue_size < 0:
+        print("队列容量不能为负数", file=sys.stderr)
+        return 2
+    if args.native_dpi and args.no_embedded_images:
+        print("--native-dpi 需要直接解码嵌入图像，不能与 --no-embedded-images 同时使用", file=sys.stderr)
+        return 2
+    if args.watch:
+        return run_watch(args)
+
+    # 文件边扫描边处理，PDF页数在处理前才读取，总页数随扫描进度更新
+    files = expand_inputs(args.inputs, args.include, args.exclude, not args.no_recursive)
+    first = next(files, None)
+    if first is None:
+        print("没有找到支持的文件（图片或PDF）", file=sys.stderr)
+        return 1
+    file_tasks = discovery.iter_file_tasks(itertools.chain([first], files))
+    # 只有一个输入目录时，子目录中文件的结果保存到输出目录的同名子目录
+    input_root = args.inputs[0] if len(args.inputs) == 1 and os.path.isdir(args.inputs[0]) else None
+
+    errors = []
+    total = {"pages": 0, "complete": False}
+
+    def on_total(pages, complete):
+        total.update(pages=pages, complete=complete)
+
+    def progress(current, status):
+        if args.quiet:
+            return
+        if total["complete"]:
+            print(f"[{current}/{total['pages']}] {status}")
+        elif total["pages"]:
+            print(f"[{current}/{total['pages']}+] {status}")
+        else:  # 发现线程还没有报告总页数
+            print(f"[{current}/…] {status}")
+
+    def on_error(message):
+        errors.append(message)
+        print(message, file=sys.stderr)
+
+    options = make_options(args, input_root)
+    cache = options.cache
+    with perf.profile(args.profile) if args.profile else contextlib.nullcontext():
+        if args.sweep:
+            import sweep
+
+            processed_count = sweep.run_sweep(file_tasks, args.output, options, args.sweep, progress=progress,
+                                              on_error=on_error, on_total=on_total)
+        else:
+            processed_count = engine.run_batch(
+                file_tasks, args.output, options,
+                workers=args.workers, progress=progress, on_error=on_error, on_total=on_total
+            )
+    if total["pages"] == 0:
+        print("没有可处理的有效文件", file=sys.stderr)
+        return 1
+    if args.sweep:
+        print(f"阈值扫描完成，共处理 {processed_count} 页，每页 {len(args.sweep)} 个阈值"
+              f"（{', '.join(map(str, args.sweep))}），结果保存在 {os.path.abspath(args.output)}")
+    else:
+        print(f"批量处理完成，共处理 {processed_count} 个文件/页面，结果保存在 {os.path.abspath(args.output)}")
+    peak = perf.peak_rss_bytes()
+    if args.workers > 1:
+        child_peak = perf.peak_rss_bytes(children=True)
+        if child_peak is not None:
+            peak = max(peak or 0, child_peak)
+    print(f"峰值内存: {perf.format_bytes(peak)}")
+    if cache:
+        print(cache.report())
+    print(options.timer.format())
+    if args.stats:
+        options.timer.write_report(args.stats)
+        print(f"统计报告已写入 {args.stats}")
+    if args.profile:
+        print(f"性能分析结果已写入 {args.profile}（python -m pstats {args.profile}）")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""界面和处理模块共用的默认参数（只依赖标准库）
+
+界面启动时只导入本模块就可以创建全部控件，OpenCV、numpy 等较慢的模块在后台导入（见 main.load_modules）。
+engine、encoders、thresholds、watch 和 service 从这里导入这些值，原来的名称（engine.DEFAULT_DPI 等）不变；
+命令行的参数默认值也从这里读取，不需要常驻服务或阈值扫描时不导入这些模块。
+"""
+import os
+
+DEFAULT_THRESHOLD = 200  # 默认阈值
+DEFAULT_DPI = 200  # PDF栅格化分辨率（pdf2image默认值）
+DEFAULT_WORKERS = os.cpu_count() or 1  # 默认并行进程数
+
+OUTPUT_FORMATS = {
+    "png": "8位灰度PNG",
+    "png1": "1位PNG",
+    "tiff-g4": "G4 TIFF（每页一个文件）",
+    "tiff-multi": "多页 G4 TIFF",
+    "pdf": "二值PDF",
+}
+DEFAULT_FORMAT = "png"
+
+THRESHOLD_METHODS = {
+    "global": "固定阈值",
+    "otsu": "Otsu 自动阈值",
+    "triangle": "三角法自动阈值",
+    "adaptive-mean": "自适应（局部均值）",
+    "adaptive-gaussian": "自适应（高斯加权）",
+    "sauvola": "Sauvola",
+    "niblack": "Niblack",
+}
+DEFAULT_METHOD = "global"
+DEFAULT_BLOCK_SIZE = 51  # 局部方法的窗口边长（奇数，200 DPI 下约为几行文字的高度）
+
+SETTLE_SECONDS = 1.0  # 常驻服务：文件大小和修改时间保持不变多久后视为写入完成
+POLL_INTERVAL = 2.0  # 常驻服务：轮询时两次扫描的间隔（秒）
+SERVICE_HOST = "127.0.0.1"  # 常驻服务的接口只接受本机的连接
+SERVICE_PORT = 8765
@@ -0,0 +1,98 @@
+"""输入文件发现（不依赖 tkinter）
+
+用 os.scandir 逐层遍历目录（不预先列出整棵目录树），扩展名不区分大小写，
+可以用 include/exclude 通配符筛选；文件边发现边产出，批量处理不必等待扫描完成。
+通配符按 fnmatch 规则不区分大小写地匹配文件名或相对于输入目录的路径（以 / 分隔），
+exclude 匹配到的目录整个跳过。以 . 开头的隐藏文件和目录（如 .cache）不会被扫描。
+"""
+import fnmatch
+import os
+
+import engine
+
+
+def _matches(patterns, name, rel_path):
+    name = name.lower()
+    rel_path = rel_path.lower()
+    return any(fnmatch.fnmatchcase(name, p) or fnmatch.fnmatchcase(rel_path, p) for p in patterns)
+
+
+def iter_input_files(root, include=None, exclude=None, recursive=True):
+    """按目录顺序产出 root 下所有支持的图片和PDF路径（同一目录内按文件名排序）
+
+    include 不为空时只产出匹配其中任一通配符的文件；exclude 匹配的文件和目录被跳过。
+    无法读取的子目录被忽略。
+    """
+    include = [p.lower() for p in include or ()]
+    exclude = [p.lower() for p in exclude or ()]
+    stack = [""]  # 待扫描的目录（相对于 root）
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            with os.scandir(os.path.join(root, rel_dir) if rel_dir else root) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if recursive and not _matches(exclude, entry.name, rel_path):
+                    subdirs.append(rel_path)
+                continue
+            if not engine.is_supported(entry.name):
+                continue
+            if include and not _matches(include, entry.name, rel_path):
+                continue
+            if exclude and _matches(exclude, entry.name, rel_path):
+                continue
+            yield entry.path
+        stack.extend(reversed(subdirs))  # 先处理当前目录的文件，再按名称顺序深入子目录
+
+
+def _rel_parts(root, path):
+    """path 相对于 root 的各级名称，不在 root 下时返回 None"""
+    rel_path = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+    if rel_path == os.curdir:
+        return []
+    parts = rel_path.replace(os.sep, "/").split("/")
+    return None if parts[0] == os.pardir else parts
+
+
+def accepts_dir(root, dir_path, exclude=None, recursive=True):
+    """iter_input_files 是否会扫描 root 下的目录 dir_path（root 本身总是扫描）"""
+    parts = _rel_parts(root, dir_path)
+    if parts is None:
+        return False
+    if parts and not recursive:
+        return False
+    exclude = [p.lower() for p in exclude or ()]
+    for n, name in enumerate(parts, 1):
+        if name.startswith(".") or _matches(exclude, name, "/".join(parts[:n])):
+            return False
+    return True
+
+
+def accepts_file(root, file_path, include=None, exclude=None, recursive=True):
+    """iter_input_files 是否会产出 root 下的文件 file_path（目录监视收到变化时按同样的规则筛选）"""
+    parts = _rel_parts(root, file_path)
+    if not parts or not accepts_dir(root, os.path.dirname(os.path.abspath(file_path)), exclude, recursive):
+        return False
+    name, rel_path = parts[-1], "/".join(parts)
+    if name.startswith(".") or not engine.is_supported(name):
+        return False
+    if include and not _matches([p.lower() for p in include], name, rel_path):
+        return False
+    return not (exclude and _matches([p.lower() for p in exclude], name, rel_path))
+
+
+def iter_file_tasks(files):
+    """把文件路径流转换为 (文件, 页数)：图片为1页，PDF和TIFF的页数为 None，在处理前才读取"""
+    for file_path in files:
+        yield file_path, None if engine.is_paged(file_path) else 1
@@ -0,0 +1,416 @@
+"""扫描件PDF的嵌入图像直接解码（不依赖 tkinter，需要 pypdf）
+
+扫描仪输出的PDF每页通常只有一张铺满页面的 JPEG（DCTDecode）或 CCITT G3/G4 图像，
+直接解码这张图像比 pdftoppm 重新栅格化快得多，也不经过 pdftoppm 的重采样。
+只有一张图像、没有可见文字（OCR 的隐藏文字层可以有）、矢量图形、注释和透明效果，
+图像不旋转任意角度并铺满页面（MediaBox，与 pdftoppm 默认相同）的页面才走这条路径，
+其余页面返回回退原因，由调用方交给 pdftoppm。
+
+解码结果按页面的 /Rotate 和图像的放置方向转正，再缩放到与 pdftoppm 按 dpi 转换相同的尺寸，
+因此输出文件的分辨率不变，扫描分辨率与 dpi 相同时不做重采样；也可以不缩放，按扫描分辨率输出。
+"""
+import io
+import math
+
+import cv2
+import numpy as np
+
+COVER_TOLERANCE = 0.01  # 图像边界与页面边界的最大偏差（页面边长的比例），超出部分裁掉，不足视为没有铺满
+AXIS_TOLERANCE = 1e-3  # 图像轴与页面轴的最大夹角（弧度），超过时视为旋转或倾斜
+MAX_FORM_DEPTH = 4  # 表单 XObject 的最大嵌套层数
+
+# 回退原因 -> 说明（计时统计中按原因计数为 fallback_<原因>）
+REASONS = {
+    "no_pypdf": "未安装 pypdf",
+    "unreadable": "无法解析",
+    "no_image": "没有图像",
+    "images": "多张图像",
+    "vector": "矢量图形",
+    "text": "可见文字",
+    "annotations": "注释",
+    "coverage": "图像未铺满页面",
+    "transform": "图像旋转或倾斜",
+    "mask": "透明或蒙版",
+    "format": "图像编码不支持",
+    "decode": "解码失败",
+}
+
+CODEC_FILTERS = ("/DCTDecode", "/DCT", "/CCITTFaxDecode", "/CCF", "/JPXDecode")
+GRAY_SPACES = ("/DeviceGray", "/CalGray", "/G")
+RGB_SPACES = ("/DeviceRGB", "/CalRGB", "/RGB")
+TEXT_SHOW = {b"Tj", b"TJ", b"'", b'"'}
+PATH_PAINT = {b"S", b"s", b"f", b"F", b"f*", b"B", b"B*", b"b", b"b*", b"sh"}
+PATH_BUILD = {b"m", b"l", b"c", b"v", b"y", b"h"}
+HARMLESS = {
+    b"w", b"J", b"j", b"M", b"d", b"ri", b"i",  # 线条参数（没有描画时不影响结果）
+    b"g", b"G", b"rg", b"RG", b"k", b"K", b"cs", b"CS", b"sc", b"scn", b"SC", b"SCN",  # 颜色
+    b"BT", b"ET", b"Tc", b"Tw", b"Tz", b"TL", b"Tf", b"Ts", b"Td", b"TD", b"Tm", b"T*",  # 文字状态
+    b"BMC", b"BDC", b"EMC", b"MP", b"DP", b"BX", b"EX",  # 标记内容
+}
+
+
+class Fallback(Exception):
+    """页面不能直接解码，reason 为 REASONS 中的键"""
+
+    def __init__(self, reason):
+        super().__init__(REASONS.get(reason, reason))
+        self.reason = reason
+
+
+class PageImage:
+    """可以直接解码的页面：图像 XObject 以及把它转正、裁剪并缩放到页面的参数"""
+
+    def __init__(self, xobject, transpose, flip_x, flip_y, crop, page_size):
+        self.xobject = xobject
+        self.transpose = transpose  # 先转置（图像的列方向对应页面的竖直方向）
+        self.flip_x = flip_x  # 再左右翻转
+        self.flip_y = flip_y  # 再上下翻转
+        self.crop = crop  # 转正后图像中位于页面内的部分 (x0, y0, x1, y1)，为图像宽高的比例
+        self.page_size = page_size  # 转正后的页面尺寸（点）
+
+    def output_size(self, dpi):
+        """与 pdftoppm 按 dpi 转换时相同的像素尺寸 (宽, 高)"""
+        return tuple(max(1, math.ceil(side * dpi / 72)) for side in self.page_size)
+
+    def native_dpi(self, width):
+        """转正后宽 width 像素的图像在页面上的分辨率"""
+        x0, _, x1, _ = self.crop
+        return round(width * (x1 - x0) / (self.page_size[0] / 72))
+
+
+def _matmul(m, n):
+    """PDF矩阵 [a b c d e f] 的乘积 m×n（先 m 后 n）"""
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a * a2 + b * c2, a * b2 + b * d2, c * a2 + d * c2, c * b2 + d * d2,
+            e * a2 + f * c2 + e2, e * b2 + f * d2 + f2)
+
+
+def _apply(m, x, y):
+    return m[0] * x + m[2] * y + m[4], m[1] * x + m[3] * y + m[5]
+
+
+def _bbox(m, points):
+    xs, ys = zip(*(_apply(m, x, y) for x, y in points))
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _resolve(obj):
+    return obj.get_object() if hasattr(obj, "get_object") else obj
+
+
+def _as_list(obj):
+    obj = _resolve(obj)
+    if obj is None:
+        return []
+    return [_resolve(item) for item in obj] if isinstance(obj, list) else [obj]
+
+
+def _color_channels(color_space):
+    """颜色空间的通道数（只支持灰度和RGB），其他返回 None"""
+    color_space = _resolve(color_space)
+    if isinstance(color_space, list) and color_space:
+        family = _resolve(color_space[0])
+        if family == "/ICCBased" and len(color_space) > 1:
+            n = _resolve(color_space[1]).get("/N")
+            return n if n in (1, 3) else None
+        color_space = family
+    if color_space in GRAY_SPACES:
+        return 1
+    if color_space in RGB_SPACES:
+        return 3
+    return None
+
+
+def _check_image(xobject):
+    """检查图像 XObject 能否直接解码，不能时抛出 Fallback"""
+    if xobject.get("/ImageMask") or "/SMask" in xobject or "/Mask" in xobject:
+        raise Fallback("mask")
+    filters = [str(f) for f in _as_list(xobject.get("/Filter"))]
+    codecs = [f for f in filters if f in CODEC_FILTERS]
+    if codecs and codecs[-1] != filters[-1] or len(codecs) > 1 or "/JBIG2Decode" in filters:
+        raise Fallback("format")
+    codec = codecs[0] if codecs else None
+    decode = [float(v) for v in _as_list(xobject.get("/Decode"))]
+    if codec == "/JPXDecode":
+        if decode or "/SMaskInData" in xobject and xobject["/SMaskInData"]:
+            raise Fallback("format")
+        return
+    channels = _color_channels(xobject.get("/ColorSpace", "/DeviceGray" if codec in ("/CCITTFaxDecode", "/CCF")
+                                           else None))
+    bits = xobject.get("/BitsPerComponent", 1 if codec in ("/CCITTFaxDecode", "/CCF") else 8)
+    if channels is None or decode not in ([], [0.0, 1.0], [1.0, 0.0]) or decode and channels != 1:
+        raise Fallback("format")
+    if codec in ("/CCITTFaxDecode", "/CCF"):
+        ok = channels == 1 and bits == 1
+    elif codec:
+        ok = bits == 8
+    else:
+        ok = bits == 8 or bits == 1 and channels == 1
+    if not ok:
+        raise Fallback("format")
+
+
+class _Scan:
+    """扫描页面内容流：找出唯一的图像及其变换矩阵，遇到会画出其他内容的操作时抛出 Fallback"""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.image = None  # (图像 XObject, 变换矩阵)
+        self.clip = None  # 裁剪路径的边界框（用户空间），None 表示不裁剪
+
+    def run(self, content, resources, ctm, depth=0):
+        from pypdf.generic import ContentStream
+
+        operations = ContentStream(content, self.reader).operations
+        xobjects = _resolve(_resolve(resources or {}).get("/XObject")) or {}
+        ext_gstates = _resolve(_resolve(resources or {}).get("/ExtGState")) or {}
+        stack = []
+        render_mode = 0
+        path = []  # 当前路径的控制点（用户空间），只由 re 构成时为矩形
+        rect_only = True
+        clip_pending = False
+        for operands, operator in operations:
+            if operator == b"q":
+                stack.append((ctm, render_mode, self.clip))
+            elif operator == b"Q":
+                if stack:
+                    ctm, render_mode, self.clip = stack.pop()
+            elif operator == b"cm":
+                ctm = _matmul(tuple(float(v) for v in operands), ctm)
+            elif operator == b"Tr":
+                render_mode = int(operands[0])
+            elif operator in TEXT_SHOW:
+                if render_mode != 3:  # 3 为不可见文字（OCR 文字层）
+                    raise Fallback("text")
+            elif operator == b"re":
+                x, y, w, h = (float(v) for v in operands)
+                path += [_apply(ctm, x, y), _apply(ctm, x + w, y + h), _apply(ctm, x, y + h), _apply(ctm, x + w, y)]
+            elif operator in PATH_BUILD:
+                rect_only = False
+                for k in range(0, len(operands) - 1, 2):
+                    path.append(_apply(ctm, float(operands[k]), float(operands[k + 1])))
+            elif operator in (b"W", b"W*"):
+                clip_pending = True
+            elif operator == b"n":
+                if clip_pending and path:
+                    if not rect_only:
+                        raise Fallback("vector")
+                    xs, ys = zip(*path)
+                    box = (min(xs), min(ys), max(xs), max(ys))
+                    if self.clip:
+                        box = (max(box[0], self.clip[0]), max(box[1], self.clip[1]),
+                               min(box[2], self.clip[2]), min(box[3], self.clip[3]))
+                    self.clip = box
+                path, rect_only, clip_pending = [], True, False
+            elif operator in PATH_PAINT or operator == b"INLINE IMAGE":
+                raise Fallback("vector")
+            elif operator == b"gs":
+                self._check_gstate(_resolve(ext_gstates.get(operands[0])))
+            elif operator == b"Do":
+                xobject = _resolve(xobjects.get(operands[0]))
+                if xobject is None:
+                    continue
+                subtype = xobject.get("/Subtype")
+                if subtype == "/Image":
+                    if self.image is not None:
+                        raise Fallback("images")
+                    _check_image(xobject)
+                    self.image = (xobject, ctm, self.clip)
+                elif subtype == "/Form":
+                    if depth >= MAX_FORM_DEPTH:
+                        raise Fallback("vector")
+                    matrix = tuple(float(v) for v in xobject.get("/Matrix", (1, 0, 0, 1, 0, 0)))
+                    saved = self.clip
+                    self.run(xobject, xobject.get("/Resources", resources), _matmul(matrix, ctm), depth + 1)
+                    self.clip = saved
+            elif operator not in HARMLESS:
+                raise Fallback("vector")
+
+    @staticmethod
+    def _check_gstate(gstate):
+        if not gstate:
+            return
+        smask = gstate.get("/SMask")
+        if smask is not None and smask != "/None" or gstate.get("/BM", "/Normal") not in ("/Normal", "/Compatible"):
+            raise Fallback("mask")
+        if float(gstate.get("/CA", 1)) < 1 or float(gstate.get("/ca", 1)) < 1:
+            raise Fallback("mask")
+
+
+def _device_transform(media_box, rotation):
+    """用户空间到转正后设备空间（单位为点，原点在页面左上角，y 向下）的变换矩阵，按页面的 /Rotate（顺时针）"""
+    x0, y0, x1, y1 = media_box
+    return {0: (1, 0, 0, -1, -x0, y1), 90: (0, 1, 1, 0, -y0, -x0),
+            180: (-1, 0, 0, 1, x1, -y0), 270: (0, -1, -1, 0, y1, x1)}[rotation]
+
+
+def _place(xobject, matrix, clip, media_box, rotation):
+    """计算图像在转正后页面上的方向和位置，返回 PageImage，不满足条件时抛出 Fallback"""
+    x0, y0, x1, y1 = media_box
+    page_size = (x1 - x0, y1 - y0) if rotation in (0, 180) else (y1 - y0, x1 - x0)
+    to_device = _device_transform(media_box, rotation)
+    image = _matmul(matrix, to_device)  # 图像空间（单位正方形，v 轴向上）到设备空间
+
+    col_dir = (image[0], image[1])  # 图像列号增大的方向（u 轴）
+    row_dir = (-image[2], -image[3])  # 图像行号增大的方向（v 轴反向）
+    for vector in (col_dir, row_dir):
+        major, minor = max(abs(vector[0]), abs(vector[1])), min(abs(vector[0]), abs(vector[1]))
+        if not major or minor > AXIS_TOLERANCE * major:
+            raise Fallback("transform")
+    transpose = abs(col_dir[1]) > abs(col_dir[0])
+    if transpose:  # 转置后原来的行方向成为列方向
+        col_dir, row_dir = row_dir, col_dir
+    if abs(row_dir[1]) <= abs(row_dir[0]):
+        raise Fallback("transform")
+    flip_x, flip_y = col_dir[0] < 0, row_dir[1] < 0
+
+    # 转正后的图像第0列、第0行分别在边界框的左边和上边
+    bx0, by0, bx1, by1 = _bbox(image, ((0, 0), (1, 0), (0, 1), (1, 1)))
+    width, height = page_size
+    tol_x, tol_y = COVER_TOLERANCE * width, COVER_TOLERANCE * height
+    visible = [bx0, by0, bx1, by1]
+    if clip:
+        cx0, cy0, cx1, cy1 = _bbox(to_device, ((clip[0], clip[1]), (clip[2], clip[3])))
+        visible = [max(bx0, cx0), max(by0, cy0), min(bx1, cx1), min(by1, cy1)]
+    if visible[0] > tol_x or visible[1] > tol_y or visible[2] < width - tol_x or visible[3] < height - tol_y:
+        raise Fallback("coverage")
+    # 页面在图像中的范围（比例），超出页面的部分裁掉
+    crop = ((max(0.0, bx0) - bx0) / (bx1 - bx0), (max(0.0, by0) - by0) / (by1 - by0),
+            (min(width, bx1) - bx0) / (bx1 - bx0), (min(height, by1) - by0) / (by1 - by0))
+    return PageImage(xobject, transpose, flip_x, flip_y, crop, page_size)
+
+
+class PdfImages:
+    """按页检查和解码 PDF 中的扫描图像；文件在 close() 前保持打开，pypdf 按需读取各页"""
+
+    def __init__(self, file_path):
+        self.reader = None
+        self.error = None  # 整个文件都不能直接解码时的回退原因
+        self._file = None
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            self.error = "no_pypdf"
+            return
+        try:
+            self._file = open(file_path, "rb")
+            self.reader = PdfReader(self._file)
+            if self.reader.is_encrypted:
+                raise ValueError("加密的PDF")
+        except Exception:
+            self.close()
+            self.error = "unreadable"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.reader = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def plan(self, page_number):
+        """第 page_number 页（从1开始）可以直接解码时返回 PageImage，否则返回回退原因（REASONS 中的键）"""
+        if self.reader is None:
+            return self.error
+        try:
+            page = self.reader.pages[page_number - 1]
+            return self._plan_page(page)
+        except Fallback as e:
+            return e.reason
+        except Exception:
+            return "unreadable"
+
+    def _plan_page(self, page):
+        for annot in _as_list(page.get("/Annots")):
+            annot = _resolve(annot)
+            hidden = int(annot.get("/F", 0)) & (2 | 32)  # Hidden 或 NoView
+            if annot.get("/Subtype") not in ("/Link", "/Popup") and not hidden:
+                raise Fallback("annotations")
+        contents = page.get_contents()
+        if contents is None:
+            raise Fallback("no_image")
+        scan = _Scan(self.reader)
+        scan.run(contents, page.get("/Resources"), (1, 0, 0, 1, 0, 0))
+        if scan.image is None:
+            raise Fallback("no_image")
+        xobject, matrix, clip = scan.image
+        media_box = tuple(float(v) for v in page.mediabox)
+        return _place(xobject, matrix, clip, media_box, page.rotation % 360)
+
+
+def _decode_pixels(xobject, data, color=False):
+    """解码图像 XObject 的数据（pypdf 解开通用压缩后的结果）为 uint8 数组（图像空间方向，第0行在上）
+
+    color 为 False 时为灰度图，为 True 时为 BGR 图（灰度图像也展开为三通道）。
+    """
+    filters = [str(f) for f in _as_list(xobject.get("/Filter"))]
+    decode = [float(v) for v in _as_list(xobject.get("/Decode"))]
+    width, height = int(xobject["/Width"]), int(xobject["/Height"])
+    if "/DCTDecode" in filters or "/DCT" in filters or "/JPXDecode" in filters:
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR if color else cv2.IMREAD_GRAYSCALE)
+    elif "/CCITTFaxDecode" in filters or "/CCF" in filters:
+        # pypdf 把 CCITT 数据包装为TIFF（已按 BlackIs1 设置光度解释）
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as tiff:
+            image = np.array(tiff.convert("L"))
+    else:
+        channels = _color_channels(xobject.get("/ColorSpace"))
+        bits = int(xobject.get("/BitsPerComponent", 8))
+        row_bytes = (width * channels * bits + 7) // 8
+        pixels = np.frombuffer(data, np.uint8, count=row_bytes * height).reshape(height, row_bytes)
+        if bits == 1:
+            image = np.unpackbits(pixels, axis=1, count=width) * np.uint8(255)
+        elif channels == 3:
+            image = cv2.cvtColor(pixels.reshape(height, width, 3), cv2.COLOR_RGB2BGR if color else cv2.COLOR_RGB2GRAY)
+        else:
+            image = pixels.copy()
+    if image is None or image.shape[:2] != (height, width):
+        raise ValueError("图像数据与尺寸不符")
+    if decode == [1.0, 0.0]:
+        cv2.bitwise_not(image, dst=image)
+    if color and image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+
+def decode_page(page_image, dpi, timer=None, color=False):
+    """解码 PageImage 为页面方向、按 dpi 缩放的灰度图（color 时为 BGR 图），返回 (图像, 扫描分辨率)
+
+    dpi 为 None 时按扫描分辨率输出，只转正和裁剪，不缩放。
+    尺寸与目标相差不超过1像素时补齐或裁掉边缘像素，不做重采样。timer 记录读入的图像数据字节数。
+    """
+    data = page_image.xobject.get_data()
+    if timer:
+        timer.count("bytes_in", len(data))
+    image = _decode_pixels(page_image.xobject, data, color)
+    if page_image.transpose:
+        image = image.swapaxes(0, 1)
+    if page_image.flip_x:
+        image = image[:, ::-1]
+    if page_image.flip_y:
+        image = image[::-1]
+    height, width = image.shape[:2]
+    native_dpi = page_image.native_dpi(width)
+    x0, y0, x1, y1 = page_image.crop
+    image = image[round(y0 * height):max(round(y1 * height), round(y0 * height) + 1),
+                  round(x0 * width):max(round(x1 * width), round(x0 * width) + 1)]
+    if dpi is None:
+        return np.ascontiguousarray(image), native_dpi
+    target_w, target_h = page_image.output_size(dpi)
+    height, width = image.shape[:2]
+    if abs(width - target_w) <= 1 and abs(height - target_h) <= 1:
+        image = image[:target_h, :target_w]
+        pad_h, pad_w = target_h - image.shape[0], target_w - image.shape[1]
+        if pad_h or pad_w:
+            image = cv2.copyMakeBorder(image, 0, pad_h, 0, pad_w, cv2.BORDER_REPLICATE)
+    else:
+        shrink = target_w * target_h < width * height
+        image = cv2.resize(image, (target_w, target_h), interpolation=cv2.INTER_AREA if shrink else cv2.INTER_LINEAR)
+    return np.ascontiguousarray(image), native_dpi
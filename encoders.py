@@ -0,0 +1,343 @@
+"""二值图像输出编码器（不依赖 tkinter）
+
+阈值处理后的页面只有 0/255 两种值，按1位存储可以大幅减小文件：
+- png       8位灰度PNG（默认，与原来的输出相同）
+- png1      1位PNG
+- tiff-g4   CCITT Group 4 压缩的TIFF，每页一个文件
+- tiff-multi 每个输入一个多页 G4 TIFF
+- pdf       每个输入一个 G4 压缩的二值PDF
+多页格式逐页写入，不需要把所有页面同时放在内存中。
+超大页面可以按条带写入 png、png1 和 tiff-g4（见 open_strip_writer），不需要整页结果在内存中。
+"""
+import io
+import os
+import struct
+import uuid
+import zlib
+
+import cv2
+import numpy as np
+
+from defaults import DEFAULT_FORMAT, OUTPUT_FORMATS
+CONTAINER_FORMATS = ("tiff-multi", "pdf")  # 每个输入只输出一个文件的格式
+FORMAT_EXTENSIONS = {"png1": ".png", "tiff-g4": ".tif", "tiff-multi": ".tif", "pdf": ".pdf"}
+STRIP_FORMATS = ("png", "png1", "tiff-g4")  # 可以按条带逐步写入的格式
+PNG_COMPRESSION_LEVEL = 1  # 按条带写入PNG时的 zlib 压缩级别（与 cv2.imwrite 的默认值相同）
+G4_STRIP_ROWS = 256  # 按条带写入 G4 TIFF 时每个条带的行数
+
+
+def is_container(fmt):
+    """是否为多页容器格式（每个输入一个输出文件）"""
+    return fmt in CONTAINER_FORMATS
+
+
+def format_extension(fmt, default_ext=".png"):
+    """输出文件扩展名；png 格式沿用原来的规则（由 default_ext 决定）"""
+    return FORMAT_EXTENSIONS.get(fmt, default_ext)
+
+
+def to_bilevel(binary_image):
+    """0/255 数组转为PIL的1位图像（不做抖动）"""
+    from PIL import Image
+    return Image.fromarray(binary_image > 127)
+
+
+def encode_g4_tiff(binary_image, dpi=None):
+    """编码为单条带的 CCITT G4 TIFF，返回 bytes"""
+    image = to_bilevel(binary_image)
+    height, width = binary_image.shape[:2]
+    buffer = io.BytesIO()
+    save_args = {"compression": "group4", "tiffinfo": {278: height}}  # 278: RowsPerStrip，整页一个条带
+    if dpi:
+        save_args["dpi"] = (dpi, dpi)
+    image.save(buffer, format="TIFF", **save_args)
+    return buffer.getvalue()
+
+
+def g4_strip_data(tiff_bytes):
+    """取出单条带 G4 TIFF 中的压缩数据"""
+    from PIL import Image
+    with Image.open(io.BytesIO(tiff_bytes)) as tiff:
+        offset = tiff.tag_v2[273][0] if isinstance(tiff.tag_v2[273], tuple) else tiff.tag_v2[273]
+        length = tiff.tag_v2[279][0] if isinstance(tiff.tag_v2[279], tuple) else tiff.tag_v2[279]
+    return tiff_bytes[offset:offset + length]
+
+
+def encode_page(fmt, binary_image, ext=".png", dpi=None):
+    """编码单页（非容器格式），返回 bytes 或 uint8 数组"""
+    if fmt == "png":
+        return cv2.imencode(ext, binary_image)[1]
+    if fmt == "png1":
+        return cv2.imencode('.png', binary_image, [cv2.IMWRITE_PNG_BILEVEL, 1])[1]
+    if fmt == "tiff-g4":
+        return encode_g4_tiff(binary_image, dpi)
+    raise ValueError(f"不支持的单页输出格式: {fmt}")
+
+
+class _AtomicContainer:
+    """先写入同目录临时文件，close() 成功后再重命名为目标文件"""
+
+    def __init__(self, file_path):
+        directory, name = os.path.split(os.path.abspath(file_path))
+        self.file_path = file_path
+        self.tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+        self.page_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _finish(self):
+        raise NotImplementedError
+
+    def close(self):
+        self._finish()
+        os.replace(self.tmp_path, self.file_path)
+
+    def abort(self):
+        """放弃写入并删除临时文件"""
+        try:
+            self._finish()
+        except Exception:
+            pass
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class MultiPageTiffWriter(_AtomicContainer):
+    """逐页追加的多页 G4 TIFF"""
+
+    def __init__(self, file_path, dpi=None):
+        super().__init__(file_path)
+        from PIL import TiffImagePlugin
+        self.dpi = dpi
+        self._writer = TiffImagePlugin.AppendingTiffWriter(self.tmp_path, new=True)
+
+    def add_page(self, binary_image, dpi=None):
+        save_args = {"compression": "group4"}
+        dpi = dpi or self.dpi
+        if dpi:
+            save_args["dpi"] = (dpi, dpi)
+        to_bilevel(binary_image).save(self._writer, format="TIFF", **save_args)
+        self._writer.newFrame()
+        self.page_count += 1
+
+    def _finish(self):
+        if not self._writer.closed:
+            self._writer.close()
+
+
+class BilevelPdfWriter(_AtomicContainer):
+    """逐页写入的二值PDF，每页一个 CCITT G4 压缩的图像
+
+    页面对象写完即释放，结束时再写页面树、交叉引用表和 trailer。
+    """
+
+    def __init__(self, file_path, dpi=None):
+        super().__init__(file_path)
+        self.dpi = dpi or 72
+        self._file = open(self.tmp_path, "wb")
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3  # 1: Catalog, 2: Pages
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write_object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % obj_id)
+        if stream is None:
+            self._file.write(body + b"\nendobj\n")
+        else:
+            self._file.write(body[:-2] + b" /Length %d >>\nstream\n" % len(stream))
+            self._file.write(stream)
+            self._file.write(b"\nendstream\nendobj\n")
+
+    def _allocate(self, count):
+        ids = list(range(self._next_id, self._next_id + count))
+        self._next_id += count
+        return ids
+
+    def add_page(self, binary_image, dpi=None):
+        height, width = binary_image.shape[:2]
+        dpi = dpi or self.dpi
+        stream = g4_strip_data(encode_g4_tiff(binary_image))
+        image_id, content_id, page_id = self._allocate(3)
+
+        self._write_object(image_id, (
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+            b"/BitsPerComponent 1 /Filter [/CCITTFaxDecode] "
+            b"/DecodeParms [<< /K -1 /BlackIs1 true /Columns %d /Rows %d >>] >>"
+        ) % (width, height, width, height), stream)
+
+        page_w = width * 72.0 / dpi
+        page_h = height * 72.0 / dpi
+        content = b"q %.4f 0 0 %.4f 0 0 cm /image Do Q\n" % (page_w, page_h)
+        self._write_object(content_id, b"<< >>", content)
+        self._write_object(page_id, (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f] "
+            b"/Resources << /ProcSet [/PDF /ImageB] /XObject << /image %d 0 R >> >> /Contents %d 0 R >>"
+        ) % (page_w, page_h, image_id, content_id))
+        self._page_ids.append(page_id)
+        self.page_count += 1
+
+    def _finish(self):
+        if self._file.closed:
+            return
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self._write_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)))
+
+        xref_offset = self._file.tell()
+        self._file.write(b"xref\n0 %d\n" % self._next_id)
+        self._file.write(b"0000000000 65535 f \n")
+        for obj_id in range(1, self._next_id):
+            self._file.write(b"%010d 00000 n \n" % self._offsets[obj_id])
+        self._file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                         % (self._next_id, xref_offset))
+        self._file.close()
+
+
+def open_container(fmt, file_path, dpi=None):
+    """打开多页容器写入器，支持 with 语句；add_page(二值图像, dpi=None) 逐页追加，dpi 为 None 时按打开时的 dpi"""
+    if fmt == "tiff-multi":
+        return MultiPageTiffWriter(file_path, dpi)
+    if fmt == "pdf":
+        return BilevelPdfWriter(file_path, dpi)
+    raise ValueError(f"不是多页输出格式: {fmt}")
+
+
+class StripPngWriter(_AtomicContainer):
+    """按条带逐步写入的灰度PNG（bilevel 时为1位）：每行不做预测，压缩后立即写入文件"""
+
+    def __init__(self, file_path, width, height, bilevel=False, dpi=None):
+        super().__init__(file_path)
+        self.width = width
+        self.height = height
+        self.bilevel = bilevel
+        self.rows = 0
+        self._compressor = zlib.compressobj(PNG_COMPRESSION_LEVEL)
+        self._file = open(self.tmp_path, "wb")
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 1 if bilevel else 8, 0, 0, 0, 0))
+        if dpi:
+            per_meter = round(dpi / 0.0254)
+            self._chunk(b"pHYs", struct.pack(">IIB", per_meter, per_meter, 1))
+
+    def _chunk(self, kind, data):
+        self._file.write(struct.pack(">I", len(data)) + kind + data)
+        self._file.write(struct.pack(">I", zlib.crc32(kind + data)))
+
+    def add_strip(self, binary_strip):
+        """追加若干行（0/255 数组）"""
+        rows = np.packbits(binary_strip > 127, axis=1) if self.bilevel else binary_strip
+        data = np.zeros((rows.shape[0], rows.shape[1] + 1), np.uint8)  # 每行开头的预测方式 0（不预测）
+        data[:, 1:] = rows
+        compressed = self._compressor.compress(data.tobytes())
+        if compressed:
+            self._chunk(b"IDAT", compressed)
+        self.rows += binary_strip.shape[0]
+
+    def _finish(self):
+        if self._file.closed:
+            return
+        try:
+            if self.rows != self.height:
+                raise ValueError(f"写入了 {self.rows} 行，图像高度为 {self.height}")
+            self._chunk(b"IDAT", self._compressor.flush())
+            self._chunk(b"IEND", b"")
+        finally:
+            self._file.close()
+
+
+class StripG4TiffWriter(_AtomicContainer):
+    """按条带逐步写入的单页 G4 TIFF
+
+    每 G4_STRIP_ROWS 行单独做 G4 压缩，作为TIFF的一个条带依次写入文件，最后写入目录。
+    """
+
+    def __init__(self, file_path, width, height, dpi=None):
+        super().__init__(file_path)
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.rows = 0
+        self._pending = []  # 不足一个条带、尚未压缩的行
+        self._strips = []  # 已写入条带的 (偏移, 字节数)
+        self._file = open(self.tmp_path, "wb")
+        self._file.write(b"II*\x00" + struct.pack("<I", 0))  # 目录偏移在结束时写入
+
+    def _write_strip(self, rows):
+        data = g4_strip_data(encode_g4_tiff(rows))
+        self._strips.append((self._file.tell(), len(data)))
+        self._file.write(data)
+
+    def add_strip(self, binary_strip):
+        """追加若干行（0/255 数组）"""
+        self._pending.append(binary_strip)
+        self.rows += binary_strip.shape[0]
+        if sum(part.shape[0] for part in self._pending) < G4_STRIP_ROWS:
+            return
+        rows = np.concatenate(self._pending)
+        full = rows.shape[0] - rows.shape[0] % G4_STRIP_ROWS
+        for top in range(0, full, G4_STRIP_ROWS):
+            self._write_strip(rows[top:top + G4_STRIP_ROWS])
+        self._pending = [rows[full:]] if full < rows.shape[0] else []
+
+    def _finish(self):
+        if self._file.closed:
+            return
+        try:
+            if self.rows != self.height:
+                raise ValueError(f"写入了 {self.rows} 行，图像高度为 {self.height}")
+            if self._pending:
+                self._write_strip(np.concatenate(self._pending))
+            self._write_directory()
+        finally:
+            self._file.close()
+
+    def _write_directory(self):
+        count = len(self._strips)
+        entries = [  # (标签, 类型, 值)：类型 3 为 SHORT，4 为 LONG，5 为 RATIONAL
+            (256, 4, [self.width]), (257, 4, [self.height]), (258, 3, [1]), (259, 3, [4]),
+            (262, 3, [1]),  # 与 encode_g4_tiff 相同，0 为黑色
+            (273, 4, [offset for offset, _ in self._strips]), (277, 3, [1]), (278, 4, [G4_STRIP_ROWS]),
+            (279, 4, [length for _, length in self._strips]), (284, 3, [1]),
+        ]
+        if self.dpi:
+            entries[-1:-1] = [(282, 5, [self.dpi, 1]), (283, 5, [self.dpi, 1])]
+            entries.append((296, 3, [2]))
+        formats = {3: "H", 4: "I", 5: "I"}
+
+        if self._file.tell() % 2:
+            self._file.write(b"\x00")
+        ifd_offset = self._file.tell()
+        data_offset = ifd_offset + 2 + 12 * len(entries) + 4  # 放不进目录项的值写在目录后面
+        directory = [struct.pack("<H", len(entries))]
+        extra = []
+        for tag, kind, values in entries:
+            packed = struct.pack("<%d%s" % (len(values), formats[kind]), *values)
+            value_count = len(values) // 2 if kind == 5 else len(values)
+            if len(packed) <= 4:
+                directory.append(struct.pack("<HHI", tag, kind, value_count) + packed.ljust(4, b"\x00"))
+            else:
+                directory.append(struct.pack("<HHII", tag, kind, value_count, data_offset))
+                extra.append(packed)
+                data_offset += len(packed)
+        directory.append(struct.pack("<I", 0))
+        self._file.write(b"".join(directory + extra))
+        self._file.seek(4)
+        self._file.write(struct.pack("<I", ifd_offset))
+
+
+def open_strip_writer(fmt, file_path, width, height, dpi=None):
+    """打开按条带写入单页结果的写入器（fmt 见 STRIP_FORMATS），add_strip(二值条带) 按行依次追加"""
+    if fmt in ("png", "png1"):
+        return StripPngWriter(file_path, width, height, bilevel=fmt == "png1", dpi=dpi)
+    if fmt == "tiff-g4":
+        return StripG4TiffWriter(file_path, width, height, dpi)
+    raise ValueError(f"不支持按条带写入的格式: {fmt}")
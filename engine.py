@@ -0,0 +1,1490 @@
+"""图像/PDF 阈值处理核心
+
+不依赖 tkinter，GUI（main.py）与命令行（cli.py）共用同一套处理流程，
+可以在没有显示器的服务器/容器中运行。
+"""
+import os
+import hashlib
+import multiprocessing
+import queue
+import signal
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import nullcontext as _nullcontext
+from functools import lru_cache
+from itertools import groupby
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+import embedded
+import encoders
+import pagestats
+import pipeline
+import rasters
+import thresholds
+from defaults import DEFAULT_DPI, DEFAULT_THRESHOLD, DEFAULT_WORKERS
+from manifest import Manifest, sha256_file
+
+PROXY_DPI = 72  # 界面中先显示的低分辨率代理页
+DPI_PRESETS = {  # 按用途选择的分辨率，栅格化耗时约与 DPI 的平方成正比
+    "draft": 100,
+    "standard": DEFAULT_DPI,
+    "ocr": 300,
+    "archive": 400,
+}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')  # 比较时不区分大小写
+PDF_EXTENSIONS = ('.pdf',)
+SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS + PDF_EXTENSIONS
+PDF_CHUNK_PAGES = 8  # 每次调用 pdftoppm 转换的页数（即同时落盘的页面窗口），也是并行时每个任务单元的页数
+UNITS_PER_WORKER = 2  # 并行时每个进程已提交、尚未完成的任务单元数（其余单元在发现后排队）
+DISCOVERY_QUEUE_UNITS = 1024  # 发现线程最多领先处理循环的任务单元数
+DISCOVERY_REPORT_SECONDS = 0.2  # 报告已发现总页数的最短间隔
+PIPELINE_STAGES = ("threshold", "encode", "write")  # PDF页面流水线中栅格化之后的阶段，可分别设置线程数
+
+
+def resolve_dpi(value):
+    """DPI参数：正整数或 DPI_PRESETS 中的用途名，无效时抛出 ValueError"""
+    if isinstance(value, str) and value.strip().lower() in DPI_PRESETS:
+        return DPI_PRESETS[value.strip().lower()]
+    dpi = int(value)
+    if dpi <= 0:
+        raise ValueError(f"DPI必须大于0: {value}")
+    return dpi
+
+
+def is_pdf(file_path):
+    """是否为PDF文件"""
+    return file_path.lower().endswith(PDF_EXTENSIONS)
+
+
+def is_supported(file_path):
+    """是否为支持的图片或PDF文件"""
+    return file_path.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def is_paged(file_path):
+    """可能有多页、需要读取文件才能知道页数的格式（PDF和TIFF）"""
+    return is_pdf(file_path) or rasters.is_tiff(file_path)
+
+
+def convert_from_path(*args, **kwargs):
+    """延迟导入 pdf2image，只处理图片时不需要它"""
+    from pdf2image import convert_from_path as _convert_from_path
+    return _convert_from_path(*args, **kwargs)
+
+
+def pdfinfo_from_path(*args, **kwargs):
+    """延迟导入 pdf2image 的 pdfinfo"""
+    from pdf2image import pdfinfo_from_path as _pdfinfo_from_path
+    return _pdfinfo_from_path(*args, **kwargs)
+
+
+def pil_to_bgr(page):
+    """PIL(RGB)图像转为OpenCV的BGR数组（灰度图像转为单通道数组）"""
+    open_cv_image = np.asarray(page)
+    if open_cv_image.ndim == 2:
+        return open_cv_image
+    return cv2.cvtColor(open_cv_image, cv2.COLOR_RGB2BGR)  # RGB转BGR，直接写入新数组，不再经过翻转视图再复制
+
+
+def to_gray(image):
+    """BGR图像转灰度，已经是灰度图则原样返回"""
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def apply_threshold(gray_image, threshold_value, out=None):
+    """阈值处理 - 保留白色
+
+    out 为预先分配的同尺寸 uint8 数组时结果写入其中；传入 gray_image 本身即原地处理，不再分配新数组。
+    """
+    _, processed = cv2.threshold(gray_image, threshold_value, 255, cv2.THRESH_BINARY, dst=out)
+    return processed
+
+
+@lru_cache(maxsize=256)
+def threshold_lut(threshold_value):
+    """阈值查找表：与 cv2.THRESH_BINARY 相同，灰度 > 阈值为255，否则为0"""
+    lut = np.zeros(256, dtype=np.uint8)
+    lut[threshold_value + 1:] = 255
+    lut.flags.writeable = False
+    return lut
+
+
+def apply_threshold_lut(gray_image, threshold_value):
+    """用查找表做阈值处理（对小图预览更快，结果与 apply_threshold 相同）"""
+    return cv2.LUT(gray_image, threshold_lut(threshold_value))
+
+
+def fit_to_size(image, max_size):
+    """等比缩小图像使长边不超过 max_size，本身更小时原样返回"""
+    height, width = image.shape[:2]
+    if height <= max_size and width <= max_size:
+        return image
+    scale = max_size / max(height, width)
+    return cv2.resize(image, (int(width * scale), int(height * scale)))
+
+
+def read_image(file_path, grayscale=False):
+    """读取图片文件，失败时抛出 ValueError
+
+    grayscale 时由解码器直接输出单通道灰度图，不经过三通道中间结果。
+    """
+    image = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("无法读取图像文件")
+    return image
+
+
+def output_ext(file_path):
+    """输出编码格式：jpg/jpeg 用JPEG，其余用PNG"""
+    ext = os.path.splitext(file_path)[1].lower()
+    return '.jpg' if ext in ['.jpg', '.jpeg'] else '.png'
+
+
+def encode_image(ext, image):
+    """编码为 ext 格式，返回 uint8 数组"""
+    return cv2.imencode(ext, image)[1]
+
+
+def write_bytes(file_path, data):
+    """原子写入已编码的数据：先写同目录临时文件再重命名，中断时不会留下不完整的输出"""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(tmp_path, "xb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_image(file_path, image):
+    """按扩展名编码并保存（jpg/jpeg 用JPEG，其余用PNG）"""
+    write_bytes(file_path, encode_image(output_ext(file_path), image))
+
+
+def pdf_page_count(file_path):
+    """从PDF元数据读取总页数（pdfinfo，不做栅格化）"""
+    return int(pdfinfo_from_path(file_path)["Pages"])
+
+
+def file_page_count(file_path):
+    """文件的页数：PDF读取元数据，TIFF读取各页的目录，其他图片为1"""
+    if is_pdf(file_path):
+        return pdf_page_count(file_path)
+    if rasters.is_tiff(file_path):
+        return rasters.tiff_page_count(file_path)
+    return 1
+
+
+def _stage(timer, name):
+    """timer（perf.StageTimer）的计时上下文，timer 为 None 时不计时"""
+    return timer.stage(name) if timer else _nullcontext()
+
+
+def iter_pdf_page_files(file_path, page_count=None, chunk_size=PDF_CHUNK_PAGES, first_page=1, last_page=None,
+                        thread_count=1, dpi=DEFAULT_DPI, grayscale=True, timer=None):
+    """分块调用 pdftoppm 把页面写入临时目录，依次产出 (页码, 页面文件路径)，取下一页时删除上一页的文件
+
+    pdftoppm 的耗时计入 timer 的 rasterize 阶段。
+    """
+    if last_page is None:
+        last_page = page_count if page_count is not None else pdf_page_count(file_path)
+    with tempfile.TemporaryDirectory(prefix="pdfpages_") as tmp_dir:
+        for chunk_first in range(first_page, last_page + 1, chunk_size):
+            chunk_last = min(chunk_first + chunk_size - 1, last_page)
+            with _stage(timer, "rasterize"):
+                page_paths = convert_from_path(file_path, dpi=dpi, first_page=chunk_first, last_page=chunk_last,
+                                               thread_count=thread_count, output_folder=tmp_dir,
+                                               paths_only=True, grayscale=grayscale)
+            for page_number, page_path in enumerate(page_paths, chunk_first):
+                yield page_number, page_path
+                os.remove(page_path)
+
+
+def iter_pdf_pages(file_path, page_count=None, chunk_size=PDF_CHUNK_PAGES,
+                   first_page=1, last_page=None, thread_count=1, dpi=DEFAULT_DPI):
+    """单遍流式转换PDF（或其中 first_page-last_page 范围），依次产出 (页码, PIL图像)
+
+    每 chunk_size 页启动一次 pdftoppm，避免整本文档转换两遍或每页启动一个进程。
+    页面先由 pdftoppm 写入临时目录（paths_only），再逐页读入内存，
+    产出的图像在下一页读入前关闭并删除，因此内存占用与总页数无关。
+    thread_count 传给 pdf2image，让同一块内的页面由多个 pdftoppm 并行转换。
+    """
+    from PIL import Image
+
+    for page_number, page_path in iter_pdf_page_files(file_path, page_count, chunk_size, first_page, last_page,
+                                                      thread_count, dpi, grayscale=False):
+        with Image.open(page_path) as page:
+            page.load()
+            yield page_number, page
+
+
+def iter_pdf_gray_pages(file_path, page_count=None, chunk_size=PDF_CHUNK_PAGES,
+                        first_page=1, last_page=None, thread_count=1, dpi=DEFAULT_DPI, timer=None,
+                        embedded_images=False, sources=None, native_dpi=False):
+    """与 iter_pdf_pages 相同，但产出 (页码, 灰度uint8数组)
+
+    pdftoppm 以 -gray 直接输出8位灰度PGM，再由 OpenCV 解码到最终数组，
+    每页只分配一次整页内存，省去 RGB 图像、numpy 副本、BGR 副本和灰度转换。
+    产出的数组归调用方所有，可以原地做阈值处理。解码耗时计入 timer 的 gray 阶段。
+    embedded_images 时只有一张铺满页面的扫描图像的页直接解码该图像（见 embedded.PdfImages，计入 extract 阶段），
+    其余连续页仍一起交给 pdftoppm；sources 为字典时记录每页的 {页码: (来源, 扫描分辨率或回退原因)}，
+    来源为 "embedded" 或 "rasterized"。native_dpi 时直接解码的页按扫描分辨率产出，不缩放到 dpi。
+    """
+    if last_page is None:
+        last_page = page_count if page_count is not None else pdf_page_count(file_path)
+    if not embedded_images:
+        yield from _iter_rasterized_pages(file_path, chunk_size, first_page, last_page, thread_count, dpi, timer,
+                                          sources)
+        return
+    with embedded.PdfImages(file_path) as document:
+        for chunk_first in range(first_page, last_page + 1, chunk_size):
+            chunk_last = min(chunk_first + chunk_size - 1, last_page)
+            with _stage(timer, "extract"):
+                plan = [(i, document.plan(i)) for i in range(chunk_first, chunk_last + 1)]
+            for direct, group in groupby(plan, key=lambda item: not isinstance(item[1], str)):
+                group = list(group)
+                if not direct:
+                    reasons = dict(group)
+                    for i, gray_img in _iter_rasterized_pages(file_path, chunk_size, group[0][0], group[-1][0],
+                                                              thread_count, dpi, timer):
+                        _count_source(timer, sources, i, "rasterized", reasons[i])
+                        yield i, gray_img
+                    continue
+                for i, page_image in group:
+                    try:
+                        with _stage(timer, "extract"):
+                            gray_img, scan_dpi = embedded.decode_page(page_image, None if native_dpi else dpi, timer)
+                    except Exception:
+                        # 图像数据损坏或解码器不支持：这一页仍交给 pdftoppm
+                        for _, gray_img in _iter_rasterized_pages(file_path, chunk_size, i, i, thread_count, dpi,
+                                                                  timer):
+                            _count_source(timer, sources, i, "rasterized", "decode")
+                            yield i, gray_img
+                        continue
+                    _count_source(timer, sources, i, "embedded", scan_dpi)
+                    yield i, gray_img
+
+
+def _iter_rasterized_pages(file_path, chunk_size, first_page, last_page, thread_count, dpi, timer, sources=None):
+    """pdftoppm 转换 first_page-last_page 页，产出 (页码, 灰度图)（见 iter_pdf_gray_pages）"""
+    for page_number, page_path in iter_pdf_page_files(file_path, None, chunk_size, first_page, last_page,
+                                                      thread_count, dpi, grayscale=True, timer=timer):
+        with _stage(timer, "gray"):
+            gray_img = cv2.imread(page_path, cv2.IMREAD_GRAYSCALE)
+        if timer:
+            timer.count("bytes_in", os.path.getsize(page_path))
+        if gray_img is None:
+            raise ValueError(f"无法读取第{page_number}页的转换结果")
+        if sources is not None:
+            sources[page_number] = ("rasterized", None)
+        yield page_number, gray_img
+
+
+def render_pdf_page(file_path, page_number, dpi=DEFAULT_DPI, embedded_images=False):
+    """转换PDF的一页为BGR图像（界面预览用）
+
+    embedded_images 时与 iter_pdf_gray_pages 取同一来源：能直接解码嵌入图像的页按 dpi 解码该图像，
+    其余页面交给 pdftoppm，因此预览与批量处理、导出的结果一致。
+    """
+    if embedded_images:
+        with embedded.PdfImages(file_path) as document:
+            page_image = document.plan(page_number)
+            if not isinstance(page_image, str):
+                try:
+                    return embedded.decode_page(page_image, dpi, color=True)[0]
+                except Exception:
+                    pass  # 与 iter_pdf_gray_pages 相同，解码失败的页仍交给 pdftoppm
+    page = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+    return pil_to_bgr(page)
+
+
+def _count_source(timer, sources, page_number, source, detail):
+    """记录一页的来源：embedded 时 detail 为扫描分辨率，rasterized 时为回退原因（embedded.REASONS 中的键）"""
+    if sources is not None:
+        sources[page_number] = (source, detail)
+    if timer:
+        timer.count(f"{source}_pages")
+        if source == "rasterized":
+            timer.count(f"fallback_{detail}")
+
+
+def find_input_files(input_dir, recursive=False):
+    """列出目录中所有支持的图片和PDF（扩展名不区分大小写，见 discovery.iter_input_files）"""
+    import discovery
+
+    return list(discovery.iter_input_files(input_dir, recursive=recursive))
+
+
+def plan_tasks(all_files):
+    """计算总任务量（图片1页，PDF和TIFF读取实际页数）
+
+    返回 (file_tasks, total_tasks)，file_tasks 中页数为0表示无法读取的文件。
+    """
+    total_tasks = 0
+    file_tasks = []  # 存储每个文件的任务量
+
+    for file_path in all_files:
+        if is_paged(file_path):
+            try:
+                page_count = file_page_count(file_path)
+                total_tasks += page_count
+                file_tasks.append((file_path, page_count))
+            except Exception:
+                file_tasks.append((file_path, 0))  # 标记为错误文件
+        else:
+            total_tasks += 1
+            file_tasks.append((file_path, 1))
+
+    return file_tasks, total_tasks
+
+
+class BatchOptions:
+    """批量处理参数（可传给工作进程）"""
+
+    def __init__(self, threshold_value=DEFAULT_THRESHOLD, render_threads=1, dpi=DEFAULT_DPI, cache=None,
+                 resume=False, output_format=encoders.DEFAULT_FORMAT, threshold_method=thresholds.DEFAULT_METHOD,
+                 block_size=thresholds.DEFAULT_BLOCK_SIZE, k=None, threshold_threads=1, timer=None,
+                 stage_workers=None, queue_size=pipeline.DEFAULT_QUEUE_SIZE, input_root=None,
+                 strip_min_pixels=rasters.STRIP_MIN_PIXELS, page_stats=False, skip_blank=False, auto_crop=False,
+                 blank_ink=pagestats.BLANK_INK, embedded_images=True, native_dpi=False):
+        self.threshold_value = threshold_value
+        self.threshold_method = threshold_method  # 见 thresholds.METHODS
+        self.block_size = block_size  # 局部阈值方法的窗口边长
+        self.k = k  # 局部阈值方法的系数，None 表示使用该方法的默认值
+        self.threshold_threads = threshold_threads  # 局部阈值方法处理大页面时的线程数
+        self.timer = timer  # perf.StageTimer，None 表示不统计各阶段耗时
+        self.render_threads = render_threads  # 每个进程转换PDF时的 pdftoppm 线程数
+        self.dpi = dpi
+        self.cache = cache  # cache.ResultCache，None 表示不使用缓存
+        self.resume = resume  # 只处理任务清单中缺失或过期的项
+        self.output_format = output_format  # 见 encoders.OUTPUT_FORMATS
+        self.stage_workers = dict(stage_workers or {})  # PIPELINE_STAGES 中阶段 -> 线程数，未列出的为1
+        self.queue_size = queue_size  # 流水线各阶段之间的队列容量，0 表示逐页串行处理
+        self.input_root = input_root  # 输入目录：其子目录中文件的结果保存到输出目录的同名子目录，None 表示都在输出目录中
+        self.strip_min_pixels = strip_min_pixels  # 像素数不小于此值的TIFF页面按条带读取和写出（见 write_strip_page）
+        self.page_stats = page_stats  # 统计每页并写入 page_stats.jsonl（skip_blank 或 auto_crop 时总是统计）
+        self.skip_blank = skip_blank  # 跳过空白页，不编码、不写出
+        self.auto_crop = auto_crop  # 结果裁剪到内容边界框后再编码
+        self.blank_ink = blank_ink  # 墨迹比例不超过此值的页面视为空白（见 pagestats.page_stats）
+        self.embedded_images = embedded_images  # PDF中整页的扫描图像直接解码，不经过 pdftoppm（见 embedded）
+        self.native_dpi = native_dpi  # 直接解码的页按扫描分辨率输出，不缩放到 dpi（栅格化的页面仍按 dpi）
+
+    @property
+    def collect_stats(self):
+        return self.page_stats or self.skip_blank or self.auto_crop
+
+
+class BatchControl:
+    """批量处理的取消和暂停
+
+    基于 multiprocessing.Event，创建进程池时通过 initargs 传给工作进程，各进程在页与页之间调用 checkpoint()。
+    """
+
+    def __init__(self):
+        self.cancelled = multiprocessing.Event()
+        self.running = multiprocessing.Event()  # 清除表示暂停
+        self.running.set()
+
+    @property
+    def paused(self):
+        return not self.running.is_set()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.running.set()  # 唤醒暂停中的等待
+
+    def pause(self):
+        if not self.cancelled.is_set():
+            self.running.clear()
+
+    def resume(self):
+        self.running.set()
+
+    def checkpoint(self):
+        """暂停时等待继续；已取消时抛出 pipeline.Cancelled"""
+        self.running.wait()
+        if self.cancelled.is_set():
+            raise pipeline.Cancelled()
+
+
+_worker_control = None  # 工作进程中的 BatchControl（由 _init_worker 设置）
+
+
+def _init_worker(control, ignore_interrupt=False):
+    global _worker_control
+    _worker_control = control
+    if ignore_interrupt:
+        # 常驻进程池的工作进程不响应终端的 Ctrl+C，由主进程通过 control 停下
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def threshold_page(gray_image, options, out=None):
+    """按批量参数中的阈值方法处理一页（out 见 thresholds.apply）"""
+    with _stage(options.timer, "threshold"):
+        return thresholds.apply(gray_image, options.threshold_method, options.threshold_value, options.block_size,
+                                options.k, out=out, threads=options.threshold_threads)
+
+
+def threshold_key(options):
+    """阈值参数的描述，用于缓存键和任务清单（固定阈值时即阈值本身）"""
+    return thresholds.method_key(options.threshold_method, options.threshold_value, options.block_size, options.k)
+
+
+def output_key_params(file_path, options):
+    """输出缓存键中的处理参数：阈值参数，裁剪或跳过空白页时另加标记（结果不同或缓存中不应有空白页），
+    PDF直接解码嵌入图像时也另加标记（与 pdftoppm 栅格化的结果不同）"""
+    key = threshold_key(options)
+    if pdf_source(file_path, options):
+        key = f"{key}:embedded"
+    if options.auto_crop:
+        key = f"{key}:crop"
+    if options.skip_blank:
+        key = f"{key}:skip-blank"
+    return key
+
+
+def analyze_page(gray_image, options):
+    """页面统计（见 pagestats.page_stats，计入 stats 阶段），不需要统计时返回 None
+
+    墨迹按 options.threshold_value 统计（自动和局部阈值方法也是），用于判断空白页和内容边界框。
+    """
+    if not options.collect_stats:
+        return None
+    with _stage(options.timer, "stats"):
+        return pagestats.page_stats(gray_image, options.threshold_value, options.blank_ink)
+
+
+def is_skipped(stats, options):
+    """按统计结果跳过这一页（空白页且 options.skip_blank）"""
+    return stats is not None and options.skip_blank and stats["blank"]
+
+
+def crop_output(binary_image, stats, options):
+    """options.auto_crop 时把结果裁剪到内容边界框"""
+    if stats is None or not options.auto_crop:
+        return binary_image
+    cropped = pagestats.crop(binary_image, stats["bbox"])
+    if options.timer and cropped is not binary_image:
+        options.timer.count("cropped_pages")
+        options.timer.count("cropped_pixels", binary_image.size - cropped.size)
+    return cropped
+
+
+def stats_record(file_path, page_number, stats, options):
+    """页面统计索引（page_stats.jsonl）的记录，没有 output 字段（见 BatchRecords）"""
+    record = {"input": file_path, "page": page_number, "skipped": is_skipped(stats, options),
+              "cropped": bool(options.auto_crop and stats["bbox"])}
+    record.update(stats)
+    return record
+
+
+def skip_page(options):
+    """跳过的空白页处理完成（计入 blank_pages）"""
+    if options.timer:
+        options.timer.count("blank_pages")
+        options.timer.end_page()
+
+
+def blank_record(output_path, file_path, page_number, options):
+    """跳过的空白页的任务清单记录（没有输出文件，续做时视为已完成）"""
+    record = {"input": file_path, "page": page_number, "output": output_path, "status": "blank"}
+    record.update(output_params(file_path, options))
+    return record
+
+
+def file_output_dir(output_dir, file_path, options):
+    """文件的结果所在目录：options.input_root 下子目录中的文件对应 output_dir 下的同名子目录"""
+    if not options.input_root:
+        return output_dir
+    rel_dir = os.path.relpath(os.path.dirname(os.path.abspath(file_path)), os.path.abspath(options.input_root))
+    if rel_dir == os.curdir or rel_dir.startswith(os.pardir):
+        return output_dir
+    return os.path.join(output_dir, rel_dir)
+
+
+def pdf_output_dir(output_dir, file_path):
+    """PDF结果的专属文件夹 output_dir/<文件名>"""
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(file_path))[0])
+
+
+def output_path_for(output_dir, file_path, page_number=1, output_format=encoders.DEFAULT_FORMAT, page_count=None):
+    """输出文件路径
+
+    PDF和多页TIFF（page_count > 1）为 output_dir/<文件名>/page_N.png，图片为 output_dir 下的同名文件；
+    其他单页格式换成对应扩展名，多页格式为 output_dir/<文件名>.tif 或 .pdf。
+    """
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    ext = encoders.format_extension(output_format)
+    if encoders.is_container(output_format):
+        return os.path.join(output_dir, name + ext)
+    if is_pdf(file_path) or (page_count or 1) > 1:
+        return os.path.join(pdf_output_dir(output_dir, file_path), f"page_{page_number}{ext}")
+    if output_format == encoders.DEFAULT_FORMAT:
+        return os.path.join(output_dir, os.path.basename(file_path))
+    return os.path.join(output_dir, name + ext)
+
+
+def pdf_dpi_key(file_path, options):
+    """缓存键和任务清单中的分辨率：PDF为 options.dpi，直接解码的页按扫描分辨率输出时为 "native/<dpi>"，
+    不是PDF时为 None"""
+    if not is_pdf(file_path):
+        return None
+    return f"native/{options.dpi}" if pdf_source(file_path, options) == "embedded-native" else options.dpi
+
+
+def pdf_source(file_path, options):
+    """缓存键中PDF页面的来源：直接解码嵌入图像时为 "embedded"（按扫描分辨率输出时为 "embedded-native"），
+    全部交给 pdftoppm 或不是PDF时为 None"""
+    if not is_pdf(file_path) or not options.embedded_images:
+        return None
+    return "embedded-native" if options.native_dpi else "embedded"
+
+
+def page_dpi(dpi, options, sources, page_number):
+    """一页结果的分辨率：按扫描分辨率输出（options.native_dpi）时直接解码的页为扫描分辨率，其余为 dpi"""
+    source, detail = sources.get(page_number, (None, None))
+    return detail if options.native_dpi and source == "embedded" else dpi
+
+
+def output_params(file_path, options):
+    """写入任务清单、用于判断结果是否过期的处理参数"""
+    params = {"threshold": threshold_key(options), "dpi": pdf_dpi_key(file_path, options),
+              "format": options.output_format}
+    # 只在启用时记录（未启用时为 None，与旧记录中没有这几项相同）
+    params["crop"] = True if options.auto_crop else None
+    params["skip_blank"] = True if options.skip_blank else None
+    params["embedded"] = True if pdf_source(file_path, options) else None
+    return params
+
+
+def encode_output(output_path, binary_image, options, dpi=None):
+    """按输出格式编码单页结果"""
+    with _stage(options.timer, "encode"):
+        return encoders.encode_page(options.output_format, binary_image, output_ext(output_path), dpi)
+
+
+def contiguous_ranges(page_numbers):
+    """把升序页码列表合并为连续区间 [(first, last), ...]"""
+    ranges = []
+    for n in page_numbers:
+        if ranges and ranges[-1][1] == n - 1:
+            ranges[-1] = (ranges[-1][0], n)
+        else:
+            ranges.append((n, n))
+    return ranges
+
+
+def write_output(output_path, data, options):
+    """原子写入一页结果（计入 write 阶段），这一页处理完成"""
+    with _stage(options.timer, "write"):
+        write_bytes(output_path, data)
+    if options.timer:
+        options.timer.count("bytes_out", len(data))
+        options.timer.end_page()
+
+
+def output_record(output_path, data, file_path, page_number, options):
+    """一页结果的任务清单记录"""
+    record = {"input": file_path, "page": page_number, "output": output_path, "status": "done",
+              "sha256": hashlib.sha256(data).hexdigest(), "bytes": len(data)}
+    record.update(output_params(file_path, options))
+    return record
+
+
+def _source_fields(sources, page_number):
+    """任务清单记录中PDF页面的来源（见 iter_pdf_gray_pages），缓存命中或不是PDF时为空"""
+    entry = sources.get(page_number)
+    if entry is None:
+        return {}
+    source, detail = entry
+    return {"source": source, "native_dpi" if source == "embedded" else "fallback": detail}
+
+
+def save_output(output_path, data, file_path, page_number, options, records=None):
+    """原子写入一页结果，并向 records 追加任务清单记录"""
+    write_output(output_path, data, options)
+    if records is not None:
+        records.append(output_record(output_path, data, file_path, page_number, options))
+
+
+def add_container_page(writer, binary_image, options, dpi=None):
+    """向多页输出文件追加一页（编码和写入计入 encode 阶段），dpi 为 None 时按打开输出文件时的分辨率"""
+    with _stage(options.timer, "encode"):
+        writer.add_page(binary_image, dpi)
+    if options.timer:
+        options.timer.end_page()
+
+
+def close_container(writer, options):
+    """完成多页输出文件"""
+    with _stage(options.timer, "write"):
+        writer.close()
+    if options.timer:
+        options.timer.count("bytes_out", os.path.getsize(writer.file_path))
+
+
+def container_record(file_path, output_path, options, page_number=None):
+    """多页输出文件（整个文件一条）或按条带写出的单页结果的任务清单记录"""
+    record = {"input": file_path, "page": page_number, "output": output_path, "status": "done",
+              "sha256": sha256_file(output_path), "bytes": os.path.getsize(output_path)}
+    record.update(output_params(file_path, options))
+    return record
+
+
+def _iter_rendered_pages(file_path, options, first_page, last_page, sources=None):
+    """转换（PDF）或解码（TIFF）first_page-last_page 页，产出 (页码, 灰度图)
+
+    TIFF中超过 options.strip_min_pixels 且能按条带写出的页面不解码，产出 rasters.TiffPage。
+    PDF各页的来源记录到 sources（见 iter_pdf_gray_pages）。
+    """
+    timer = options.timer
+    if is_pdf(file_path):
+        yield from iter_pdf_gray_pages(file_path, first_page=first_page, last_page=last_page,
+                                       thread_count=options.render_threads, dpi=options.dpi, timer=timer,
+                                       embedded_images=options.embedded_images, sources=sources,
+                                       native_dpi=options.native_dpi)
+        return
+    strip_min_pixels = options.strip_min_pixels if options.output_format in encoders.STRIP_FORMATS else None
+    pages = rasters.iter_tiff_pages(file_path, first_page, last_page, strip_min_pixels)
+    while True:
+        with _stage(timer, "gray"):
+            item = next(pages, None)
+        if item is None:
+            return
+        i, page, gray_img = item
+        if gray_img is None:
+            yield i, page
+            continue
+        if timer:
+            timer.count("bytes_in", page.data_bytes)
+        yield i, gray_img
+
+
+def _iter_page_sources(file_path, options, first_page, last_page, sources=None):
+    """按页码顺序产出 (页码, 类型, 数据, 输出缓存键)
+
+    类型为 "output" 时数据是缓存的编码结果；"cached" 时是页面缓存中的灰度图；
+    "rendered" 时是新转换的灰度图；"strips" 时是按条带处理的超大TIFF页面（rasters.TiffPage，不经过缓存）。
+    未缓存的连续页一起交给 pdftoppm，新转换的PDF页面的来源记录到 sources（见 iter_pdf_gray_pages）。
+    直接解码的页按扫描分辨率输出时不使用页面缓存（缓存的灰度图中没有各页的分辨率），只使用输出缓存。
+    """
+    cache = options.cache
+    timer = options.timer
+    if not cache:
+        for i, gray_img in _iter_rendered_pages(file_path, options, first_page, last_page, sources):
+            yield i, "rendered" if isinstance(gray_img, np.ndarray) else "strips", gray_img, None
+        return
+
+    use_output_cache = not encoders.is_container(options.output_format)
+    source = pdf_source(file_path, options)
+    use_page_cache = source != "embedded-native"
+    file_hash = cache.file_hash(file_path)
+    dpi = pdf_dpi_key(file_path, options)
+    keys = {}
+    plan = []
+    for i in range(first_page, last_page + 1):
+        page_key = cache.page_key(file_hash, i, dpi, source)
+        output_key = None
+        if use_output_cache:
+            output_key = cache.output_key(page_key, output_key_params(file_path, options), options.output_format)
+        keys[i] = (page_key, output_key)
+        if output_key and cache.has_output(output_key):
+            plan.append((i, "output"))
+        elif use_page_cache and cache.has_page(page_key):
+            plan.append((i, "cached"))
+        else:
+            plan.append((i, "rendered"))
+
+    for kind, group in groupby(plan, key=lambda item: item[1]):
+        pages = [i for i, _ in group]
+        if kind == "rendered":
+            for i, gray_img in _iter_rendered_pages(file_path, options, pages[0], pages[-1], sources):
+                if not isinstance(gray_img, np.ndarray):
+                    yield i, "strips", gray_img, None
+                    continue
+                if use_page_cache:
+                    with _stage(timer, "cache"):
+                        cache.put_page(keys[i][0], gray_img)
+                yield i, kind, gray_img, keys[i][1]
+        elif kind == "cached":
+            for i in pages:
+                with _stage(timer, "cache"):
+                    gray_img = cache.get_page(keys[i][0])
+                yield i, kind, gray_img, keys[i][1]
+        else:
+            for i in pages:
+                with _stage(timer, "cache"):
+                    data = cache.get_output(keys[i][1])
+                yield i, kind, data, None
+
+
+def process_pages(file_path, output_dir, options, first_page, last_page, page_count, progress=None,
+                  records=None, control=None):
+    """处理PDF或多页TIFF的 first_page-last_page 页，结果保存为 output_dir/<文件名>/page_N.png（或所选格式）
+
+    启用缓存时，输出已缓存的页直接写出，页面已缓存的页跳过栅格化，只转换剩余页。
+    TIFF中的超大页面在阈值阶段按条带读取、处理并写出（见 write_strip_page），不经过编码和写入阶段的队列。
+    需要页面统计时（options.collect_stats）在阈值阶段之前统计新转换和页面已缓存的页，记录随结果交给 records；
+    跳过的空白页不编码、不写出（多页输出格式中也没有这一页），裁剪的页面在编码前裁剪。
+    各页经过 栅格化 -> 阈值 -> 编码 -> 写入 的流水线（见 pipeline.run），各阶段在不同线程中同时处理不同的页，
+    线程数见 options.stage_workers，阶段之间的队列容量为 options.queue_size。
+    多页输出格式的编码和写入在调用线程中按页码顺序进行。progress(status) 在每页完成后调用，
+    PDF页面的状态中注明直接解码了嵌入图像还是栅格化（及回退原因），任务清单记录中也有页面来源；
+    options.native_dpi 时直接解码的页按扫描分辨率编码（多页输出格式中各页的分辨率可以不同）。
+    control（BatchControl）暂停时在页与页之间等待，取消时停止流水线并抛出 pipeline.Cancelled。
+    """
+    filename = os.path.splitext(os.path.basename(file_path))[0]
+    label = "PDF" if is_pdf(file_path) else "TIFF"
+    dpi = options.dpi if is_pdf(file_path) else None
+    fmt = options.output_format
+    cache = options.cache
+    sources = {}  # PDF页码 -> (来源, 扫描分辨率或回退原因)，由 source() 所在的线程写入
+    writer = None
+    if encoders.is_container(fmt):
+        container_path = output_path_for(output_dir, file_path, output_format=fmt)
+        writer = encoders.open_container(fmt, container_path, dpi)
+    else:
+        # 处理PDF文件 - 创建对应文件夹
+        os.makedirs(pdf_output_dir(output_dir, file_path), exist_ok=True)
+
+    def page_path(i):
+        return output_path_for(output_dir, file_path, i, fmt, page_count)
+
+    # 各阶段处理 [页码, 类型, 数据, 输出缓存键, 页面统计]，类型见 _iter_page_sources，"output" 的页只需写出，
+    # 跳过的空白页类型改为 "blank"
+    def threshold_stage(page):
+        if page[1] == "strips":
+            write_strip_page(page[2], page_path(page[0]), options, dpi)
+            page[2] = None
+        elif page[1] != "output":
+            page[4] = analyze_page(page[2], options)
+            if is_skipped(page[4], options):
+                page[1], page[2] = "blank", None
+                return page
+            page[2] = threshold_page(page[2], options, out=page[2])  # 灰度页不再使用，尽量原地处理
+            page[2] = crop_output(page[2], page[4], options)
+        return page
+
+    def encode_stage(page):
+        i, kind, data, output_key, _ = page
+        if kind not in ("output", "strips", "blank"):
+            page[2] = encode_output(page_path(i), data, options, page_dpi(dpi, options, sources, i))
+            if output_key:
+                with _stage(options.timer, "cache"):
+                    cache.put_output(output_key, page[2])
+        return page
+
+    def write_stage(page):
+        i, kind, data, _, stats = page
+        output_path = page_path(i)
+        if kind == "strips":
+            record = container_record(file_path, output_path, options, i) if records is not None else None
+        elif kind == "blank":
+            skip_page(options)
+            record = blank_record(output_path, file_path, i, options) if records is not None else None
+        else:
+            write_output(output_path, data, options)
+            record = None
+            if records is not None:
+                record = output_record(output_path, data, file_path, i, options)
+                record.update(_source_fields(sources, i))
+        return i, kind, record, stats
+
+    processed_count = 0
+
+    def report(i, kind):
+        nonlocal processed_count
+        processed_count += 1
+        if progress:
+            if kind == "output":
+                progress(f"缓存命中: {filename} (第{i}/{page_count}页)")
+            elif kind == "cached":
+                progress(f"处理{label}: {filename} (第{i}/{page_count}页，页面已缓存)")
+            elif kind == "strips":
+                progress(f"处理{label}: {filename} (第{i}/{page_count}页，按条带)")
+            elif kind == "blank":
+                progress(f"跳过空白页: {filename} (第{i}/{page_count}页)")
+            elif i in sources and (sources[i][0] == "embedded" or sources[i][1]):
+                source, detail = sources[i]
+                how = f"嵌入图像 {detail}dpi" if source == "embedded" else f"栅格化：{embedded.REASONS[detail]}"
+                progress(f"处理{label}: {filename} (第{i}/{page_count}页，{how})")
+            else:
+                progress(f"处理{label}: {filename} (第{i}/{page_count}页)")
+
+    def add_stats(i, stats):
+        if stats is not None and records is not None:
+            records.append(stats_record(file_path, i, stats, options))
+
+    def add_page(page):
+        if page[1] == "blank":
+            skip_page(options)
+        else:
+            add_container_page(writer, page[2], options, page_dpi(dpi, options, sources, page[0]))
+        add_stats(page[0], page[4])
+        report(page[0], page[1])
+
+    def finish_page(result):
+        i, kind, record, stats = result
+        if record is not None and records is not None:
+            records.append(record)
+        add_stats(i, stats)
+        report(i, kind)
+
+    workers = options.stage_workers
+    if writer:
+        stages = [pipeline.Stage("threshold", threshold_stage, workers.get("threshold", 1))]
+        sink = add_page
+    else:
+        stages = [pipeline.Stage(name, func, workers.get(name, 1))
+                  for name, func in zip(PIPELINE_STAGES, (threshold_stage, encode_stage, write_stage))]
+        sink = finish_page
+    def source():
+        for page in _iter_page_sources(file_path, options, first_page, last_page, sources):
+            if control:
+                control.checkpoint()
+            yield list(page) + [None]
+
+    try:
+        pipeline.run(source(), stages, sink, options.queue_size, options.timer,
+                     cancel=control.cancelled if control else None)
+    except BaseException:
+        if writer:
+            writer.abort()
+        raise
+
+    if writer and writer.page_count == 0:
+        # 所有页都是跳过的空白页：不留下没有页面的输出文件
+        writer.abort()
+        if records is not None:
+            records.append(blank_record(container_path, file_path, None, options))
+    elif writer:
+        close_container(writer, options)
+        if records is not None:
+            record = container_record(file_path, container_path, options)
+            if sources:
+                record["embedded_pages"] = sum(source == "embedded" for source, _ in sources.values())
+                record["rasterized_pages"] = len(sources) - record["embedded_pages"]
+            records.append(record)
+    return processed_count
+
+
+def write_strip_page(page, output_path, options, dpi=None):
+    """逐条带读取超大TIFF页面（rasters.TiffPage），阈值处理后按条带写出（格式见 encoders.STRIP_FORMATS）
+
+    峰值内存与条带大小而不是页面大小成正比。自动阈值方法读两遍（第一遍统计直方图），
+    局部方法每个条带多读相邻条带的半个窗口，结果与整页处理相同。
+    """
+    timer = options.timer
+    rows = rasters.strip_rows(page.width, thresholds.valid_block_size(options.block_size))
+    read_time = 0.0
+
+    def read_strips():
+        nonlocal read_time
+        strips = page.iter_strips(rows)
+        while True:
+            start = time.perf_counter()
+            item = next(strips, None)
+            read_time += time.perf_counter() - start
+            if item is None:
+                return
+            yield item
+
+    writer = encoders.open_strip_writer(options.output_format, output_path, page.width, page.height, dpi)
+    try:
+        binaries = thresholds.apply_strips(read_strips, options.threshold_method, options.threshold_value,
+                                           options.block_size, options.k, options.threshold_threads)
+        while True:
+            # 读取条带在阈值处理的生成器中进行，两者的耗时分开计入 gray 和 threshold 阶段
+            start, read_before = time.perf_counter(), read_time
+            item = next(binaries, None)
+            if timer:
+                read = read_time - read_before
+                timer.record("gray", read)
+                timer.record("threshold", time.perf_counter() - start - read)
+            if item is None:
+                break
+            with _stage(timer, "encode"):
+                writer.add_strip(item[1])
+        with _stage(timer, "write"):
+            writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    if timer:
+        timer.count("bytes_in", page.data_bytes)
+        timer.count("bytes_out", os.path.getsize(output_path))
+        timer.end_page()
+
+
+def process_image_file(file_path, output_dir, options, progress=None, records=None, control=None):
+    """处理单张图片，结果保存为 output_dir 下的同名文件（或所选格式）
+
+    超过 options.strip_min_pixels 的TIFF按条带读取和写出（见 write_strip_page），不经过缓存。
+    """
+    if control:
+        control.checkpoint()
+    filename = os.path.splitext(os.path.basename(file_path))[0]
+    fmt = options.output_format
+    output_path = output_path_for(output_dir, file_path, output_format=fmt)
+    cache = options.cache
+
+    if rasters.is_tiff(file_path) and fmt in encoders.STRIP_FORMATS:
+        page = rasters.open_tiff_page(file_path)
+        if page.pixels >= options.strip_min_pixels and page.strip_readable:
+            if progress:
+                progress(f"处理图片: {filename} (按条带)")
+            write_strip_page(page, output_path, options)
+            if records is not None:
+                records.append(container_record(file_path, output_path, options, 1))
+            return 1
+
+    output_key = None
+    if cache and not encoders.is_container(fmt):
+        page_key = cache.page_key(cache.file_hash(file_path), 1, None)
+        output_key = cache.output_key(page_key, output_key_params(file_path, options), fmt + output_ext(output_path))
+        with _stage(options.timer, "cache"):
+            data = cache.get_output(output_key)
+        if data is not None:
+            if progress:
+                progress(f"缓存命中: {filename}")
+            save_output(output_path, data, file_path, 1, options, records)
+            return 1
+
+    # 每张图片只报告一次进度（处理、跳过或无法读取），串行时进度计数与总页数一致
+    with _stage(options.timer, "gray"):
+        gray_img = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
+    if gray_img is None:
+        if progress:
+            progress(f"无法读取图片: {filename}")
+        return 0
+    if options.timer:
+        options.timer.count("bytes_in", os.path.getsize(file_path))
+    stats = analyze_page(gray_img, options)
+    if stats is not None and records is not None:
+        records.append(stats_record(file_path, 1, stats, options))
+    if is_skipped(stats, options):
+        if progress:
+            progress(f"跳过空白页: {filename}")
+        skip_page(options)
+        if records is not None:
+            page_number = None if encoders.is_container(fmt) else 1
+            records.append(blank_record(output_path, file_path, page_number, options))
+        return 1
+    if progress:
+        progress(f"处理图片: {filename}")
+    binary = crop_output(threshold_page(gray_img, options, out=gray_img), stats, options)
+    if encoders.is_container(fmt):
+        writer = encoders.open_container(fmt, output_path)
+        try:
+            add_container_page(writer, binary, options)
+        except BaseException:
+            writer.abort()
+            raise
+        close_container(writer, options)
+        if records is not None:
+            records.append(container_record(file_path, output_path, options))
+        return 1
+    data = encode_output(output_path, binary, options)
+    if output_key:
+        with _stage(options.timer, "cache"):
+            cache.put_output(output_key, data)
+    save_output(output_path, data, file_path, 1, options, records)
+    return 1
+
+
+def process_file(file_path, page_count, output_dir, options, progress=None, records=None):
+    """处理单个图片或PDF，返回处理的页面数
+
+    PDF和多页TIFF结果保存在 output_dir/<文件名>/page_N.png，图片保存为同名文件。
+    progress(status) 在每页开始处理前调用。
+    """
+    if is_pdf(file_path) or page_count > 1:
+        if page_count <= 0:
+            return 0
+        return process_pages(file_path, output_dir, options, 1, page_count, page_count, progress, records)
+    return process_image_file(file_path, output_dir, options, progress, records)
+
+
+def _iter_export_sources(file_path, page_count, options, ready, pages):
+    """按页码顺序产出 [页码, 类型, 数据]：类型为 "binary"（ready 中已阈值处理的结果）、
+    "memory"（pages 中已转换的页面，转换为灰度图）或 "rendered"（新转换的灰度图）"""
+    plan = [(i, "binary" if i in ready else "memory" if i in pages else "rendered") for i in range(1, page_count + 1)]
+    for kind, group in groupby(plan, key=lambda item: item[1]):
+        numbers = [i for i, _ in group]
+        if kind == "rendered":
+            for i, gray_img in iter_pdf_gray_pages(file_path, first_page=numbers[0], last_page=numbers[-1],
+                                                   thread_count=options.render_threads, dpi=options.dpi,
+                                                   embedded_images=options.embedded_images):
+                yield [i, kind, gray_img]
+        else:
+            for i in numbers:
+                yield [i, kind, ready[i] if kind == "binary" else to_gray(pages[i])]
+
+
+def export_pdf(file_path, page_count, save_dir, options, progress=None, cancel=None, ready=None, pages=None):
+    """“保存全部页”：按 options（BatchOptions）的阈值方法、DPI和输出格式处理PDF所有页面保存到 save_dir，返回保存位置
+
+    单页格式保存为 pdf_page_N.扩展名，多页格式保存为 <文件名>.tif/.pdf。
+    ready 为 {页码: 二值图}，是已按相同参数处理好的页面，直接编码；pages 为 {页码: BGR或灰度图}，
+    是已按 options.dpi 转换好的页面，跳过栅格化。其余页面经过与批量处理相同的流水线。
+    progress(current, status) 在每页保存后调用。cancel（threading.Event）被设置时停止并抛出
+    pipeline.Cancelled；取消或出错时删除本次已写出的页面文件和未完成的多页文件。
+    """
+    output_format = options.output_format
+    dpi = options.dpi
+    ext = encoders.format_extension(output_format)
+    writer = None
+    if encoders.is_container(output_format):
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        writer = encoders.open_container(output_format, os.path.join(save_dir, name + ext), dpi)
+    written = []
+
+    def threshold_stage(page):
+        if page[1] == "rendered":
+            page[2] = threshold_page(page[2], options, out=page[2])
+        elif page[1] == "memory":
+            page[2] = threshold_page(page[2], options)  # 灰度图可能就是界面缓存中的页面，不能原地处理
+        return page
+
+    def encode_stage(page):
+        page[2] = encoders.encode_page(output_format, page[2], '.png', dpi)
+        return page
+
+    def write_stage(page):
+        # 生成文件名（带页码）
+        output_path = os.path.join(save_dir, f"pdf_page_{page[0]}{ext}")
+        write_bytes(output_path, page[2])
+        written.append(output_path)
+        return page
+
+    def report(page):
+        if writer:
+            writer.add_page(page[2])
+        if progress:
+            progress(page[0], f"已保存第 {page[0]}/{page_count} 页")
+
+    workers = options.stage_workers
+    if writer:
+        stages = [pipeline.Stage("threshold", threshold_stage, workers.get("threshold", 1))]
+    else:
+        stages = [pipeline.Stage(name, func, workers.get(name, 1))
+                  for name, func in zip(PIPELINE_STAGES, (threshold_stage, encode_stage, write_stage))]
+    source = _iter_export_sources(file_path, page_count, options, ready or {}, pages or {})
+    try:
+        pipeline.run(source, stages, report, options.queue_size, cancel=cancel)
+    except BaseException:
+        if writer:
+            writer.abort()
+        for output_path in written:
+            try:
+                os.remove(output_path)
+            except OSError:
+                pass
+        raise
+    if writer:
+        writer.close()
+    return writer.file_path if writer else save_dir
+
+
+def file_pending_pages(manifest, file_path, page_count, output_dir, options):
+    """续做：文件中需要处理的页码列表，已完成且未过期的页不再处理
+
+    多页输出格式以整个输出文件为单位判断。
+    """
+    fmt = options.output_format
+    output_dir = file_output_dir(output_dir, file_path, options)
+    params = output_params(file_path, options)
+    if encoders.is_container(fmt):
+        done = manifest.is_current(file_path, output_path_for(output_dir, file_path, output_format=fmt), params)
+        return [] if done else list(range(1, page_count + 1))
+    return [
+        i for i in range(1, page_count + 1)
+        if not manifest.is_current(file_path, output_path_for(output_dir, file_path, i, fmt, page_count), params)
+    ]
+
+
+def pending_pages(manifest, file_tasks, output_dir, options):
+    """续做：返回 {文件: 需要处理的页码列表}"""
+    return {file_path: file_pending_pages(manifest, file_path, page_count, output_dir, options)
+            for file_path, page_count in file_tasks}
+
+
+def file_units(file_path, page_count, pages=None, chunk_size=PDF_CHUNK_PAGES, whole_file=False):
+    """把一个文件拆成任务单元 [(文件, 起始页, 结束页, 总页数), ...]，pages 为 None 时包含全部页"""
+    pages = range(1, page_count + 1) if pages is None else pages
+    if whole_file:
+        return [(file_path, 1, page_count, page_count)] if pages else []
+    units = []
+    for range_first, range_last in contiguous_ranges(pages):
+        for first_page in range(range_first, range_last + 1, chunk_size):
+            units.append((file_path, first_page, min(first_page + chunk_size - 1, range_last), page_count))
+    return units
+
+
+def split_tasks(file_tasks, chunk_size=PDF_CHUNK_PAGES, pending=None, whole_files=False):
+    """把 (文件, 页数) 拆成任务单元 (文件, 起始页, 结束页, 总页数)
+
+    PDF按 chunk_size 页一块拆分，使大文档的页面也能分散到多个进程；图片为单个单元。
+    pending 为 {文件: 页码列表} 时只包含这些页；whole_files 时每个文件一个单元（多页输出格式）。
+    """
+    units = []
+    for file_path, page_count in file_tasks:
+        pages = None if pending is None else pending.get(file_path, [])
+        units.extend(file_units(file_path, page_count, pages, chunk_size, whole_files))
+    return units
+
+
+_FEED_END = object()
+
+
+class _UnitFeed:
+    """在后台线程中逐个文件读取PDF页数、（续做时）过滤已完成的页并拆分任务单元，边发现边交给处理循环
+
+    迭代产出 (类型, 文件, 值)：类型为 "unit" 时值为任务单元，"skip" 时为续做跳过的页数，
+    "error" 时为错误信息。on_total(已发现的总页数, 是否已发现全部文件) 在发现过程中和结束时调用。
+    """
+
+    def __init__(self, file_tasks, output_dir, options, manifest, on_total=None):
+        self.file_tasks = file_tasks
+        self.output_dir = output_dir
+        self.options = options
+        self.manifest = manifest
+        self.on_total = on_total
+        self.total = 0
+        self.queue = queue.Queue(maxsize=DISCOVERY_QUEUE_UNITS)
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="batch-discovery", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        options = self.options
+        whole_file = encoders.is_container(options.output_format)
+        last_report = time.perf_counter()
+        try:
+            for file_path, page_count in self.file_tasks:
+                if self._stop.is_set():
+                    return
+                if page_count is None:
+                    try:
+                        page_count = file_page_count(file_path)
+                    except Exception as e:
+                        page_count = 0
+                        self._put(("error", file_path, f"无法读取文件 {os.path.basename(file_path)} 的页数: {str(e)}"))
+                self.total += page_count
+                pages = None
+                if options.resume:
+                    pages = file_pending_pages(self.manifest, file_path, page_count, self.output_dir, options)
+                    if page_count - len(pages):
+                        self._put(("skip", file_path, page_count - len(pages)))
+                for unit in file_units(file_path, page_count, pages, whole_file=whole_file):
+                    if not self._put(("unit", file_path, unit)):
+                        return
+                if self.on_total and time.perf_counter() - last_report >= DISCOVERY_REPORT_SECONDS:
+                    self.on_total(self.total, False)
+                    last_report = time.perf_counter()
+        except BaseException as e:
+            self._error = e
+        finally:
+            if self.on_total and self._error is None and not self._stop.is_set():
+                self.on_total(self.total, True)
+            self._put(_FEED_END)
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is _FEED_END:
+                break
+            yield item
+        if self._error is not None:
+            raise self._error
+
+    def pending(self):
+        """已发现、尚未交给处理循环的单元数"""
+        return self.queue.qsize()
+
+    def close(self):
+        self._stop.set()
+
+
+def process_unit(unit, output_dir, options, progress=None, records=None, control=None):
+    """处理一个任务单元，返回处理的页面数"""
+    file_path, first_page, last_page, page_count = unit
+    output_dir = file_output_dir(output_dir, file_path, options)
+    os.makedirs(output_dir, exist_ok=True)
+    if is_pdf(file_path) or page_count > 1:
+        return process_pages(file_path, output_dir, options, first_page, last_page, page_count,
+                             progress, records, control)
+    return process_image_file(file_path, output_dir, options, progress, records, control)
+
+
+def _process_unit_worker(unit, output_dir, options):
+    """工作进程入口：返回 (处理的页面数, 缓存统计, 任务清单记录, 计时统计)
+
+    被取消时返回已完成页面的记录，页面数为 None。
+    """
+    records = []
+    try:
+        count = process_unit(unit, output_dir, options, records=records, control=_worker_control)
+    except pipeline.Cancelled:
+        count = None
+    return (count, options.cache.stats if options.cache else None, records,
+            options.timer.snapshot() if options.timer else None)
+
+
+def _warm_up_worker():
+    """进程池的预热任务（常驻服务和并行批量处理）：导入按需加载的模块并做一次阈值处理和编码，返回进程号"""
+    try:
+        import pdf2image  # noqa: F401
+    except ImportError:
+        pass
+    from PIL import Image  # noqa: F401
+    encode_image(".png", apply_threshold(np.zeros((8, 8), np.uint8), DEFAULT_THRESHOLD))
+    return os.getpid()
+
+
+class WorkerPool:
+    """常驻进程池（见 service.py）：工作进程预先启动并完成导入，之后提交的任务单元没有进程启动的开销
+
+    submit() 返回的 Future 结果同并行批量处理的工作进程：(处理的页面数, 缓存统计, 任务清单记录, 计时统计)。
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, control=None):
+        self.workers = max(1, workers)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(control, True))
+
+    def warm_up(self):
+        """启动全部工作进程（同时提交 workers 个预热任务），返回已就绪的进程号"""
+        futures = [self.executor.submit(_warm_up_worker) for _ in range(self.workers)]
+        return sorted({future.result() for future in futures})
+
+    def submit(self, unit, output_dir, options):
+        return self.executor.submit(_process_unit_worker, unit, output_dir, options)
+
+    def shutdown(self, cancel=False):
+        """关闭进程池；cancel 时尚未开始的单元不再执行（正在处理的单元由 BatchControl 停下）"""
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
+
+
+class BatchRecords:
+    """批量处理的记录入口：有 output 的记录追加到任务清单，页面统计（见 stats_record）追加到统计索引"""
+
+    def __init__(self, manifest, stats_index=None):
+        self.manifest = manifest
+        self.stats_index = stats_index
+
+    def append(self, record):
+        if "output" in record:
+            self.manifest.append(record)
+        elif self.stats_index is not None:
+            self.stats_index.append(record)
+
+
+def record_failure(manifest, unit, output_dir, options, error):
+    """把任务单元的各页（多页输出格式为整个文件）记为失败，续做时重新处理"""
+    file_path, first_page, last_page, page_count = unit
+    fmt = options.output_format
+    output_dir = file_output_dir(output_dir, file_path, options)
+    pages = [None] if encoders.is_container(fmt) else range(first_page, last_page + 1)
+    for i in pages:
+        record = {"input": file_path, "page": i,
+                  "output": output_path_for(output_dir, file_path, i or 1, fmt, page_count),
+                  "status": "failed", "error": str(error)}
+        record.update(output_params(file_path, options))
+        manifest.append(record)
+
+
+def run_batch(file_tasks, output_dir, options, workers=1, progress=None, on_error=None, control=None,
+              on_total=None):
+    """批量处理，返回本次处理的文件/页面数
+
+    file_tasks 为 (文件, 页数) 的列表或迭代器（如 discovery.iter_file_tasks），页数为 None 的PDF在处理前才读取页数；
+    文件在后台线程中边发现边拆分为任务单元，第一个单元不必等待全部文件发现完成。
+    on_total(total, complete) 报告已发现的总页数（complete 表示已发现全部文件）。
+    progress(current, status) 报告已开始（并行时为已完成）的任务数；
+    on_error(message) 报告单个文件的错误，不中断其余文件。
+    workers > 1 时把文件和PDF页面块分配到多个进程并行处理，输出文件名与串行时相同。
+    每页结果记录在 output_dir/manifest.jsonl；options.resume 时跳过已完成且未过期的页。
+    需要页面统计时（options.collect_stats）每页的统计追加到 output_dir/page_stats.jsonl。
+    启用缓存时，结束后按容量上限淘汰旧缓存，命中统计见 options.cache.stats。
+    control（BatchControl）可以暂停或取消：在页与页之间停下，抛出 pipeline.Cancelled；
+    已完成的页面照常记入任务清单（可以续做），未完成的临时文件和多页输出文件会被删除。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = Manifest(output_dir)
+    records = BatchRecords(manifest, pagestats.StatsIndex(output_dir) if options.collect_stats else None)
+    # 进程池以 fork 启动工作进程：先启动并预热全部进程，再启动发现线程，
+    # 否则 fork 可能落在发现线程导入模块或读取文件的过程中，子进程继承未完成的模块或持有的锁
+    executor = _start_batch_pool(workers, control) if workers > 1 else None
+    try:
+        feed = _UnitFeed(file_tasks, output_dir, options, manifest, on_total)
+    except BaseException:
+        if executor:
+            executor.shutdown(wait=True)
+        raise
+    try:
+        if executor:
+            processed_count = _run_batch_parallel(feed, executor, output_dir, options, workers, progress, on_error,
+                                                  records, control)
+        else:
+            processed_count = _run_batch_serial(feed, output_dir, options, progress, on_error, records, control)
+    finally:
+        feed.close()
+    if options.cache:
+        options.cache.evict()
+    return processed_count
+
+
+def _run_batch_serial(feed, output_dir, options, progress, on_error, records, control=None):
+    processed_count = 0
+    current_task = 0
+    failed_files = set()
+
+    def report(status):
+        nonlocal current_task
+        current_task += 1
+        if progress:
+            progress(current_task, status)
+
+    for kind, file_path, value in feed:
+        if kind == "skip":
+            # 续做时跳过的页直接计入进度
+            current_task += value
+            if progress:
+                progress(current_task, f"跳过已完成的 {value} 页: {os.path.basename(file_path)}")
+            continue
+        if kind == "error":
+            if on_error:
+                on_error(value)
+            continue
+        if file_path in failed_files:
+            continue
+        if control:
+            control.checkpoint()
+        unit = value
+        try:
+            processed_count += process_unit(unit, output_dir, options, report, records, control)
+        except pipeline.Cancelled:
+            raise
+        except Exception as e:
+            failed_files.add(file_path)
+            record_failure(records, unit, output_dir, options, e)
+            if on_error:
+                on_error(f"处理文件 {os.path.basename(file_path)} 时出错: {str(e)}")
+
+    return processed_count
+
+
+def _start_batch_pool(workers, control=None):
+    """启动并行批量处理的进程池，返回时全部工作进程已启动并完成预热（见 _warm_up_worker）"""
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(control,))
+    try:
+        for future in [executor.submit(_warm_up_worker) for _ in range(workers)]:
+            future.result()
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    return executor
+
+
+def _run_batch_parallel(feed, executor, output_dir, options, workers, progress, on_error, records, control=None):
+    """在已启动的进程池（见 _start_batch_pool，结束时关闭）中多进程批量处理，进度按已完成的页数汇总
+
+    每个进程最多有 UNITS_PER_WORKER 个已提交的单元，其余单元留在发现队列中，发现和处理同时进行。
+    """
+    processed_count = 0
+    current_task = 0
+    failed_files = set()
+
+    def collect(future, unit):
+        """合并一个单元的结果，返回 "done"、"failed" 或 "cancelled"（被取消）"""
+        nonlocal processed_count
+        file_path = unit[0]
+        try:
+            count, cache_stats, unit_records, timer_stats = future.result()
+        except Exception as e:
+            record_failure(records, unit, output_dir, options, e)
+            # 同一文件的多个单元失败时只报告一次
+            if on_error and file_path not in failed_files:
+                on_error(f"处理文件 {os.path.basename(file_path)} 时出错: {str(e)}")
+            failed_files.add(file_path)
+            return "failed"
+        if cache_stats:
+            options.cache.merge_stats(cache_stats)
+        if timer_stats:
+            options.timer.merge(timer_stats)
+        for record in unit_records:
+            records.append(record)
+        processed_count += count or 0
+        return "cancelled" if count is None else "done"
+
+    with executor:
+        futures = {}
+        items = iter(feed)
+        exhausted = False
+        while True:
+            while not exhausted and len(futures) < workers * UNITS_PER_WORKER:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                kind, file_path, value = item
+                if kind == "skip":
+                    current_task += value
+                    if progress:
+                        progress(current_task, f"跳过已完成的 {value} 页: {os.path.basename(file_path)}")
+                elif kind == "error":
+                    if on_error:
+                        on_error(value)
+                elif file_path not in failed_files:
+                    futures[executor.submit(_process_unit_worker, value, output_dir, options)] = value
+            if options.timer:
+                # 全部完成时记为 0，统计中的当前值不停留在最后一次等待时
+                options.timer.gauge("pending_units", len(futures) + feed.pending())
+            if not futures:
+                break
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                unit = futures.pop(future)
+                result = collect(future, unit)
+                if result == "cancelled" or (control and control.cancelled.is_set()):
+                    # 尚未开始的单元不再执行，正在处理的单元在下一页之前停下，已完成的页面照常记入任务清单
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    for other, other_unit in futures.items():
+                        if other.done() and not other.cancelled():
+                            collect(other, other_unit)
+                    raise pipeline.Cancelled()
+                file_path, first_page, last_page, page_count = unit
+                filename = os.path.basename(file_path)
+                current_task += last_page - first_page + 1
+                if progress:
+                    # 失败的单元已由 on_error 报告，这里只推进进度
+                    action = "已完成" if result == "done" else "失败"
+                    if is_pdf(file_path) or page_count > 1:
+                        status = f"{action}: {filename} (第{first_page}-{last_page}/{page_count}页)"
+                    else:
+                        status = f"{action}: {filename}"
+                    progress(current_task, status)
+
+    return processed_count
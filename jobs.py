@@ -0,0 +1,151 @@
+"""批量任务队列与调度（不依赖 tkinter）
+
+任务按提交顺序排队，所有任务共享一个并行进程数上限：空闲进程足够时后面的任务可以同时开始，
+同一输出目录的任务依次执行，不会有两个任务同时写入同一个目录和任务清单。
+每个任务可以单独暂停、继续和取消（见 engine.BatchControl）。
+"""
+import os
+import threading
+import time
+
+import engine
+import pipeline
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+STATE_NAMES = {QUEUED: "排队中", RUNNING: "处理中", DONE: "已完成", CANCELLED: "已取消", FAILED: "失败"}
+
+
+class BatchJob:
+    """一个批量任务：engine.run_batch 的参数和回调
+
+    file_tasks 可以是边发现边产出的迭代器（见 discovery.iter_file_tasks），此时 total 在处理过程中逐步确定。
+    progress(current, status)、on_error(message) 和 on_total(total, complete) 同 run_batch；
+    on_finish(job) 在任务结束（完成、取消或失败）后调用，此时 state、processed_count 和 error 已设置。
+    回调都在任务线程中调用。
+    """
+
+    def __init__(self, file_tasks, output_dir, options, workers=1, progress=None, on_error=None, on_finish=None,
+                 name=None, on_total=None):
+        self.file_tasks = file_tasks
+        self.output_dir = output_dir
+        self.options = options
+        self.workers = max(1, workers)  # 希望使用的进程数，实际数量受调度器上限限制
+        self.progress = progress
+        self.on_error = on_error
+        self.on_finish = on_finish
+        self.on_total = on_total
+        self.name = name or os.path.basename(os.path.normpath(output_dir))
+        self.total = None  # 总页数，发现全部文件后确定
+        self.control = engine.BatchControl()
+        self.state = QUEUED
+        self.granted_workers = 0  # 开始时分配到的进程数
+        self.processed_count = 0
+        self.error = None
+
+    def _update_total(self, total, complete):
+        if complete:
+            self.total = total
+        if self.on_total:
+            self.on_total(total, complete)
+
+    @property
+    def paused(self):
+        return self.control.paused
+
+    def pause(self):
+        """在当前页处理完后暂停（排队中的任务开始后立即暂停）"""
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+
+    def cancel(self):
+        """取消任务：排队中的任务不再开始，运行中的任务在下一页之前停下"""
+        self.control.cancel()
+
+    def __repr__(self):
+        return f"<BatchJob {self.name} {self.state}>"
+
+
+class JobScheduler:
+    """按顺序启动排队的任务，所有运行中任务的进程数之和不超过 max_workers"""
+
+    def __init__(self, max_workers=engine.DEFAULT_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self.jobs = []  # 全部提交过的任务（按提交顺序）
+        self._lock = threading.Lock()
+        self._used_workers = 0
+
+    def submit(self, job):
+        """加入队列，有空闲进程时立即开始，返回 job"""
+        with self._lock:
+            self.jobs.append(job)
+        self._schedule()
+        return job
+
+    def active_jobs(self):
+        """排队中和运行中的任务"""
+        with self._lock:
+            return [job for job in self.jobs if job.state in (QUEUED, RUNNING)]
+
+    def cancel(self, job):
+        """取消任务；排队中的任务立即结束"""
+        job.cancel()
+        self._schedule()
+
+    def cancel_all(self):
+        for job in self.active_jobs():
+            self.cancel(job)
+
+    def _schedule(self):
+        """按提交顺序启动可以开始的任务"""
+        started = []
+        finished = []
+        with self._lock:
+            busy_dirs = {os.path.abspath(job.output_dir) for job in self.jobs if job.state == RUNNING}
+            for job in self.jobs:
+                if job.state != QUEUED:
+                    continue
+                if job.control.cancelled.is_set():
+                    job.state = CANCELLED
+                    finished.append(job)
+                    continue
+                output_dir = os.path.abspath(job.output_dir)
+                free = self.max_workers - self._used_workers
+                if output_dir in busy_dirs or free < 1:
+                    continue
+                job.granted_workers = min(job.workers, free)
+                job.state = RUNNING
+                self._used_workers += job.granted_workers
+                busy_dirs.add(output_dir)
+                started.append(job)
+        for job in started:
+            threading.Thread(target=self._run, args=(job,), name=f"batch-job-{job.name}", daemon=True).start()
+        for job in finished:
+            if job.on_finish:
+                job.on_finish(job)
+
+    def _run(self, job):
+        if job.options.timer:
+            job.options.timer.started = time.perf_counter()  # 排队等待的时间不计入吞吐量
+        try:
+            job.processed_count = engine.run_batch(job.file_tasks, job.output_dir, job.options,
+                                                   workers=job.granted_workers, progress=job.progress,
+                                                   on_error=job.on_error, control=job.control,
+                                                   on_total=job._update_total)
+            job.state = DONE
+        except pipeline.Cancelled:
+            job.state = CANCELLED
+        except Exception as e:
+            job.error = e
+            job.state = FAILED
+        finally:
+            with self._lock:
+                self._used_workers -= job.granted_workers
+        if job.on_finish:
+            job.on_finish(job)
+        self._schedule()
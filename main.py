@@ -2,25 +2,49 @@ import tkinter as tk
 from tkinter import filedialog, Scale, HORIZONTAL, messagebox, Toplevel
 from tkinter import ttk
 from tkinterdnd2 import DND_FILES, TkinterDnD
-from PIL import Image, ImageTk
-import cv2
-import numpy as np
+import itertools
 import os
-from pdf2image import convert_from_path
-import glob
 import threading
-import shutil  # 新增：用于创建文件夹
+
+import defaults
+import perf
+import pipeline
+
+
+def load_modules():
+    """导入较慢的模块（OpenCV、numpy、Pillow 及依赖它们的处理模块），设为本模块的全局名称
+
+    窗口创建时只需要 defaults 中的默认参数，这些模块在窗口显示后由后台线程导入；
+    打开文件、拖入文件和批量处理在用到它们之前再调用一次，后台导入尚未完成时等它完成
+    （同一模块的导入由 Python 的导入锁串行化，已导入的模块直接返回）。
+    """
+    global cv2, np, Image, ImageTk, discovery, encoders, engine, jobs, sweep, thresholds
+    global LazyPdfDocument, PageCache, TileRenderer, TILE_SIZE, FAST, QUALITY, ResultCache
+    import cv2
+    import numpy as np
+    from PIL import Image, ImageTk
+
+    import discovery
+    import encoders
+    import engine
+    import jobs
+    import sweep
+    import thresholds
+    from pages import LazyPdfDocument, PageCache
+    from pyramid import TileRenderer, TILE_SIZE, FAST, QUALITY
+    from cache import ResultCache
 
 
 class ProgressWindow(Toplevel):
     """进度显示窗口"""
 
-    def __init__(self, parent, total, title="处理中"):
+    def __init__(self, parent, total, title="处理中", show_stats=False, on_cancel=None, on_pause=None, modal=True):
         super().__init__(parent)
         self.title(title)
-        self.geometry("400x100")
+        self.geometry("460x290" if show_stats else "400x130" if on_cancel else "400x100")
         self.transient(parent)  # 设置为主窗口的子窗口
-        self.grab_set()  # 模态窗口，阻止操作主窗口
+        if modal:
+            self.grab_set()  # 模态窗口，阻止操作主窗口
 
         # 进度条
         self.progress_var = tk.DoubleVar()
@@ -32,28 +56,79 @@ class ProgressWindow(Toplevel):
             mode='determinate'
         )
         self.progress_bar.pack(pady=10, padx=10)
+        self.total = total
+        self.total_complete = True
 
         # 状态标签
         self.status_label = tk.Label(self, text="准备开始...")
         self.status_label.pack(pady=5)
 
+        # 各阶段耗时和计数（perf.StageTimer.format()）
+        self.stats_label = None
+        if show_stats:
+            self.stats_label = tk.Label(self, text="", justify=tk.LEFT, anchor=tk.W, font=("TkFixedFont", 9))
+            self.stats_label.pack(fill=tk.X, padx=10, pady=5)
+
+        # 暂停/取消按钮（关闭窗口也视为取消，任务停止后由调用方关闭窗口）
+        self.on_cancel = on_cancel
+        self.on_pause = on_pause  # on_pause(paused) 在暂停和继续时调用
+        self.paused = False
+        button_frame = tk.Frame(self)
+        button_frame.pack(pady=5)
+        if on_pause:
+            self.pause_btn = tk.Button(button_frame, text="暂停", width=8, command=self.toggle_pause)
+            self.pause_btn.pack(side=tk.LEFT, padx=5)
+        if on_cancel:
+            self.cancel_btn = tk.Button(button_frame, text="取消", width=8, command=self.cancel)
+            self.cancel_btn.pack(side=tk.LEFT, padx=5)
+            self.protocol("WM_DELETE_WINDOW", self.cancel)
+
         self.current = 0
 
-    def update_progress(self, value, status=""):
+    def update_progress(self, value, status="", stats=None):
         """更新进度"""
         self.current = value
         self.progress_var.set(value)
-        if status:
+        if status and not self.paused:
             self.status_label.config(text=status)
+        if stats and self.stats_label is not None:
+            self.stats_label.config(text=stats)
         self.update_idletasks()  # 强制更新UI
 
+    def set_total(self, total, complete=True):
+        """更新总任务量（边扫描边处理时总页数逐步增加）"""
+        self.total = total
+        self.total_complete = complete
+        self.progress_bar.config(maximum=max(total, 1))
+        self.title(self.title().split(" [")[0] + ("" if complete else f" [已发现 {total} 页，扫描中...]"))
+
+    def toggle_pause(self):
+        """暂停或继续任务"""
+        self.paused = not self.paused
+        self.pause_btn.config(text="继续" if self.paused else "暂停")
+        self.status_label.config(text="已暂停（正在处理的页完成后停下）" if self.paused else "继续处理...")
+        self.on_pause(self.paused)
+
+    def cancel(self):
+        """请求取消任务"""
+        self.cancel_btn.config(state=tk.DISABLED)
+        if self.on_pause:
+            self.pause_btn.config(state=tk.DISABLED)
+        self.paused = False
+        self.status_label.config(text="正在取消...")
+        self.on_cancel()
+
     def close(self):
         """关闭进度窗口"""
         self.destroy()
 
 
 class ImageViewer(Toplevel):
-    """用于显示放大图像的窗口"""
+    """用于显示放大图像的窗口（金字塔 + 分块渲染，只重采样可见区域）"""
+
+    MIN_SIZE = 50  # 缩小后的最小边长
+    MAX_SCALE = 16.0  # 最大放大倍数
+    IDLE_DELAY_MS = 150  # 停止交互后多久以高质量重绘
 
     def __init__(self, parent, image, title="放大视图"):
         super().__init__(parent)
@@ -63,8 +138,8 @@ class ImageViewer(Toplevel):
 
         # 创建画布和滚动条
         self.canvas = tk.Canvas(self, bg="gray")
-        self.v_scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.canvas.yview)
-        self.h_scrollbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.canvas.xview)
+        self.v_scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_yscroll)
+        self.h_scrollbar = tk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.on_xscroll)
 
         self.canvas.configure(yscrollcommand=self.v_scrollbar.set, xscrollcommand=self.h_scrollbar.set)
 
@@ -73,6 +148,9 @@ class ImageViewer(Toplevel):
         self.h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
+        self.tiles = {}  # (tx, ty) -> (画布对象, PhotoImage, 插值方式)
+        self.idle_job = None
+
         # 显示图像
         self.display_image(image)
 
@@ -80,21 +158,79 @@ class ImageViewer(Toplevel):
         self.canvas.bind("<MouseWheel>", self.zoom)
         self.canvas.bind("<Button-4>", self.zoom)  # Linux 向上滚动
         self.canvas.bind("<Button-5>", self.zoom)  # Linux 向下滚动
+        self.canvas.bind("<Configure>", lambda event: self.render_visible())
 
     def display_image(self, image):
         # 转换图像格式
-        if isinstance(image, np.ndarray):
-            if len(image.shape) == 3:
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            image = Image.fromarray(image)
-
-        self.original_image = image
-        self.image_tk = ImageTk.PhotoImage(image)
-
-        # 更新画布
+        if isinstance(image, Image.Image):
+            image = np.asarray(image)
+        elif len(image.shape) == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+        self.renderer = TileRenderer(image)
+        self.scale = 1.0
+        self.clear_tiles()
+        self.update_scrollregion()
+        self.render_visible()
+
+    def clear_tiles(self):
         self.canvas.delete("all")
-        self.image_id = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.image_tk)
-        self.canvas.config(scrollregion=self.canvas.bbox(tk.ALL))
+        self.tiles = {}
+
+    def update_scrollregion(self):
+        width, height = self.renderer.scaled_size(self.scale)
+        self.canvas.config(scrollregion=(0, 0, width, height))
+
+    def on_xscroll(self, *args):
+        self.canvas.xview(*args)
+        self.render_visible()
+
+    def on_yscroll(self, *args):
+        self.canvas.yview(*args)
+        self.render_visible()
+
+    def render_visible(self, interpolation=None):
+        """渲染视口内的分块，移除视口外的分块；快速渲染后安排空闲时高质量重绘（interpolation 默认为 FAST）"""
+        if interpolation is None:
+            interpolation = FAST
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        x1 = self.canvas.canvasx(self.canvas.winfo_width())
+        y1 = self.canvas.canvasy(self.canvas.winfo_height())
+        visible = self.renderer.visible_tiles(self.scale, x0, y0, x1, y1)
+
+        for key in set(self.tiles) - set(visible):
+            self.canvas.delete(self.tiles.pop(key)[0])
+
+        needs_quality = False
+        for tx, ty in visible:
+            current = self.tiles.get((tx, ty))
+            if current is not None and (current[2] == QUALITY or current[2] == interpolation):
+                continue
+            # 已有高质量缓存时直接使用
+            tile = self.renderer.cached_tile(self.scale, tx, ty, QUALITY)
+            quality = QUALITY
+            if tile is None:
+                tile = self.renderer.tile(self.scale, tx, ty, interpolation)
+                quality = interpolation
+            photo = ImageTk.PhotoImage(Image.fromarray(tile))
+            if current is not None:
+                self.canvas.delete(current[0])
+            item = self.canvas.create_image(tx * TILE_SIZE, ty * TILE_SIZE, anchor=tk.NW, image=photo)
+            self.tiles[(tx, ty)] = (item, photo, quality)
+            needs_quality = needs_quality or quality != QUALITY
+
+        if interpolation == FAST and needs_quality:
+            self.schedule_quality_render()
+
+    def schedule_quality_render(self):
+        if self.idle_job is not None:
+            self.after_cancel(self.idle_job)
+        self.idle_job = self.after(self.IDLE_DELAY_MS, self.render_quality)
+
+    def render_quality(self):
+        self.idle_job = None
+        self.render_visible(QUALITY)
 
     def zoom(self, event):
         # 缩放功能
@@ -104,28 +240,31 @@ class ImageViewer(Toplevel):
         if event.num == 4 or event.delta == 120:  # 放大
             scale = 1.1
 
-        # 获取当前画布尺寸
+        new_scale = min(self.scale * scale, self.MAX_SCALE)
+        new_width, new_height = self.renderer.scaled_size(new_scale)
+        if new_width < self.MIN_SIZE or new_height < self.MIN_SIZE:  # 最小尺寸限制
+            return
+        factor = new_scale / self.scale
+        if factor == 1.0:
+            return
+
+        # 鼠标所在的画布坐标，缩放后保持在同一屏幕位置
         x = self.canvas.canvasx(event.x)
         y = self.canvas.canvasy(event.y)
 
-        # 缩放图像
-        width, height = self.original_image.size
-        new_width = int(width * scale)
-        new_height = int(height * scale)
+        self.scale = new_scale
+        self.clear_tiles()
+        self.update_scrollregion()
+        self.canvas.xview_moveto(max(0.0, (x * factor - event.x) / new_width))
+        self.canvas.yview_moveto(max(0.0, (y * factor - event.y) / new_height))
+        self.render_visible()
 
-        if new_width < 50 or new_height < 50:  # 最小尺寸限制
-            return
 
-        resized_image = self.original_image.resize((new_width, new_height), Image.LANCZOS)
-        self.image_tk = ImageTk.PhotoImage(resized_image)
-
-        # 更新画布
-        self.canvas.delete("all")
-        self.image_id = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.image_tk)
-        self.canvas.config(scrollregion=self.canvas.bbox(tk.ALL))
-
-        # 调整滚动位置以保持缩放中心
-        self.canvas.scale("all", x, y, scale, scale)
+PREVIEW_SIZE = 400  # 预览画布尺寸
+PREVIEW_DELAY_MS = 16  # 滑块事件合并间隔（约60帧/秒）
+PROCESSED_CACHE_BYTES = 64 * 1024 * 1024  # 已处理的PDF页面（全分辨率二值图）缓存上限，保存全部页时直接使用
+BATCH_REPORT_NAME = "batch_report.json"  # 批量处理结束后写入 output 的各阶段统计
+DPI_CHOICES = (72, 100, 150, 200, 300, 400, 600)  # DPI输入框的可选值（也可以直接输入）
 
 
 class ThresholdGUI:
@@ -135,36 +274,66 @@ class ThresholdGUI:
 
         # 初始化变量
         self.original_image = None
-        self.processed_image = None
-        self.threshold_value = 200  # 默认阈值
-        self.pdf_pages = []  # 存储PDF的所有页面
+        self.image_path = None  # 当前打开的图片文件（PDF见 pdf_document）
+        self.gray_image = None
+        self.preview_gray = None  # 缩小后的灰度图，滑块拖动时只处理它
+        self.processed_image = None  # 全分辨率结果，仅在保存/放大时按需计算
+        self.processed_threshold = None  # processed_image 对应的阈值参数（thresholds.method_key）
+        self.auto_threshold = None  # 当前图像的 Otsu/三角法自动阈值 (方法, 阈值)
+        self.processed_pages = None  # (页码, DPI, 阈值参数) -> PDF页面的全分辨率结果（PageCache，见 ensure_modules）
+        self.preview_job = None  # 尚未执行的预览刷新
+        self.threshold_value = defaults.DEFAULT_THRESHOLD  # 默认阈值
+        self.pdf_document = None  # 当前PDF（按需加载页面）
         self.current_pdf_page = 0  # 当前显示的PDF页码（从0开始）
+        self.pdf_page_is_proxy = False  # 当前显示的是否为低分辨率代理页
+        self.scheduler = None  # 批量任务队列，所有任务共享进程数上限（jobs.JobScheduler，见 ensure_modules）
+        self.batch_count = 0  # 已提交的批量任务数（用于任务编号）
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         #拖拽支持
         self.root.drop_target_register(DND_FILES)
         self.root.dnd_bind('<<Drop>>', self.drop_file)
         # 创建界面组件
         self.create_widgets()
+        # 窗口显示后在后台导入较慢的模块
+        self.root.after_idle(lambda: threading.Thread(target=self.preload_modules, daemon=True).start())
+
+    def preload_modules(self):
+        """后台线程：预先导入较慢的模块，失败时等到用到时在 ensure_modules 中报告"""
+        try:
+            load_modules()
+        except Exception:
+            pass
+
+    def ensure_modules(self):
+        """确保较慢的模块已导入（见 load_modules），第一次调用时创建依赖它们的对象"""
+        load_modules()
+        if self.scheduler is None:
+            self.processed_pages = PageCache(PROCESSED_CACHE_BYTES)
+            self.scheduler = jobs.JobScheduler(defaults.DEFAULT_WORKERS)
 
     def drop_file(self, event):
         """拖拽文件处理"""
         file_path = event.data.strip("{}")  # 去掉路径两侧的大括号
         if os.path.isfile(file_path):
-            if file_path.lower().endswith(('.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tif')):
+            try:
+                self.ensure_modules()
+            except Exception as e:
+                messagebox.showerror("错误", f"无法加载处理模块: {str(e)}")
+                return
+            if engine.is_supported(file_path):
                 try:
-                    if file_path.lower().endswith('.pdf'):
-                        threading.Thread(target=self.handle_pdf_thread, args=(file_path,), daemon=True).start()
+                    if engine.is_pdf(file_path):
+                        threading.Thread(target=self.handle_pdf_thread, args=(file_path, self.get_dpi()),
+                                         daemon=True).start()
                     else:
-                        self.original_image = cv2.imread(file_path)
-                        if self.original_image is None:
-                            raise ValueError("无法读取图像文件")
-                        self.gray_image = cv2.cvtColor(self.original_image, cv2.COLOR_BGR2GRAY)
-                        self.display_original_image()
-                        self.process_image()
-                        self.pdf_pages = []
+                        self.set_source_image(engine.read_image(file_path))
+                        self.image_path = file_path
+                        self.close_pdf_document()
                         self.page_label.config(text="")
                         self.prev_btn.config(state=tk.DISABLED)
                         self.next_btn.config(state=tk.DISABLED)
                     self.save_btn.config(state=tk.NORMAL)
+                    self.sweep_btn.config(state=tk.NORMAL)
                     self.batch_btn.config(state=tk.NORMAL)
                 except Exception as e:
                     messagebox.showerror("错误", f"无法打开文件: {str(e)}")
@@ -187,6 +356,47 @@ class ThresholdGUI:
         self.batch_btn = tk.Button(top_frame, text="批量处理", command=self.batch_process, state=tk.DISABLED)
         self.batch_btn.pack(side=tk.LEFT, padx=5)
 
+        # 批量处理并行进程数
+        tk.Label(top_frame, text="进程数:").pack(side=tk.LEFT)
+        self.workers_var = tk.IntVar(value=defaults.DEFAULT_WORKERS)
+        self.workers_spinbox = tk.Spinbox(
+            top_frame,
+            from_=1,
+            to=max(defaults.DEFAULT_WORKERS, 64),
+            width=4,
+            textvariable=self.workers_var
+        )
+        self.workers_spinbox.pack(side=tk.LEFT, padx=5)
+
+        # PDF栅格化分辨率（打开、保存全部页和批量处理）
+        tk.Label(top_frame, text="DPI:").pack(side=tk.LEFT)
+        self.dpi_var = tk.StringVar(value=str(defaults.DEFAULT_DPI))
+        self.dpi_spinbox = tk.Spinbox(top_frame, values=DPI_CHOICES, width=4, textvariable=self.dpi_var,
+                                      command=self.on_dpi_change)
+        self.dpi_var.set(str(defaults.DEFAULT_DPI))  # 设置 values 后需要重新设置初始值
+        self.dpi_spinbox.pack(side=tk.LEFT, padx=5)
+        self.dpi_spinbox.bind("<Return>", lambda event: self.on_dpi_change())
+        self.dpi_spinbox.bind("<FocusOut>", lambda event: self.on_dpi_change())
+
+        # 批量处理结果缓存（output/.cache）
+        self.use_cache_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(top_frame, text="使用缓存", variable=self.use_cache_var).pack(side=tk.LEFT, padx=5)
+
+        # 输出格式（保存全部页和批量处理）
+        tk.Label(top_frame, text="格式:").pack(side=tk.LEFT)
+        self.format_var = tk.StringVar(value=defaults.DEFAULT_FORMAT)
+        tk.OptionMenu(top_frame, self.format_var, *defaults.OUTPUT_FORMATS).pack(side=tk.LEFT, padx=5)
+
+        # 续做：只处理 output/manifest.jsonl 中未完成或已过期的项
+        self.resume_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(top_frame, text="续做", variable=self.resume_var).pack(side=tk.LEFT, padx=5)
+
+        # 批量处理时跳过空白页、裁剪到内容（每页统计写入 output/page_stats.jsonl）
+        self.skip_blank_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(top_frame, text="跳过空白页", variable=self.skip_blank_var).pack(side=tk.LEFT, padx=5)
+        self.auto_crop_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(top_frame, text="裁剪到内容", variable=self.auto_crop_var).pack(side=tk.LEFT, padx=5)
+
         # 阈值滑块
         slider_frame = tk.Frame(self.root)
         slider_frame.pack(pady=10)
@@ -207,6 +417,29 @@ class ThresholdGUI:
         self.value_label = tk.Label(slider_frame, text=str(self.threshold_value))
         self.value_label.pack(side=tk.LEFT, padx=5)
 
+        # 阈值方法（固定阈值时使用滑块的值，其余方法自动计算）
+        tk.Label(slider_frame, text="方法:").pack(side=tk.LEFT)
+        self.method_var = tk.StringVar(value=defaults.DEFAULT_METHOD)
+        tk.OptionMenu(slider_frame, self.method_var, *defaults.THRESHOLD_METHODS,
+                      command=lambda value: self.on_method_change()).pack(side=tk.LEFT, padx=5)
+
+        # 局部阈值方法的窗口边长
+        tk.Label(slider_frame, text="窗口:").pack(side=tk.LEFT)
+        self.block_var = tk.IntVar(value=defaults.DEFAULT_BLOCK_SIZE)
+        self.block_spinbox = tk.Spinbox(slider_frame, from_=3, to=501, increment=2, width=4,
+                                        textvariable=self.block_var, command=self.on_method_change)
+        self.block_spinbox.pack(side=tk.LEFT, padx=5)
+        # command 只在点击箭头时调用，直接输入的边长在回车或离开输入框时刷新预览
+        self.block_spinbox.bind("<Return>", lambda event: self.on_method_change())
+        self.block_spinbox.bind("<FocusOut>", lambda event: self.on_method_change())
+
+        # 阈值扫描：当前图像按列表中的每个阈值各处理一次，保存结果和对比图
+        tk.Label(slider_frame, text="扫描:").pack(side=tk.LEFT)
+        self.sweep_var = tk.StringVar(value="100-220:20")
+        tk.Entry(slider_frame, textvariable=self.sweep_var, width=12).pack(side=tk.LEFT, padx=5)
+        self.sweep_btn = tk.Button(slider_frame, text="阈值扫描", command=self.sweep_thresholds, state=tk.DISABLED)
+        self.sweep_btn.pack(side=tk.LEFT, padx=5)
+
         # PDF页面导航组件
         self.nav_frame = tk.Frame(self.root)
         self.nav_frame.pack(pady=5)
@@ -262,131 +495,179 @@ class ThresholdGUI:
 
         if file_path:
             try:
-                if file_path.lower().endswith('.pdf'):
+                self.ensure_modules()
+                if engine.is_pdf(file_path):
                     # 启动线程处理PDF，避免UI卡顿
-                    threading.Thread(target=self.handle_pdf_thread, args=(file_path,), daemon=True).start()
+                    threading.Thread(target=self.handle_pdf_thread, args=(file_path, self.get_dpi()),
+                                     daemon=True).start()
                 else:
-                    self.original_image = cv2.imread(file_path)
-                    if self.original_image is None:
-                        raise ValueError("无法读取图像文件")
-                    self.gray_image = cv2.cvtColor(self.original_image, cv2.COLOR_BGR2GRAY)
-                    self.display_original_image()
-                    self.process_image()
+                    self.set_source_image(engine.read_image(file_path))
+                    self.image_path = file_path
                     # 重置PDF相关状态
-                    self.pdf_pages = []
+                    self.close_pdf_document()
                     self.page_label.config(text="")
                     self.prev_btn.config(state=tk.DISABLED)
                     self.next_btn.config(state=tk.DISABLED)
 
                 self.save_btn.config(state=tk.NORMAL)
+                self.sweep_btn.config(state=tk.NORMAL)
                 self.batch_btn.config(state=tk.NORMAL)
             except Exception as e:
                 messagebox.showerror("错误", f"无法打开文件: {str(e)}")
 
-    def handle_pdf_thread(self, file_path):
-        """在线程中处理PDF，避免UI卡顿"""
+    def get_dpi(self):
+        """DPI输入框的值，无效时使用默认值"""
         try:
-            # 获取PDF总页数
-            total_pages = len(convert_from_path(file_path))
-            if total_pages == 0:
-                raise ValueError("无法从PDF中提取页面")
-
-            # 在主线程中创建进度窗口
-            self.root.after(0, lambda: self.create_pdf_progress_window(total_pages, file_path))
-
-            # 转换PDF页面
-            self.pdf_pages = []
-            for i in range(total_pages):
-                # 转换单页
-                page = convert_from_path(file_path, first_page=i + 1, last_page=i + 1)[0]
-                open_cv_image = np.array(page)
-                bgr_image = open_cv_image[:, :, ::-1].copy()  # RGB转BGR
-                self.pdf_pages.append(bgr_image)
+            return engine.resolve_dpi(self.dpi_var.get())
+        except (tk.TclError, ValueError):
+            return engine.DEFAULT_DPI
+
+    def on_dpi_change(self):
+        """修改DPI后按新分辨率重新显示当前PDF页"""
+        if self.pdf_document and self.pdf_document.dpi != self.get_dpi():
+            self.pdf_document.set_dpi(self.get_dpi())
+            self.update_pdf_display()
 
-                # 更新进度
-                progress = i + 1
-                status = f"正在处理第 {progress}/{total_pages} 页..."
-                self.root.after(0, lambda p=progress, s=status: self.update_pdf_progress(p, s))
+    def handle_pdf_thread(self, file_path, dpi=defaults.DEFAULT_DPI):
+        """在线程中打开PDF并转换第一页，避免UI卡顿"""
+        document = None
+        try:
+            # 页数来自PDF元数据，其余页面在翻页时按需转换
+            document = LazyPdfDocument(file_path, dpi=dpi)
+            if document.page_count == 0:
+                raise ValueError("无法从PDF中提取页面")
+            # 先转换低分辨率代理页尽快显示，完整分辨率在显示后于后台转换
+            if document.uses_proxy:
+                first_page = document.get_proxy(0)
+            else:
+                first_page = document.get_page(0)
 
-            # 处理完成后显示第一页
-            self.root.after(0, self.finish_pdf_handling)
+            self.root.after(0, lambda: self.finish_pdf_handling(document, first_page, document.uses_proxy))
 
         except Exception as e:
+            if document is not None:
+                document.close()
             error_msg = f"处理PDF时出错: {str(e)}\n请确保已安装poppler并配置环境变量"
             self.root.after(0, lambda: messagebox.showerror("PDF处理错误", error_msg))
-            self.root.after(0, self.close_pdf_progress_window)
-
-    def create_pdf_progress_window(self, total, file_path):
-        """创建PDF处理进度窗口"""
-        filename = os.path.basename(file_path)
-        self.pdf_progress_window = ProgressWindow(self.root, total, f"处理PDF: {filename}")
-
-    def update_pdf_progress(self, value, status):
-        """更新PDF处理进度"""
-        if hasattr(self, 'pdf_progress_window'):
-            self.pdf_progress_window.update_progress(value, status)
-
-    def close_pdf_progress_window(self):
-        """关闭PDF进度窗口"""
-        if hasattr(self, 'pdf_progress_window'):
-            self.pdf_progress_window.close()
-            delattr(self, 'pdf_progress_window')
-
-    def finish_pdf_handling(self):
-        """完成PDF处理后显示第一页并初始化导航"""
-        self.close_pdf_progress_window()
-        if self.pdf_pages:
-            self.current_pdf_page = 0  # 重置为第一页
-            self.original_image = self.pdf_pages[self.current_pdf_page]
-            self.gray_image = cv2.cvtColor(self.original_image, cv2.COLOR_BGR2GRAY)
-            self.display_original_image()
-            self.process_image()
-            # 启用导航按钮并更新页码显示
-            self.prev_btn.config(state=tk.DISABLED)  # 第一页禁用上一页
-            self.next_btn.config(state=tk.NORMAL if len(self.pdf_pages) > 1 else tk.DISABLED)
-            self.page_label.config(text=f"第 {self.current_pdf_page + 1}/{len(self.pdf_pages)} 页")
+
+    def close_pdf_document(self):
+        """关闭当前PDF并重置导航状态"""
+        if self.pdf_document is not None:
+            self.pdf_document.close()
+            self.pdf_document = None
+        if self.processed_pages is not None:
+            self.processed_pages.clear()
+        self.current_pdf_page = 0
+        self.pdf_page_is_proxy = False
+
+    def finish_pdf_handling(self, document, first_page, proxy=False):
+        """显示PDF第一页并初始化导航"""
+        self.close_pdf_document()
+        self.pdf_document = document
+        self.current_pdf_page = 0  # 重置为第一页
+        self.show_pdf_page(first_page, proxy)
+        if proxy:
+            self.request_full_page(document, 0)
 
     def prev_pdf_page(self):
         """切换到上一页PDF"""
-        if self.pdf_pages and self.current_pdf_page > 0:
+        if self.pdf_document and self.current_pdf_page > 0:
             self.current_pdf_page -= 1
             self.update_pdf_display()
 
     def next_pdf_page(self):
         """切换到下一页PDF"""
-        if self.pdf_pages and self.current_pdf_page < len(self.pdf_pages) - 1:
+        if self.pdf_document and self.current_pdf_page < self.pdf_document.page_count - 1:
             self.current_pdf_page += 1
             self.update_pdf_display()
 
     def update_pdf_display(self):
-        """更新当前PDF页面的显示"""
-        if not self.pdf_pages:
+        """更新当前PDF页面的显示，页面未缓存时先显示代理页，完整分辨率在后台转换"""
+        if not self.pdf_document:
             return
-        # 更新当前页面图像
-        self.original_image = self.pdf_pages[self.current_pdf_page]
-        self.gray_image = cv2.cvtColor(self.original_image, cv2.COLOR_BGR2GRAY)
-        self.display_original_image()
-        self.process_image()  # 重新处理当前页
-        # 更新页码显示
-        self.page_label.config(text=f"第 {self.current_pdf_page + 1}/{len(self.pdf_pages)} 页")
-        # 控制导航按钮状态
+        document = self.pdf_document
+        index = self.current_pdf_page
+        page = document.cached_page(index)
+        if page is not None:
+            self.show_pdf_page(page)
+            return
+
+        if document.uses_proxy:
+            proxy = document.cached_proxy(index)
+            if proxy is not None:
+                self.show_pdf_page(proxy, proxy=True)
+            else:
+                self.update_pdf_navigation(loading=True)
+                future = document.get_proxy_async(index)
+                future.add_done_callback(
+                    lambda f: self.root.after(0, lambda: self.on_pdf_page_loaded(document, index, f, proxy=True))
+                )
+        else:
+            self.update_pdf_navigation(loading=True)
+        self.request_full_page(document, index)
+
+    def request_full_page(self, document, index):
+        """在后台转换完整分辨率页面，完成后替换代理页"""
+        future = document.get_page_async(index)
+        future.add_done_callback(
+            lambda f: self.root.after(0, lambda: self.on_pdf_page_loaded(document, index, f))
+        )
+
+    def on_pdf_page_loaded(self, document, index, future, proxy=False):
+        """后台转换完成后显示页面（期间已翻到其他页或换了文件则忽略）"""
+        if document is not self.pdf_document or index != self.current_pdf_page:
+            return
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            messagebox.showerror("PDF处理错误", f"转换第 {index + 1} 页时出错: {str(error)}")
+            self.update_pdf_navigation()
+            return
+        if proxy and document.cached_page(index) is not None:
+            return  # 完整分辨率已经先到了
+        self.show_pdf_page(future.result(), proxy)
+
+    def show_pdf_page(self, page, proxy=False):
+        """显示当前PDF页面并预取相邻页"""
+        self.pdf_page_is_proxy = proxy
+        self.set_source_image(page)  # 重新处理当前页
+        self.update_pdf_navigation(loading=proxy)
+        if not proxy:
+            self.pdf_document.prefetch(self.current_pdf_page)
+
+    def ensure_full_resolution(self):
+        """当前显示的是代理页时，同步取得完整分辨率页面（保存和放大前调用）"""
+        if self.pdf_document and self.pdf_page_is_proxy:
+            self.show_pdf_page(self.pdf_document.get_page(self.current_pdf_page))
+
+    def update_pdf_navigation(self, loading=False):
+        """更新页码显示和导航按钮状态"""
+        total = self.pdf_document.page_count
+        text = f"第 {self.current_pdf_page + 1}/{total} 页"
+        if loading:
+            text += "（加载中...）"
+        self.page_label.config(text=text)
         self.prev_btn.config(state=tk.NORMAL if self.current_pdf_page > 0 else tk.DISABLED)
-        self.next_btn.config(state=tk.NORMAL if self.current_pdf_page < len(self.pdf_pages) - 1 else tk.DISABLED)
+        self.next_btn.config(state=tk.NORMAL if self.current_pdf_page < total - 1 else tk.DISABLED)
+
+    def set_source_image(self, image):
+        """设置当前图像：生成灰度图和预览代理图并刷新显示"""
+        self.original_image = image
+        self.gray_image = engine.to_gray(image)
+        self.preview_gray = engine.fit_to_size(self.gray_image, PREVIEW_SIZE)
+        self.processed_image = None
+        self.processed_threshold = None
+        self.auto_threshold = None
+        self.display_original_image()
+        self.process_image()
 
     def display_original_image(self):
         # 保存原始图像用于放大
         self.original_image_for_display = self.original_image.copy()
 
         # 调整图像大小以适应画布
-        height, width = self.original_image.shape[:2]
-        max_size = 400
-        if height > max_size or width > max_size:
-            scale = max_size / max(height, width)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            display_image = cv2.resize(self.original_image, (new_width, new_height))
-        else:
-            display_image = self.original_image
+        display_image = engine.fit_to_size(self.original_image, PREVIEW_SIZE)
 
         # 转换颜色空间从BGR到RGB
         display_image = cv2.cvtColor(display_image, cv2.COLOR_BGR2RGB)
@@ -403,36 +684,88 @@ class ThresholdGUI:
             200, 200, anchor=tk.CENTER, image=self.original_photo
         )
 
-    def process_image(self):
-        # 应用阈值处理 - 保留白色
-        _, self.processed_image = cv2.threshold(
-            self.gray_image,
-            self.threshold_value,
-            255,
-            cv2.THRESH_BINARY
-        )
-
-        # 保存处理后的图像用于放大
-        self.processed_image_for_display = self.processed_image.copy()
-
-        # 显示处理后的图像
-        self.display_processed_image()
+    def get_block_size(self):
+        """窗口输入框的值，无效时使用默认值"""
+        try:
+            return thresholds.valid_block_size(self.block_var.get())
+        except (tk.TclError, ValueError):
+            return thresholds.DEFAULT_BLOCK_SIZE
+
+    def threshold_options(self, **kwargs):
+        """当前界面上的阈值方法、DPI和输出格式（保存全部页和批量处理共用）"""
+        return engine.BatchOptions(self.threshold_value, dpi=self.get_dpi(), output_format=self.format_var.get(),
+                                   threshold_method=self.method_var.get(), block_size=self.get_block_size(),
+                                   **kwargs)
+
+    def on_method_change(self):
+        """切换阈值方法：只有固定阈值使用滑块"""
+        method = self.method_var.get()
+        self.threshold_slider.config(state=tk.NORMAL if method == defaults.DEFAULT_METHOD else tk.DISABLED)
+        if method == defaults.DEFAULT_METHOD:
+            self.value_label.config(text=str(self.threshold_value))
+        self.process_image()
 
-    def display_processed_image(self):
-        if self.processed_image is None:
+    def process_image(self):
+        """刷新预览：只对缩小后的灰度图做阈值处理（固定阈值和自动阈值用查找表）"""
+        if self.preview_gray is None:
             return
-
-        # 调整图像大小以适应画布
-        height, width = self.processed_image.shape[:2]
-        max_size = 400
-        if height > max_size or width > max_size:
-            scale = max_size / max(height, width)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            display_image = cv2.resize(self.processed_image, (new_width, new_height))
+        method = self.method_var.get()
+        # 应用阈值处理 - 保留白色
+        if method == thresholds.DEFAULT_METHOD:
+            display_image = engine.apply_threshold_lut(self.preview_gray, self.threshold_value)
+        elif method in thresholds.AUTO_METHODS:
+            # 自动阈值由全分辨率灰度图的直方图计算，每张图只算一次
+            if self.auto_threshold is None or self.auto_threshold[0] != method:
+                self.auto_threshold = (method, thresholds.auto_threshold(self.gray_image, method))
+            self.value_label.config(text=f"自动 {self.auto_threshold[1]}")
+            display_image = engine.apply_threshold_lut(self.preview_gray, self.auto_threshold[1])
         else:
-            display_image = self.processed_image
+            # 窗口按预览缩放比例缩小，使预览与全分辨率结果的局部范围一致
+            scale = self.preview_gray.shape[1] / self.gray_image.shape[1]
+            display_image = thresholds.apply(self.preview_gray, method, block_size=self.get_block_size() * scale)
+            self.value_label.config(text="局部")
 
+        # 显示处理后的图像
+        self.display_processed_image(display_image)
+
+    def processed_key(self):
+        """当前阈值参数（thresholds.method_key）"""
+        return thresholds.method_key(self.method_var.get(), self.threshold_value, self.get_block_size())
+
+    def processed_page_key(self, key):
+        """当前PDF页面结果在 processed_pages 中的键，当前不是完整分辨率PDF页面时为 None"""
+        if self.pdf_document is None or self.pdf_page_is_proxy:
+            return None
+        return self.current_pdf_page, self.pdf_document.dpi, key
+
+    def cached_processed_image(self, key):
+        """已按 key 处理好的全分辨率结果，没有时返回 None"""
+        if self.processed_image is not None and self.processed_threshold == key:
+            return self.processed_image
+        page_key = self.processed_page_key(key)
+        return self.processed_pages.get(page_key) if page_key else None
+
+    def remember_processed_image(self, gray_image, key, image, page_key=None):
+        """记住处理结果；期间已换了图像时只放入PDF页面缓存"""
+        if page_key:
+            self.processed_pages.put(page_key, image)
+        if gray_image is self.gray_image:
+            self.processed_image = image
+            self.processed_threshold = key
+
+    def get_processed_image(self):
+        """全分辨率处理结果，阈值参数变化后才重新计算"""
+        if self.gray_image is None:
+            return None
+        key = self.processed_key()
+        image = self.cached_processed_image(key)
+        if image is None:
+            image = thresholds.apply(self.gray_image, self.method_var.get(), self.threshold_value,
+                                     self.get_block_size(), threads=engine.DEFAULT_WORKERS)
+            self.remember_processed_image(self.gray_image, key, image, self.processed_page_key(key))
+        return image
+
+    def display_processed_image(self, display_image):
         # 转换为PIL图像格式
         pil_image = Image.fromarray(display_image)
 
@@ -449,21 +782,27 @@ class ThresholdGUI:
         self.threshold_value = int(value)
         self.value_label.config(text=str(self.threshold_value))
 
-        if self.original_image is not None:
-            self.process_image()
+        # 合并连续的滑块事件，只处理最新的阈值
+        if self.original_image is not None and self.preview_job is None:
+            self.preview_job = self.root.after(PREVIEW_DELAY_MS, self.run_preview_job)
+
+    def run_preview_job(self):
+        self.preview_job = None
+        self.process_image()
 
     def save_image(self):
-        if self.processed_image is None:
+        if self.gray_image is None:
             return
+        self.ensure_full_resolution()
 
         # 判断是否为PDF文件
-        is_pdf = bool(self.pdf_pages)
+        is_pdf = self.pdf_document is not None
 
         if is_pdf:
             # 询问用户保存当前页还是全部页
             choice = messagebox.askyesnocancel(
                 "保存选项",
-                f"检测到这是一个多页PDF（共{len(self.pdf_pages)}页）\n"
+                f"检测到这是一个多页PDF（共{self.pdf_document.page_count}页）\n"
                 "是否保存全部页面？\n"
                 "【是】保存全部页 | 【否】仅保存当前页 | 【取消】取消保存"
             )
@@ -478,44 +817,128 @@ class ThresholdGUI:
             save_dir = filedialog.askdirectory(title="选择保存目录")
             if not save_dir:
                 return
-            # 遍历所有页面，处理并保存
-            for i, page in enumerate(self.pdf_pages):
-                # 处理当前页
-                gray_img = cv2.cvtColor(page, cv2.COLOR_BGR2GRAY)
-                _, processed_img = cv2.threshold(gray_img, self.threshold_value, 255, cv2.THRESH_BINARY)
-                # 生成文件名（带页码）
-                filename = f"pdf_page_{i + 1}.png"
-                save_path = os.path.join(save_dir, filename)
-                # 解决中文路径问题
-                cv2.imencode('.png', processed_img)[1].tofile(save_path)
-            messagebox.showinfo("保存成功", f"全部{len(self.pdf_pages)}页已保存至：\n{save_dir}")
+            document = self.pdf_document
+            options = self.threshold_options(threshold_threads=engine.DEFAULT_WORKERS)
+            options.dpi = document.dpi
+            options.embedded_images = document.embedded_images  # 与预览页面取同一来源
+            # 已处理过的页面直接编码，已转换的页面跳过栅格化（页码从1开始）
+            key = engine.threshold_key(options)
+            ready = {index + 1: image for (index, dpi, page_key), image in self.processed_pages.snapshot().items()
+                     if dpi == document.dpi and page_key == key}
+            pages = {index + 1: page for index, page in document.cached_pages().items()}
+
+            def export(progress, cancel):
+                return engine.export_pdf(document.file_path, document.page_count, save_dir, options,
+                                         progress, cancel, ready, pages)
+
+            self.start_save(document.page_count, "保存全部页", export,
+                            lambda saved_to: messagebox.showinfo(
+                                "保存成功", f"全部{document.page_count}页已保存至：\n{saved_to}"))
         else:
             # 保存当前页
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".png",
                 filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("All files", "*.*")]
             )
-            if file_path:
-                # 解决中文路径问题
-                ext = os.path.splitext(file_path)[1].lower()
-                if ext in ['.jpg', '.jpeg']:
-                    cv2.imencode('.jpg', self.processed_image)[1].tofile(file_path)
-                else:
-                    cv2.imencode('.png', self.processed_image)[1].tofile(file_path)
+            if not file_path:
+                return
+            # 界面上的参数在主线程读取，阈值处理（结果未缓存时）和编码写入在后台进行
+            gray_image = self.gray_image
+            key = self.processed_key()
+            page_key = self.processed_page_key(key)
+            cached = self.cached_processed_image(key)
+            method, threshold_value, block_size = self.method_var.get(), self.threshold_value, self.get_block_size()
+
+            def save(progress, cancel):
+                image = cached
+                if image is None:
+                    progress(0, "正在处理...")
+                    image = thresholds.apply(gray_image, method, threshold_value, block_size,
+                                             threads=engine.DEFAULT_WORKERS)
+                if cancel.is_set():
+                    raise pipeline.Cancelled()
+                progress(1, "正在保存...")
+                engine.write_image(file_path, image)
+                return image
+
+            def saved(image):
+                self.remember_processed_image(gray_image, key, image, page_key)
                 messagebox.showinfo("保存成功", f"图像已保存至: {file_path}")
 
+            self.start_save(2, "保存图像", save, saved)
+
+    def sweep_thresholds(self):
+        """阈值扫描：当前图像（PDF为当前页）不重新转换，按输入的阈值列表各做一次查找表运算，
+        结果和对比图保存到所选目录，完成后显示对比图"""
+        if self.gray_image is None:
+            return
+        try:
+            values = sweep.parse_thresholds(self.sweep_var.get())
+        except ValueError as e:
+            messagebox.showerror("阈值列表无效", f"{e}\n格式如 120,140,160 或 100-200:20（起-止:步长）")
+            return
+        self.ensure_full_resolution()
+        save_dir = filedialog.askdirectory(title="选择保存目录")
+        if not save_dir:
+            return
+        if self.pdf_document:
+            name = os.path.splitext(os.path.basename(self.pdf_document.file_path))[0]
+            name = f"{name}_page_{self.current_pdf_page + 1}"
+        else:
+            name = os.path.splitext(os.path.basename(self.image_path))[0]
+        output_path = os.path.join(save_dir, name + ".png")
+        gray_image = self.gray_image
+
+        def run(progress, cancel):
+            return sweep.sweep_image(gray_image, output_path, values, progress, cancel)
+
+        self.start_save(len(values) + 1, "阈值扫描", run,
+                        lambda sheet: ImageViewer(self.root, sheet, f"阈值扫描对比图 - 结果保存在 {save_dir}"))
+
+    def start_save(self, total, title, task, on_done):
+        """在后台线程中执行保存任务 task(progress, cancel)，显示可取消的进度窗口，完成后在主线程调用 on_done(结果)"""
+        cancel = threading.Event()
+        window = ProgressWindow(self.root, total, title, on_cancel=cancel.set)
+
+        def progress(current, status):
+            self.root.after(0, lambda c=current, s=status: window.update_progress(c, s))
+
+        def run():
+            try:
+                result = task(progress, cancel)
+            except pipeline.Cancelled:
+                done = lambda: messagebox.showinfo("已取消", "保存已取消，未完成的文件已删除")
+            except Exception as e:
+                done = lambda e=e: messagebox.showerror("保存失败", f"保存时出错: {str(e)}")
+            else:
+                done = lambda: on_done(result)
+
+            def finish():
+                window.close()
+                done()
+            self.root.after(0, finish)
+
+        threading.Thread(target=run, daemon=True).start()
+
     def zoom_original(self, event):
         """双击原图放大"""
         if hasattr(self, 'original_image_for_display'):
+            self.ensure_full_resolution()
             viewer = ImageViewer(self.root, self.original_image_for_display, "原图放大视图")
 
     def zoom_processed(self, event):
         """双击处理后的图放大"""
-        if hasattr(self, 'processed_image_for_display'):
-            viewer = ImageViewer(self.root, self.processed_image_for_display, "处理后图像放大视图")
+        if self.gray_image is not None:
+            self.ensure_full_resolution()
+            viewer = ImageViewer(self.root, self.get_processed_image(), "处理后图像放大视图")
 
     def batch_process(self):
         """批量处理input文件夹中的所有图片和PDF"""
+        try:
+            self.ensure_modules()
+        except Exception as e:
+            messagebox.showerror("错误", f"无法加载处理模块: {str(e)}")
+            return
         input_dir = os.path.join(os.getcwd(), "input")
         output_dir = os.path.join(os.getcwd(), "output")
 
@@ -527,122 +950,84 @@ class ThresholdGUI:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-        # 支持的文件格式（包括图片和PDF）
-        all_extensions = ['*.jpg', '*.jpeg', '*.png', '*.bmp', '*.tif', '*.pdf']
-        all_files = []
-
-        for ext in all_extensions:
-            all_files.extend(glob.glob(os.path.join(input_dir, ext)))
-
-        if not all_files:
+        # 递归扫描input（包括子目录，扩展名不区分大小写）；文件边发现边处理，PDF页数在处理前才读取
+        files = discovery.iter_input_files(input_dir)
+        first = next(files, None)
+        if first is None:
             messagebox.showinfo("提示", "input文件夹中没有找到支持的文件（图片或PDF）")
             return
+        file_tasks = discovery.iter_file_tasks(itertools.chain([first], files))
 
-        # 计算总任务量（图片1页，PDF计算实际页数）
-        total_tasks = 0
-        file_tasks = []  # 存储每个文件的任务量
-
-        for file_path in all_files:
-            if file_path.lower().endswith('.pdf'):
-                try:
-                    page_count = len(convert_from_path(file_path))
-                    total_tasks += page_count
-                    file_tasks.append((file_path, page_count))
-                except:
-                    file_tasks.append((file_path, 0))  # 标记为错误文件
-            else:
-                total_tasks += 1
-                file_tasks.append((file_path, 1))
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except (tk.TclError, ValueError):
+            workers = 1
+
+        cache = ResultCache(os.path.join(output_dir, ".cache")) if self.use_cache_var.get() else None
+        options = self.threshold_options(cache=cache, resume=self.resume_var.get(),
+                                         threshold_threads=max(1, engine.DEFAULT_WORKERS // workers),
+                                         timer=perf.StageTimer(), input_root=input_dir,
+                                         skip_blank=self.skip_blank_var.get(), auto_crop=self.auto_crop_var.get())
+
+        # 加入任务队列：进程数在所有任务之间共享，同一输出目录的任务依次执行
+        self.batch_count += 1
+        job = jobs.BatchJob(file_tasks, output_dir, options, workers, name=f"#{self.batch_count}")
+        window = ProgressWindow(self.root, 1, f"批量处理 {job.name}", show_stats=True, modal=False,
+                                on_cancel=lambda: self.scheduler.cancel(job),
+                                on_pause=lambda paused: job.pause() if paused else job.resume())
+
+        def progress(current, status):
+            stats = options.timer.format() if options.timer else None
+            self.root.after(0, lambda c=current, s=status, t=stats: window.update_progress(c, s, t))
+
+        def on_error(message):
+            self.root.after(0, lambda m=message: messagebox.showerror("处理错误", m))
+
+        job.progress = progress
+        job.on_error = on_error
+        job.on_total = lambda total, complete: self.root.after(0, lambda: window.set_total(total, complete))
+        job.on_finish = lambda finished: self.root.after(0, lambda: self.finish_batch_job(finished, window))
+        self.scheduler.submit(job)
+        if job.state == jobs.QUEUED:
+            window.update_progress(0, "排队中（等待其他批量任务完成）...")
+
+    def finish_batch_job(self, job, window):
+        """批量任务结束：关闭进度窗口并显示结果"""
+        window.close()
+        options = job.options
+        if job.state == jobs.CANCELLED:
+            messagebox.showinfo("已取消", f"批量处理 {job.name} 已取消。已完成的页面记录在任务清单中，"
+                                       f"勾选“续做”后再次批量处理可以从中断处继续")
+            return
+        if job.state == jobs.FAILED:
+            messagebox.showerror("处理错误", f"批量处理 {job.name} 失败: {str(job.error)}")
+            return
 
-        if total_tasks == 0:
+        if job.total == 0:
             messagebox.showinfo("提示", "没有可处理的有效文件")
             return
 
-        # 启动线程处理批量任务
-        threading.Thread(
-            target=self.batch_process_thread,
-            args=(file_tasks, output_dir, total_tasks),
-            daemon=True
-        ).start()
-
-    def batch_process_thread(self, file_tasks, output_dir, total_tasks):
-        """批量处理线程"""
-        # 在主线程创建进度窗口
-        self.root.after(0, lambda: self.create_batch_progress_window(total_tasks))
-
-        current_task = 0
-        processed_count = 0
-
-        for file_path, page_count in file_tasks:
-            try:
-                filename = os.path.splitext(os.path.basename(file_path))[0]
-
-                if file_path.lower().endswith('.pdf') and page_count > 0:
-                    # 处理PDF文件 - 新增：创建对应文件夹
-                    pdf_output_dir = os.path.join(output_dir, filename)
-                    os.makedirs(pdf_output_dir, exist_ok=True)
-
-                    pages = convert_from_path(file_path)
-                    for i, page in enumerate(pages, 1):
-                        current_task += 1
-                        status = f"处理PDF: {filename} (第{i}/{page_count}页)"
-                        self.root.after(0, lambda c=current_task, s=status: self.update_batch_progress(c, s))
-
-                        # 转换为OpenCV格式并处理
-                        open_cv_image = np.array(page)
-                        img = open_cv_image[:, :, ::-1].copy()  # RGB转BGR
-                        gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                        _, processed_img = cv2.threshold(gray_img, self.threshold_value, 255, cv2.THRESH_BINARY)
-
-                        # 保存处理结果 - 保存到PDF专属文件夹
-                        output_path = os.path.join(pdf_output_dir, f"page_{i}.png")
-                        # 解决中文路径问题
-                        cv2.imencode('.png', processed_img)[1].tofile(output_path)
-                        processed_count += 1
-                elif not file_path.lower().endswith('.pdf'):
-                    # 处理图片文件
-                    current_task += 1
-                    status = f"处理图片: {filename}"
-                    self.root.after(0, lambda c=current_task, s=status: self.update_batch_progress(c, s))
-
-                    img = cv2.imread(file_path)
-                    if img is not None:
-                        gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                        _, processed_img = cv2.threshold(gray_img, self.threshold_value, 255, cv2.THRESH_BINARY)
-
-                        output_path = os.path.join(output_dir, os.path.basename(file_path))
-                        # 解决中文路径问题
-                        ext = os.path.splitext(output_path)[1].lower()
-                        if ext in ['.jpg', '.jpeg']:
-                            cv2.imencode('.jpg', processed_img)[1].tofile(output_path)
-                        else:
-                            cv2.imencode('.png', processed_img)[1].tofile(output_path)
-                        processed_count += 1
-            except Exception as e:
-                error_msg = f"处理文件 {os.path.basename(file_path)} 时出错: {str(e)}"
-                self.root.after(0, lambda m=error_msg: messagebox.showerror("处理错误", m))
-
         # 处理完成
-        self.root.after(0, self.close_batch_progress_window)
-        self.root.after(0, lambda: messagebox.showinfo(
-            "完成",
-            f"批量处理完成，共处理 {processed_count} 个文件/页面，结果保存在 {output_dir}"
-        ))
-
-    def create_batch_progress_window(self, total):
-        """创建批量处理进度窗口"""
-        self.batch_progress_window = ProgressWindow(self.root, total, "批量处理中")
-
-    def update_batch_progress(self, value, status):
-        """更新批量处理进度"""
-        if hasattr(self, 'batch_progress_window'):
-            self.batch_progress_window.update_progress(value, status)
-
-    def close_batch_progress_window(self):
-        """关闭批量处理进度窗口"""
-        if hasattr(self, 'batch_progress_window'):
-            self.batch_progress_window.close()
-            delattr(self, 'batch_progress_window')
+        message = f"批量处理完成，共处理 {job.processed_count} 个文件/页面，结果保存在 {job.output_dir}"
+        if options.cache:
+            message += "\n" + options.cache.report()
+        if options.timer:
+            report_path = os.path.join(job.output_dir, BATCH_REPORT_NAME)
+            try:
+                options.timer.write_report(report_path)
+                message += f"\n\n{options.timer.format()}\n统计报告: {report_path}"
+            except OSError:
+                message += f"\n\n{options.timer.format()}"
+        messagebox.showinfo("完成", message)
+
+    def on_close(self):
+        """关闭主窗口：有未完成的批量任务时确认后取消"""
+        if self.scheduler is not None and self.scheduler.active_jobs():
+            if not messagebox.askyesno("退出", "还有未完成的批量任务，确定取消并退出吗？"):
+                return
+            self.scheduler.cancel_all()
+        self.close_pdf_document()
+        self.root.destroy()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+"""批量处理任务清单（output/manifest.jsonl，不依赖 tkinter）
+
+每完成（或失败）一页追加一行JSON，记录输入文件指纹、处理参数和输出文件校验和。
+同一输出的多条记录以最后一条为准；进程中途被杀时最后一行可能不完整，读取时忽略。
+续做（resume）时只处理清单中缺失、失败或已过期（输入或参数变化、输出文件丢失）的项。
+跳过的空白页记为 "blank"，没有输出文件，参数和输入未变时同样视为已完成。
+"""
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_NAME = "manifest.jsonl"
+HASH_CHUNK = 1024 * 1024
+
+
+def sha256_file(file_path):
+    """文件内容的 SHA-256（分块读取）"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """任务清单，只在主进程中读写（工作进程的记录由主进程追加）"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.entries = {}  # 输出相对路径 -> 最后一条记录
+        self._inputs = {}  # 输入绝对路径 -> 最后一条带指纹的记录
+        self._load()
+        self._fingerprints = {}  # 输入绝对路径 -> 本次运行的指纹
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 中断时写了一半的行
+                    self._remember(record)
+        except OSError:
+            pass
+
+    def _remember(self, record):
+        if "output" in record:
+            self.entries[record["output"]] = record
+        if record.get("input_sha256"):
+            self._inputs[record["input"]] = record
+
+    def _key(self, output_path):
+        return os.path.relpath(os.path.abspath(output_path), os.path.abspath(self.output_dir)).replace(os.sep, "/")
+
+    def fingerprint(self, file_path):
+        """输入文件指纹 {size, mtime_ns, sha256}；大小和修改时间未变时沿用清单中的哈希，不重新读取"""
+        file_path = os.path.abspath(file_path)
+        cached = self._fingerprints.get(file_path)
+        if cached is not None:
+            return cached
+        st = os.stat(file_path)
+        sha = None
+        record = self._inputs.get(file_path)
+        if record and record.get("input_size") == st.st_size and record.get("input_mtime_ns") == st.st_mtime_ns:
+            sha = record["input_sha256"]
+        fingerprint = {
+            "input_size": st.st_size,
+            "input_mtime_ns": st.st_mtime_ns,
+            "input_sha256": sha or sha256_file(file_path),
+        }
+        self._fingerprints[file_path] = fingerprint
+        return fingerprint
+
+    def forget(self, file_path):
+        """丢弃本次运行缓存的输入指纹（常驻服务中输入文件被重新写入后调用）"""
+        self._fingerprints.pop(os.path.abspath(file_path), None)
+
+    def is_current(self, file_path, output_path, params):
+        """该输出是否已完成且未过期（参数相同、输出存在、输入未变化）"""
+        record = self.entries.get(self._key(output_path))
+        if record is None or record.get("status") not in ("done", "blank"):
+            return False
+        if any(record.get(key) != value for key, value in params.items()):
+            return False
+        if record["status"] == "done" and not os.path.isfile(output_path):
+            return False
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return False
+        if record.get("input_size") == st.st_size and record.get("input_mtime_ns") == st.st_mtime_ns:
+            return True
+        # 修改时间变了（如重新复制），内容相同仍视为未过期
+        return self.fingerprint(file_path)["input_sha256"] == record.get("input_sha256")
+
+    def append(self, record):
+        """追加一条记录（补充输入指纹和时间）并立即落盘"""
+        record = dict(record)
+        record["input"] = os.path.abspath(record["input"])
+        record["output"] = self._key(record["output"])
+        try:
+            record.update(self.fingerprint(record["input"]))
+        except OSError:
+            pass
+        record["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._remember(record)
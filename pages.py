@@ -0,0 +1,159 @@
+"""PDF页面按需加载与LRU页面缓存（不依赖 tkinter）"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import engine
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024  # 页面缓存上限（字节）
+PROXY_CACHE_BYTES = 32 * 1024 * 1024  # 低分辨率代理页缓存上限（字节）
+PREFETCH_RADIUS = 1  # 预取当前页前后各几页
+
+
+class PageCache:
+    """按字节数限制容量的LRU缓存（线程安全）"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """取出缓存项并标记为最近使用，不存在时返回 None"""
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """加入缓存，超出容量时淘汰最久未使用的项（至少保留刚加入的一项）"""
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            self._items[key] = value
+            self.current_bytes += value.nbytes
+            while self.current_bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def snapshot(self):
+        """当前全部缓存项 {键: 值}（不改变LRU顺序）"""
+        with self._lock:
+            return dict(self._items)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+
+class LazyPdfDocument:
+    """按需转换页面的PDF文档
+
+    页数来自PDF元数据，页面在第一次访问时才按 dpi 转换为BGR图像并放入LRU缓存；
+    相邻页面在后台线程中预取。栅格化耗时与 DPI 的平方成正比，
+    所以界面可以先取 proxy_dpi 的低分辨率代理页显示，再换成完整分辨率。页码从0开始。
+    embedded_images 时页面与批量处理取同一来源（见 engine.render_pdf_page），预览与保存的结果一致。
+    """
+
+    def __init__(self, file_path, cache_bytes=DEFAULT_CACHE_BYTES, prefetch_radius=PREFETCH_RADIUS,
+                 dpi=engine.DEFAULT_DPI, proxy_dpi=engine.PROXY_DPI, embedded_images=True):
+        self.file_path = file_path
+        self.page_count = engine.pdf_page_count(file_path)
+        self.prefetch_radius = prefetch_radius
+        self.dpi = dpi
+        self.proxy_dpi = proxy_dpi
+        self.embedded_images = embedded_images
+        self.cache = PageCache(cache_bytes)  # (页码, DPI) -> BGR图像
+        self.proxy_cache = PageCache(PROXY_CACHE_BYTES)
+        self._pending = {}  # 正在转换的 (页码, DPI) -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-page")
+
+    @property
+    def uses_proxy(self):
+        """代理页分辨率低于目标分辨率时才值得先显示代理页"""
+        return bool(self.proxy_dpi) and self.proxy_dpi < self.dpi
+
+    def set_dpi(self, dpi):
+        """修改完整分辨率；旧分辨率的页面留在缓存中，按LRU淘汰"""
+        self.dpi = dpi
+
+    def render_page(self, index, dpi=None):
+        """按 dpi（默认为文档的 dpi）转换单页（不经过缓存）"""
+        return engine.render_pdf_page(self.file_path, index + 1, dpi or self.dpi, self.embedded_images)
+
+    def _load(self, index, dpi, cache):
+        try:
+            page = self.render_page(index, dpi)
+            cache.put((index, dpi), page)
+            return page
+        finally:
+            with self._lock:
+                self._pending.pop((index, dpi), None)
+
+    def _submit(self, index, dpi, cache):
+        with self._lock:
+            future = self._pending.get((index, dpi))
+            if future is None:
+                future = self._executor.submit(self._load, index, dpi, cache)
+                self._pending[(index, dpi)] = future
+            return future
+
+    def cached_page(self, index):
+        """缓存中的完整分辨率页面，不存在时返回 None"""
+        return self.cache.get((index, self.dpi))
+
+    def cached_proxy(self, index):
+        """缓存中的代理页，不存在时返回 None"""
+        return self.proxy_cache.get((index, self.proxy_dpi))
+
+    def cached_pages(self):
+        """缓存中全部完整分辨率页面 {页码: BGR图像}"""
+        return {index: page for (index, dpi), page in self.cache.snapshot().items() if dpi == self.dpi}
+
+    def get_page_async(self, index):
+        """返回一个 Future，结果为该页的BGR图像；同一页不会重复转换"""
+        return self._submit(index, self.dpi, self.cache)
+
+    def get_proxy_async(self, index):
+        """返回一个 Future，结果为该页的低分辨率代理图像"""
+        return self._submit(index, self.proxy_dpi, self.proxy_cache)
+
+    def get_page(self, index):
+        """同步获取页面，优先读缓存"""
+        page = self.cached_page(index)
+        if page is not None:
+            return page
+        return self.get_page_async(index).result()
+
+    def get_proxy(self, index):
+        """同步获取代理页，优先读缓存"""
+        page = self.cached_proxy(index)
+        if page is not None:
+            return page
+        return self.get_proxy_async(index).result()
+
+    def prefetch(self, index):
+        """在后台预取 index 前后的页面"""
+        for offset in range(1, self.prefetch_radius + 1):
+            for neighbour in (index + offset, index - offset):
+                if 0 <= neighbour < self.page_count and (neighbour, self.dpi) not in self.cache:
+                    self.get_page_async(neighbour)
+
+    def close(self):
+        """停止后台转换并释放缓存"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.cache.clear()
+        self.proxy_cache.clear()
@@ -0,0 +1,94 @@
+"""页面统计与空白页检测（不依赖 tkinter）
+
+在缩小的代理图上统计灰度直方图、墨迹（灰度不大于阈值的像素）比例和内容边界框，耗时远小于整页的阈值处理和编码。
+批量处理可以据此跳过空白页（不编码、不写出），或把结果裁剪到内容边界框后再编码。
+统计结果追加到输出目录的 page_stats.jsonl（每页一行，同一页以最后一行为准），续做或缓存命中的页不重新统计。
+"""
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+STATS_NAME = "page_stats.jsonl"
+PROXY_SIZE = 512  # 代理图的长边（像素）
+BLANK_INK = 0.0001  # 去掉孤立噪点后墨迹比例不超过此值的页面视为空白（约为代理图上几十个像素）
+CROP_MARGIN = 0.01  # 裁剪时内容边界框四周保留的边距（页面长边的比例）
+
+
+def page_stats(gray_image, ink_level, blank_ink=BLANK_INK, proxy_size=PROXY_SIZE):
+    """统计一页：返回 {width, height, ink_level, ink, mean, histogram, bbox, blank}
+
+    histogram 为代理图的256级灰度直方图，ink 为代理图上灰度不大于 ink_level 的像素比例，
+    bbox 为去掉孤立噪点后墨迹的边界框 [x0, y0, x1, y1]（整页坐标，不含 x1/y1，已加边距），没有墨迹时为 None；
+    blank 表示去噪后的墨迹比例不超过 blank_ink。
+    """
+    height, width = gray_image.shape[:2]
+    scale = min(1.0, proxy_size / max(height, width))
+    if scale < 1.0:
+        proxy = cv2.resize(gray_image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    else:
+        proxy = gray_image
+    histogram = np.bincount(proxy.ravel(), minlength=256)
+    pixels = max(1, proxy.size)
+    ink = float(histogram[:ink_level + 1].sum()) / pixels
+    mean = float(np.dot(histogram, np.arange(256))) / pixels
+
+    # 开运算去掉单个像素的噪点（灰尘、扫描噪声），再取边界框
+    mask = np.where(proxy <= ink_level, np.uint8(255), np.uint8(0))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+    points = cv2.findNonZero(mask)
+    content = 0 if points is None else len(points)
+    bbox = None
+    if points is not None:
+        x, y, w, h = cv2.boundingRect(points)
+        # 代理图的一个像素对应整页 1/scale 个像素，边界向外取整再加边距
+        margin = int(CROP_MARGIN * max(height, width))
+        bbox = [max(0, int(x / scale) - margin), max(0, int(y / scale) - margin),
+                min(width, int(np.ceil((x + w) / scale)) + margin), min(height, int(np.ceil((y + h) / scale)) + margin)]
+    return {"width": width, "height": height, "ink_level": ink_level, "ink": ink, "mean": mean,
+            "histogram": histogram.tolist(), "bbox": bbox, "blank": content / pixels <= blank_ink}
+
+
+def crop(binary_image, bbox):
+    """裁剪到 bbox（page_stats 的结果，None 表示不裁剪），返回连续数组"""
+    if bbox is None:
+        return binary_image
+    x0, y0, x1, y1 = bbox
+    if (x0, y0, x1, y1) == (0, 0, binary_image.shape[1], binary_image.shape[0]):
+        return binary_image
+    return np.ascontiguousarray(binary_image[y0:y1, x0:x1])
+
+
+class StatsIndex:
+    """页面统计索引（output/page_stats.jsonl），只在主进程中追加（工作进程的记录由主进程追加）"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, STATS_NAME)
+
+    def append(self, record):
+        record = dict(record)
+        record["input"] = os.path.abspath(record["input"])
+        record["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_index(output_dir):
+    """读取统计索引，返回 {(输入绝对路径, 页码): 最后一条记录}；中断时写了一半的行忽略"""
+    entries = {}
+    try:
+        with open(os.path.join(output_dir, STATS_NAME), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                entries[(record["input"], record["page"])] = record
+    except OSError:
+        pass
+    return entries
@@ -0,0 +1,260 @@
+"""性能测量辅助函数（不依赖 tkinter）"""
+import csv
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ("extract", "rasterize", "gray", "stats", "threshold", "encode", "write", "cache")  # 处理管线的阶段（按顺序）
+STAGE_NAMES = {"extract": "嵌入图像", "rasterize": "栅格化", "gray": "灰度解码", "stats": "页面统计", "threshold": "阈值",
+               "encode": "编码", "write": "写入", "cache": "缓存读写", "pending_units": "待处理任务单元",
+               "threshold_queue": "阈值队列", "encode_queue": "编码队列", "write_queue": "写入队列"}
+FALLBACK_PREFIX = "fallback_"  # PDF页面栅格化原因的计数（原因见 embedded.REASONS）
+
+
+def peak_rss_bytes(children=False):
+    """返回进程的峰值常驻内存（字节），无法获取时返回 None
+
+    children=True 时返回已结束子进程（如进程池工作进程）中最大的峰值，仅类 Unix 系统支持。
+    """
+    if sys.platform == "win32":
+        return None if children else _windows_peak_working_set()
+    try:
+        import resource
+    except ImportError:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _windows_peak_working_set():
+    """Windows 下通过 GetProcessMemoryInfo 读取峰值工作集"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def format_bytes(value):
+    """字节数格式化为可读字符串"""
+    if value is None:
+        return "未知"
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.1f} {unit}" if unit != "B" else f"{value} B"
+        value /= 1024
+
+
+def percentile(values, q):
+    """线性插值的百分位数（q 为 0-100），values 为空时返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class StageTimer:
+    """批量处理的分阶段计时和计数（线程安全）
+
+    - 阶段：累计耗时、单次最大耗时、次数
+    - 计数：pages（页数）、bytes_in（读入的页面/图片字节数）、bytes_out（写出的字节数）等
+    - 队列深度等瞬时值：当前值和最大值
+    每页各阶段耗时之和记为该页的延迟（流水线中一页经过多个线程时用 detach_page/attach_page 传递）。传给工作进程时从空白状态开始，
+    工作进程返回 snapshot()，由主进程 merge() 合并。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()  # 每个线程当前页已累计的耗时
+        self.totals = dict.fromkeys(STAGES, 0.0)  # 阶段 -> 累计秒数
+        self.maxima = dict.fromkeys(STAGES, 0.0)  # 阶段 -> 单次最大秒数
+        self.calls = dict.fromkeys(STAGES, 0)  # 阶段 -> 次数
+        self.counters = {"pages": 0, "bytes_in": 0, "bytes_out": 0}
+        self.gauges = {}  # 名称 -> [当前值, 最大值]
+        self.page_times = []  # 每页的延迟（秒）
+        self.started = time.perf_counter()
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, elapsed):
+        """记录一次 name 阶段的耗时（无法用 stage 包住的交错阶段使用）"""
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + elapsed
+            self.maxima[name] = max(self.maxima.get(name, 0.0), elapsed)
+            self.calls[name] = self.calls.get(name, 0) + 1
+        self._local.page = getattr(self._local, "page", 0.0) + elapsed
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """记录队列深度等瞬时值"""
+        with self._lock:
+            current = self.gauges.setdefault(name, [0, 0])
+            current[0] = value
+            current[1] = max(current[1], value)
+
+    def detach_page(self):
+        """取出当前线程为当前页累计的耗时（页面交给其他线程继续处理时使用）"""
+        elapsed = getattr(self._local, "page", 0.0)
+        self._local.page = 0.0
+        return elapsed
+
+    def attach_page(self, elapsed):
+        """当前线程接手一页，继续累计该页在其他线程中已用的耗时"""
+        self._local.page = getattr(self._local, "page", 0.0) + elapsed
+
+    def end_page(self):
+        """当前线程的一页处理完成"""
+        elapsed = self.detach_page()
+        with self._lock:
+            self.page_times.append(elapsed)
+            self.counters["pages"] = self.counters.get("pages", 0) + 1
+
+    def snapshot(self):
+        """可序列化的原始数据，用于跨进程合并"""
+        with self._lock:
+            return {
+                "totals": dict(self.totals),
+                "maxima": dict(self.maxima),
+                "calls": dict(self.calls),
+                "counters": dict(self.counters),
+                "gauges": {name: list(value) for name, value in self.gauges.items()},
+                "page_times": list(self.page_times),
+            }
+
+    def merge(self, snapshot):
+        with self._lock:
+            for name, value in snapshot["totals"].items():
+                self.totals[name] = self.totals.get(name, 0.0) + value
+            for name, value in snapshot["maxima"].items():
+                self.maxima[name] = max(self.maxima.get(name, 0.0), value)
+            for name, value in snapshot["calls"].items():
+                self.calls[name] = self.calls.get(name, 0) + value
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, (current, peak) in snapshot["gauges"].items():
+                mine = self.gauges.setdefault(name, [0, 0])
+                mine[1] = max(mine[1], peak)
+            self.page_times.extend(snapshot["page_times"])
+
+    def summary(self):
+        """{pages, seconds, wall_seconds, pages_per_sec, p50_ms, p95_ms, stages, stage_max_ms, stage_calls,
+        counters, gauges}；pages_per_sec 按计时开始以来的实际时间计算"""
+        with self._lock:
+            page_times = list(self.page_times)
+            wall = time.perf_counter() - self.started
+            p50 = percentile(page_times, 50)
+            p95 = percentile(page_times, 95)
+            return {
+                "pages": len(page_times),
+                "seconds": sum(page_times),
+                "wall_seconds": wall,
+                "pages_per_sec": len(page_times) / wall if wall else None,
+                "p50_ms": p50 * 1000 if p50 is not None else None,
+                "p95_ms": p95 * 1000 if p95 is not None else None,
+                "stages": dict(self.totals),
+                "stage_max_ms": {name: value * 1000 for name, value in self.maxima.items()},
+                "stage_calls": dict(self.calls),
+                "counters": dict(self.counters),
+                "gauges": {name: {"current": value[0], "max": value[1]} for name, value in self.gauges.items()},
+            }
+
+    def format(self):
+        """多行文本摘要（进度窗口和命令行使用）"""
+        s = self.summary()
+        speed = f"{s['pages_per_sec']:.2f} 页/秒" if s["pages_per_sec"] else "-"
+        lines = [f"{s['pages']} 页  {speed}  读入 {format_bytes(s['counters'].get('bytes_in', 0))}  "
+                 f"写出 {format_bytes(s['counters'].get('bytes_out', 0))}"]
+        if s["p50_ms"] is not None:
+            lines[0] += f"  p50 {s['p50_ms']:.0f}ms  p95 {s['p95_ms']:.0f}ms"
+        if s["counters"].get("blank_pages") or s["counters"].get("cropped_pages"):
+            lines[0] += (f"  跳过空白页 {s['counters'].get('blank_pages', 0)}"
+                         f"  裁剪 {s['counters'].get('cropped_pages', 0)} 页")
+        if s["counters"].get("embedded_pages") or s["counters"].get("rasterized_pages"):
+            from embedded import REASONS  # 此时已在处理PDF，OpenCV 已经载入
+
+            reasons = [f"{REASONS.get(name[len(FALLBACK_PREFIX):], name)} {value}"
+                       for name, value in s["counters"].items() if name.startswith(FALLBACK_PREFIX)]
+            lines.append(f"PDF页面: 嵌入图像 {s['counters'].get('embedded_pages', 0)} 页  "
+                         f"栅格化 {s['counters'].get('rasterized_pages', 0)} 页"
+                         + (f"（{', '.join(reasons)}）" if reasons else ""))
+        for name, total in s["stages"].items():
+            if s["stage_calls"].get(name):
+                lines.append(f"{STAGE_NAMES.get(name, name)}: 累计 {total:.2f}s  最长 {s['stage_max_ms'][name]:.0f}ms  "
+                             f"{s['stage_calls'][name]} 次")
+        for name, value in s["gauges"].items():
+            lines.append(f"{STAGE_NAMES.get(name, name)}: 当前 {value['current']}  最大 {value['max']}")
+        return "\n".join(lines)
+
+    def write_report(self, path):
+        """写出报告：.csv 为 指标,值 两列，其余扩展名为JSON"""
+        summary = self.summary()
+        if not path.lower().endswith(".csv"):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            return
+        rows = [("pages", summary["pages"]), ("wall_seconds", summary["wall_seconds"]),
+                ("pages_per_sec", summary["pages_per_sec"]), ("p50_ms", summary["p50_ms"]),
+                ("p95_ms", summary["p95_ms"])]
+        rows += [(name, value) for name, value in summary["counters"].items() if name != "pages"]
+        for name in summary["stages"]:
+            rows += [(f"{name}_seconds", summary["stages"][name]), (f"{name}_max_ms", summary["stage_max_ms"][name]),
+                     (f"{name}_calls", summary["stage_calls"][name])]
+        rows += [(f"{name}_max", value["max"]) for name, value in summary["gauges"].items()]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("metric", "value"))
+            writer.writerows(rows)
+
+
+@contextmanager
+def profile(path):
+    """用 cProfile 分析 with 块内的代码，结束后把统计写入 path（可用 python -m pstats 或 snakeviz 查看）"""
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
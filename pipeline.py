@@ -0,0 +1,174 @@
+"""多阶段流水线：各阶段在自己的线程中运行，通过有界队列连接（不依赖 tkinter）
+
+source 在生产者线程中逐项产出，依次经过各阶段的工作线程，最后由调用线程按 source 的顺序交给 sink。
+队列满时上游阻塞（背压），所以同时在内存中的项数有上限，吞吐量取决于最慢的阶段而不是各阶段之和。
+OpenCV、numpy、文件读写和 pdftoppm 子进程在运行时都释放 GIL，线程之间可以真正重叠。
+任一阶段或 sink 出错时停止整条流水线，在调用线程中重新抛出该异常；
+传入的 cancel（threading.Event）被设置时同样停止，并抛出 Cancelled。
+"""
+import queue
+import threading
+
+DEFAULT_QUEUE_SIZE = 4  # 每个阶段输入队列的容量（项）
+QUEUE_POLL_SECONDS = 0.1  # 阻塞在队列上时检查停止标志的间隔
+
+_STOP = object()  # 上游已经结束
+
+
+class Cancelled(Exception):
+    """流水线在全部项完成前被取消"""
+
+
+class Stage:
+    """流水线的一个阶段：func(item) 返回交给下一阶段的项，由 workers 个线程并行调用"""
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+
+
+def run(source, stages, sink, queue_size=DEFAULT_QUEUE_SIZE, timer=None, cancel=None):
+    """运行流水线，全部项交给 sink 后返回
+
+    queue_size 为 0 时不启动线程，在调用线程中逐项依次执行各阶段（与以前的串行处理相同）。
+    timer（perf.StageTimer）记录各阶段输入队列的深度（<阶段名>_queue，放入和取出时更新，结束时为 0），
+    并把每项在各线程中累计的阶段耗时带到下一个线程，使每页的延迟仍是该页各阶段耗时之和。
+    """
+    if queue_size <= 0:
+        for item in source:
+            for stage in stages:
+                if cancel and cancel.is_set():
+                    raise Cancelled()
+                item = stage.func(item)
+            sink(item)
+        return
+
+    stop = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]  # 最后一个队列通往 sink
+    gauge_names = [f"{stage.name}_queue" for stage in stages] + [None]
+    remaining = [stage.workers for stage in stages]
+    remaining_lock = threading.Lock()
+
+    def fail(error):
+        errors.append(error)
+        stop.set()
+
+    def stopped():
+        return stop.is_set() or (cancel is not None and cancel.is_set())
+
+    def put(index, entry):
+        """放入第 index 个队列，流水线停止时返回 False"""
+        while not stopped():
+            try:
+                queues[index].put(entry, timeout=QUEUE_POLL_SECONDS)
+            except queue.Full:
+                continue
+            if timer and gauge_names[index]:
+                timer.gauge(gauge_names[index], queues[index].qsize())
+            return True
+        return False
+
+    def get(index):
+        """从第 index 个队列取出一项，流水线停止时返回 None"""
+        while not stopped():
+            try:
+                entry = queues[index].get(timeout=QUEUE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if timer and gauge_names[index]:
+                timer.gauge(gauge_names[index], queues[index].qsize())
+            return entry
+        return None
+
+    def finish(index):
+        """第 index 个队列的上游全部结束：通知下游的每个工作线程"""
+        downstream = stages[index].workers if index < len(stages) else 1
+        for _ in range(downstream):
+            if not put(index, _STOP):
+                return
+
+    def carried():
+        return timer.detach_page() if timer else 0.0
+
+    def produce():
+        iterator = iter(source)
+        try:
+            for seq, item in enumerate(iterator):
+                if not put(0, (seq, item, carried())):
+                    break
+            else:
+                finish(0)
+        except BaseException as e:
+            fail(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()  # 生成器在本线程中结束，清理其临时目录
+
+    def work(index, stage):
+        while True:
+            entry = get(index)
+            if entry is None:
+                return
+            if entry is _STOP:
+                break
+            seq, item, elapsed = entry
+            if timer:
+                timer.attach_page(elapsed)
+            try:
+                item = stage.func(item)
+            except BaseException as e:
+                fail(e)
+                return
+            if not put(index + 1, (seq, item, carried())):
+                return
+        with remaining_lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last:
+            finish(index + 1)
+
+    threads = [threading.Thread(target=produce, name="pipeline-source", daemon=True)]
+    for index, stage in enumerate(stages):
+        threads += [threading.Thread(target=work, args=(index, stage), name=f"pipeline-{stage.name}", daemon=True)
+                    for _ in range(stage.workers)]
+    for thread in threads:
+        thread.start()
+
+    # 多个工作线程时完成顺序可能与 source 不同，按序号重新排序后再交给 sink
+    pending = {}
+    next_seq = 0
+    completed = False
+    try:
+        while True:
+            entry = get(len(stages))
+            if entry is None:
+                break
+            if entry is _STOP:
+                completed = True
+                break
+            seq, item, elapsed = entry
+            pending[seq] = (item, elapsed)
+            while next_seq in pending:
+                item, elapsed = pending.pop(next_seq)
+                if timer:
+                    timer.attach_page(elapsed)
+                sink(item)
+                next_seq += 1
+    except BaseException as e:
+        fail(e)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        if timer:
+            # 流水线结束后队列不再有项，统计中的当前值不停留在最后一次放入时
+            for name in gauge_names:
+                if name:
+                    timer.gauge(name, 0)
+    if errors:
+        raise errors[0]
+    if not completed:
+        raise Cancelled()
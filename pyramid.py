@@ -0,0 +1,92 @@
+"""图像金字塔与分块渲染（供放大视图使用，不依赖 tkinter）"""
+import math
+
+import cv2
+import numpy as np
+
+from pages import PageCache
+
+TILE_SIZE = 256  # 分块边长（像素）
+TILE_CACHE_BYTES = 128 * 1024 * 1024  # 分块缓存上限（字节）
+FAST = cv2.INTER_NEAREST  # 交互时使用的快速插值
+QUALITY = cv2.INTER_CUBIC  # 空闲时使用的高质量插值
+
+
+class ImagePyramid:
+    """逐级缩小一半的图像金字塔，层级在首次需要时才生成"""
+
+    def __init__(self, image):
+        self.levels = [np.ascontiguousarray(image)]
+        self.height, self.width = image.shape[:2]
+
+    def level(self, index):
+        while len(self.levels) <= index:
+            prev = self.levels[-1]
+            h, w = prev.shape[:2]
+            self.levels.append(cv2.resize(prev, (max(1, w // 2), max(1, h // 2)), interpolation=cv2.INTER_AREA))
+        return self.levels[index]
+
+    def level_for_scale(self, scale):
+        """选择不小于目标尺寸的最小层级，使层内缩放比例落在 (0.5, 1] 或放大区间"""
+        if scale >= 1:
+            return 0
+        index = int(math.floor(-math.log2(scale)))
+        return min(index, int(math.log2(max(self.width, self.height))))
+
+
+class TileRenderer:
+    """按缩放比例渲染并缓存分块，只处理可见区域"""
+
+    def __init__(self, image, cache_bytes=TILE_CACHE_BYTES):
+        self.pyramid = ImagePyramid(image)
+        self.cache = PageCache(cache_bytes)
+
+    @property
+    def size(self):
+        return self.pyramid.width, self.pyramid.height
+
+    def scaled_size(self, scale):
+        width, height = self.size
+        return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+    def visible_tiles(self, scale, x0, y0, x1, y1):
+        """返回与视口矩形 (x0, y0, x1, y1)（缩放后坐标）相交的分块编号"""
+        width, height = self.scaled_size(scale)
+        tx0 = max(0, int(x0) // TILE_SIZE)
+        ty0 = max(0, int(y0) // TILE_SIZE)
+        tx1 = min((width - 1) // TILE_SIZE, int(x1) // TILE_SIZE)
+        ty1 = min((height - 1) // TILE_SIZE, int(y1) // TILE_SIZE)
+        return [(tx, ty) for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)]
+
+    def cached_tile(self, scale, tx, ty, interpolation=FAST):
+        """取缓存中的分块，高质量版本优先"""
+        tile = self.cache.get((scale, QUALITY, tx, ty))
+        if tile is None and interpolation == FAST:
+            tile = self.cache.get((scale, FAST, tx, ty))
+        return tile
+
+    def tile(self, scale, tx, ty, interpolation=FAST):
+        """渲染一个分块：从最接近的金字塔层级仿射采样，只计算该块的像素"""
+        tile = self.cached_tile(scale, tx, ty, interpolation)
+        if tile is not None:
+            return tile
+
+        width, height = self.scaled_size(scale)
+        ox0, oy0 = tx * TILE_SIZE, ty * TILE_SIZE
+        tile_w = min(TILE_SIZE, width - ox0)
+        tile_h = min(TILE_SIZE, height - oy0)
+
+        index = self.pyramid.level_for_scale(scale)
+        source = self.pyramid.level(index)
+        # 层内缩放比例：源像素 -> 输出像素
+        level_scale_x = width / source.shape[1]
+        level_scale_y = height / source.shape[0]
+        # 按像素中心对齐，保证相邻分块无缝拼接
+        matrix = np.float32([
+            [level_scale_x, 0, 0.5 * level_scale_x - 0.5 - ox0],
+            [0, level_scale_y, 0.5 * level_scale_y - 0.5 - oy0],
+        ])
+        tile = cv2.warpAffine(source, matrix, (tile_w, tile_h), flags=interpolation,
+                              borderMode=cv2.BORDER_REPLICATE)
+        self.cache.put((scale, interpolation, tx, ty), tile)
+        return tile
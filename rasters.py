@@ -0,0 +1,193 @@
+"""多页TIFF逐页读取与超大页面的分条带读取（不依赖 tkinter）
+
+cv2.imread 一次把整张图片解码到内存中，多页TIFF也只读第一页。这里多页TIFF逐页解码；
+TIFF 按条带（strip）或图块（tile）存储，每块可以单独解码，所以超大页面可以一条一条地读取：
+未压缩的块直接映射文件（numpy.memmap），压缩的块包装成只含这一块的TIFF交给 Pillow 解码。
+读到的部分立即转为灰度，峰值内存与条带大小而不是页面大小成正比。
+PNG 整张图片是一个带行间预测的压缩流，不能只解码其中一部分，仍按整页读取。
+"""
+import io
+import os
+import struct
+
+import cv2
+import numpy as np
+from PIL import Image, TiffImagePlugin
+
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+STRIP_MIN_PIXELS = 64 * 1000 * 1000  # 像素数不小于此值的TIFF页面按条带处理
+STRIP_BYTES = 16 * 1024 * 1024  # 每个条带的灰度数据大小（决定每条的行数）
+
+# TIFF 标签
+_WIDTH, _LENGTH, _BITS, _COMPRESSION, _PHOTOMETRIC = 256, 257, 258, 259, 262
+_STRIP_OFFSETS, _SAMPLES, _ROWS_PER_STRIP, _STRIP_COUNTS, _PLANAR = 273, 277, 278, 279, 284
+_TILE_WIDTH, _TILE_LENGTH, _TILE_OFFSETS, _TILE_COUNTS = 322, 323, 324, 325
+_LAYOUT_TAGS = (_WIDTH, _LENGTH, _STRIP_OFFSETS, _ROWS_PER_STRIP, _STRIP_COUNTS,
+                _TILE_WIDTH, _TILE_LENGTH, _TILE_OFFSETS, _TILE_COUNTS)  # 单独包装一块时重新设置的标签
+_UNCOMPRESSED = 1
+_DECODABLE_COMPRESSIONS = (1, 2, 3, 4, 5, 7, 8, 32773, 32946)  # 无压缩、CCITT、LZW、JPEG、Deflate、PackBits
+
+
+def is_tiff(file_path):
+    return os.path.splitext(file_path)[1].lower() in TIFF_EXTENSIONS
+
+
+def _open_tiff(file_path):
+    """直接用 Pillow 的TIFF插件打开（Image.open 会把超大页面当作解压炸弹拒绝，这里只读取标签或逐块解码）"""
+    return TiffImagePlugin.TiffImageFile(file_path)
+
+
+def tiff_page_count(file_path):
+    """TIFF的页数（只读取各页的目录，不解码像素）"""
+    with _open_tiff(file_path) as image:
+        return image.n_frames
+
+
+def strip_rows(width, minimum=1):
+    """宽度为 width 的页面每个条带的行数"""
+    return max(minimum, STRIP_BYTES // max(1, width))
+
+
+def pil_to_gray(image):
+    """Pillow 图像转为可写的灰度数组（彩色按 cv2 的系数转换，与 cv2.imread 读取灰度图一致）"""
+    if image.mode == "L":
+        return np.array(image)
+    if image.mode == "1":
+        return np.array(image.convert("L"))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY)
+
+
+class TiffPage:
+    """TIFF中的一页：只保存标签，像素在 iter_strips 时逐条读取
+
+    image 为已定位到该页的 Pillow 图像；之后不再使用它，各条带直接从文件中读取。
+    """
+
+    def __init__(self, file_path, image):
+        self.file_path = file_path
+        self.index = image.tell()
+        self.width, self.height = image.size
+        self.tags = dict(image.tag_v2)  # Pillow 定位到其他页时会重新加载 tag_v2，这里保存一份
+        self.tag_types = dict(image.tag_v2.tagtype)
+
+    @property
+    def pixels(self):
+        return self.width * self.height
+
+    def _sequence(self, tag):
+        value = self.tags.get(tag, ())
+        return value if isinstance(value, tuple) else (value,)
+
+    @property
+    def data_bytes(self):
+        """该页像素数据在文件中的字节数"""
+        return sum(self._sequence(_TILE_COUNTS if self.tiled else _STRIP_COUNTS))
+
+    @property
+    def tiled(self):
+        return _TILE_OFFSETS in self.tags
+
+    @property
+    def strip_readable(self):
+        """能否按块单独解码（每像素各通道交错存储，每通道1或8位，压缩方式 Pillow 支持）"""
+        bits = set(self._sequence(_BITS) or (1,))
+        offsets = self._sequence(_TILE_OFFSETS if self.tiled else _STRIP_OFFSETS)
+        return (self.tags.get(_PLANAR, 1) == 1 and len(bits) == 1 and bits <= {1, 8} and bool(offsets)
+                and self.tags.get(_COMPRESSION, _UNCOMPRESSED) in _DECODABLE_COMPRESSIONS)
+
+    def _blocks(self):
+        """按存储顺序返回各块 (x, y, 宽, 高, 文件偏移, 字节数)"""
+        if self.tiled:
+            tile_w, tile_h = self.tags[_TILE_WIDTH], self.tags[_TILE_LENGTH]
+            across = -(-self.width // tile_w)
+            return [((n % across) * tile_w, (n // across) * tile_h, tile_w, tile_h, offset, count)
+                    for n, (offset, count) in enumerate(zip(self._sequence(_TILE_OFFSETS),
+                                                            self._sequence(_TILE_COUNTS)))]
+        rows = min(self.tags.get(_ROWS_PER_STRIP, self.height), self.height)
+        return [(0, n * rows, self.width, min(rows, self.height - n * rows), offset, count)
+                for n, (offset, count) in enumerate(zip(self._sequence(_STRIP_OFFSETS),
+                                                        self._sequence(_STRIP_COUNTS)))]
+
+    def _read_block(self, f, width, height, offset, count):
+        """读取一块并转为灰度数组"""
+        samples = self.tags.get(_SAMPLES, 1)
+        photometric = self.tags.get(_PHOTOMETRIC, 1)
+        if (self.tags.get(_COMPRESSION, _UNCOMPRESSED) == _UNCOMPRESSED and self._sequence(_BITS)[0] == 8
+                and (photometric in (0, 1) or (photometric == 2 and samples >= 3))):
+            data = np.memmap(self.file_path, np.uint8, "r", offset=offset, shape=(height, width, samples))
+            if photometric == 1:
+                return np.array(data[:, :, 0])
+            if photometric == 0:
+                return 255 - data[:, :, 0]
+            return cv2.cvtColor(np.ascontiguousarray(data[:, :, :3]), cv2.COLOR_RGB2GRAY)
+        f.seek(offset)
+        data = f.read(count)
+        ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=b"II")
+        for tag, value in self.tags.items():
+            if tag not in _LAYOUT_TAGS:
+                ifd[tag] = value
+                ifd.tagtype[tag] = self.tag_types[tag]
+        ifd[_WIDTH], ifd[_LENGTH], ifd[_ROWS_PER_STRIP] = width, height, height
+        ifd[_STRIP_OFFSETS], ifd[_STRIP_COUNTS] = 0, len(data)
+        ifd.tagtype[_STRIP_OFFSETS] = ifd.tagtype[_STRIP_COUNTS] = 4  # LONG
+        # tobytes 把唯一一个条带的偏移设为目录之后的位置，块数据紧接在目录后面
+        header = b"II*\x00" + struct.pack("<I", 8) + ifd.tobytes(8)
+        with Image.open(io.BytesIO(header + data)) as image:
+            return pil_to_gray(image)
+
+    def _iter_bands(self, f):
+        """按行产出整行宽的 (上边界, 灰度数组)：条带存储时每条一个，图块存储时每行图块一个"""
+        blocks = self._blocks()
+        if not self.tiled:
+            for _, y, width, height, offset, count in blocks:
+                yield y, self._read_block(f, width, height, offset, count)
+            return
+        tile_h = self.tags[_TILE_LENGTH]
+        for y in range(0, self.height, tile_h):
+            band = np.empty((min(tile_h, self.height - y), self.width), np.uint8)
+            for x, _, tile_w, _, offset, count in (b for b in blocks if b[1] == y):
+                tile = self._read_block(f, tile_w, tile_h, offset, count)
+                band[:, x:x + tile_w] = tile[:band.shape[0], :self.width - x]
+            yield y, band
+
+    def iter_strips(self, rows):
+        """按行依次产出 (上边界, 灰度条带)，除最后一条外每条至少 rows 行"""
+        with open(self.file_path, "rb") as f:
+            parts = []
+            top = count = 0
+            for _, band in self._iter_bands(f):
+                parts.append(band)
+                count += band.shape[0]
+                if count >= rows:
+                    yield top, parts[0] if len(parts) == 1 else np.concatenate(parts)
+                    top += count
+                    parts, count = [], 0
+            if parts:
+                yield top, parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+def open_tiff_page(file_path, index=0):
+    """读取TIFF第 index 页（从0开始）的标签"""
+    with _open_tiff(file_path) as image:
+        image.seek(index)
+        return TiffPage(file_path, image)
+
+
+def iter_tiff_pages(file_path, first_page=1, last_page=None, strip_min_pixels=None):
+    """按页码顺序产出 first_page-last_page 页的 (页码, TiffPage, 灰度图)，页码从1开始
+
+    strip_min_pixels 不为 None 时，像素数不小于它且可以按块读取的页面不解码（灰度图为 None），
+    由调用方按条带读取。各页在同一个打开的文件中依次定位，不重复解析前面各页的目录。
+    """
+    with _open_tiff(file_path) as image:
+        if last_page is None:
+            last_page = image.n_frames
+        for i in range(first_page, last_page + 1):
+            image.seek(i - 1)
+            page = TiffPage(file_path, image)
+            if strip_min_pixels is not None and page.pixels >= strip_min_pixels and page.strip_readable:
+                yield i, page, None
+            else:
+                yield i, page, pil_to_gray(image)
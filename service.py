@@ -0,0 +1,419 @@
+"""常驻处理服务：监视输入目录，新文件写入完成后立即交给预热的进程池（不依赖 tkinter）
+
+启动时创建并预热进程池（engine.WorkerPool），之后每个文件只有处理本身的耗时，没有启动进程、导入 OpenCV
+和扫描整个输入目录的开销。文件由 watch.open_watcher 发现，watch.Debouncer 确认写入完成后拆成任务单元
+（PDF按页块拆分，同 engine.run_batch）提交给进程池，结果和页面统计记入输出目录的任务清单和统计索引。
+已完成且未变化的文件按任务清单跳过，所以服务重启或同一文件再次出现时不会重复处理；文件被重新写入后重新处理。
+
+本机的 HTTP 接口（默认 127.0.0.1:8765）或 Unix 套接字上:
+    GET  /status        队列深度、吞吐量、到达到完成的延迟和各阶段计时
+    POST /jobs          提交文件或目录（JSON {"path": "..."}），不必等待写入稳定
+    GET  /jobs          全部提交过的任务
+    GET  /jobs/<id>     单个任务的进度
+例如:
+    curl localhost:8765/status
+    curl -d '{"path": "/data/scans/batch7"}' localhost:8765/jobs
+    curl --unix-socket /run/threshold.sock http://localhost/status
+"""
+import collections
+import http.server
+import itertools
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import discovery
+import encoders
+import engine
+import pagestats
+import perf
+import watch
+from defaults import SERVICE_HOST as DEFAULT_HOST, SERVICE_PORT as DEFAULT_PORT
+from manifest import Manifest
+
+TICK_SECONDS = 0.1  # 调度循环等待事件和结果的最长时间
+THROUGHPUT_WINDOW = 60.0  # 吞吐量按最近多少秒计算
+LATENCY_SAMPLES = 1000  # 延迟分位数按最近多少个文件计算
+
+
+class ServiceJob:
+    """通过接口提交的一批文件"""
+
+    def __init__(self, job_id, path, files):
+        self.id = job_id
+        self.path = path
+        self.files = len(files)
+        self.done = 0  # 已完成（含跳过）的文件数
+        self.failed = 0
+        self.pages = 0
+        self.submitted = time.time()
+        self.finished = None if files else self.submitted  # 目录中没有可处理的文件时提交即完成
+
+    @property
+    def state(self):
+        if self.done + self.failed >= self.files:
+            return "done"
+        return "running" if self.done or self.failed or self.pages else "queued"
+
+    def status(self):
+        return {"id": self.id, "path": self.path, "state": self.state, "files": self.files, "done": self.done,
+                "failed": self.failed, "pages": self.pages, "submitted": self.submitted, "finished": self.finished}
+
+
+class _FileTask:
+    """一个正在处理的文件：未完成的单元数，到达时刻用于计算延迟，jobs 为包含这个文件的接口任务"""
+
+    def __init__(self, path, arrived, job=None):
+        self.path = path
+        self.arrived = arrived
+        self.jobs = [job] if job else []
+        self.units_left = 0
+        self.pages = 0
+        self.error = None
+
+
+class WatchService:
+    """监视 input_dir，新文件写入完成后用常驻进程池处理，结果保存到 output_dir
+
+    options（engine.BatchOptions）的 input_root 为 input_dir，子目录中文件的结果保存到输出目录的同名子目录；
+    options.resume 不起作用，总是跳过任务清单中已完成且未过期的页。log(message) 报告每个文件的结果和错误。
+    """
+
+    def __init__(self, input_dir, output_dir, options, workers=engine.DEFAULT_WORKERS, include=None, exclude=None,
+                 recursive=True, settle=watch.SETTLE_SECONDS, polling=False, poll_interval=watch.POLL_INTERVAL,
+                 log=None):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.options = options
+        self.workers = max(1, workers)
+        self.include = include
+        self.exclude = exclude
+        self.recursive = recursive
+        self.polling = polling
+        self.poll_interval = poll_interval
+        self.log = log or (lambda message: None)
+        self.debouncer = watch.Debouncer(settle)
+        self.control = engine.BatchControl()
+        self.watcher = None
+        self.pool = None
+        self.jobs = {}  # 任务编号 -> ServiceJob
+        self.started = None
+        self.files_done = 0
+        self.files_failed = 0
+        self.pages_done = 0
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest = Manifest(output_dir)
+        self.records = engine.BatchRecords(
+            self.manifest, pagestats.StatsIndex(output_dir) if options.collect_stats else None)
+        self._lock = threading.Lock()  # 保护接口线程读取的计数和队列
+        self._submitted = queue.Queue()  # 接口提交的 (任务, 文件列表)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._job_ids = itertools.count(1)
+        self._units = collections.deque()  # 等待提交的 (_FileTask, 任务单元)
+        self._futures = {}  # Future -> (_FileTask, 任务单元)
+        self._active = {}  # 正在处理的文件 -> _FileTask
+        self._finished_pages = collections.deque()  # 最近完成的 (时刻, 页数)
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)  # 最近完成的文件从到达到完成的秒数
+        self._output_root = os.path.abspath(output_dir)
+        self._evict = False
+
+    def start(self):
+        """预热进程池、开始监视并启动调度线程，返回已就绪的工作进程数"""
+        self.pool = engine.WorkerPool(self.workers, self.control)
+        ready = len(self.pool.warm_up())
+        self.watcher = watch.open_watcher(self.input_dir, self.include, self.exclude, self.recursive,
+                                          self.polling, self.poll_interval)
+        self.started = time.monotonic()
+        if self.options.timer:
+            self.options.timer.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="watch-service", daemon=True)
+        self._thread.start()
+        return ready
+
+    def wait(self, timeout=None):
+        """等待服务停止（stop() 或调度线程出错）"""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def stop(self):
+        """停止监视并关闭进程池：正在处理的单元在下一页之前停下，已完成的页面照常记入任务清单"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+
+    def submit(self, path):
+        """提交文件或目录（目录按服务的筛选规则扫描），返回 ServiceJob；路径不存在或不是支持的文件时抛出 ValueError"""
+        if not path or not os.path.exists(path):
+            raise ValueError(f"路径不存在: {path}")
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            files = list(discovery.iter_input_files(path, self.include, self.exclude, self.recursive))
+        elif engine.is_supported(path):
+            files = [path]
+        else:
+            raise ValueError(f"不支持的文件: {path}")
+        with self._lock:
+            job = ServiceJob(next(self._job_ids), path, files)
+            self.jobs[job.id] = job
+        self._submitted.put((job, files))
+        self._wake.set()
+        return job
+
+    def job_status(self):
+        """全部提交过的任务（GET /jobs）"""
+        with self._lock:
+            return [job.status() for job in self.jobs.values()]
+
+    def status(self):
+        """服务状态（GET /status）"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim_finished(now)
+            window = min(THROUGHPUT_WINDOW, now - self.started) if self.started else 0
+            recent = sum(pages for _, pages in self._finished_pages)
+            latencies = list(self._latencies)
+            status = {
+                "watching": os.path.abspath(self.input_dir),
+                "output": self._output_root,
+                "mode": self.watcher.mode if self.watcher else None,
+                "workers": self.workers,
+                "uptime": now - self.started if self.started else 0,
+                "queue": {
+                    "settling": len(self.debouncer),  # 等待写入完成的文件
+                    "files": len(self._active),  # 已拆分、尚未完成的文件
+                    "units_waiting": len(self._units),
+                    "units_running": len(self._futures),
+                    "jobs_submitted": self._submitted.qsize(),
+                },
+                "processed": {"files": self.files_done, "failed": self.files_failed, "pages": self.pages_done},
+                "throughput": {
+                    "window_seconds": window,
+                    "pages": recent,
+                    "pages_per_sec": recent / window if window else None,
+                },
+                "latency": {
+                    "files": len(latencies),
+                    "p50_seconds": perf.percentile(latencies, 50),
+                    "p95_seconds": perf.percentile(latencies, 95),
+                },
+            }
+        if self.options.timer:
+            summary = self.options.timer.summary()
+            status["stages"] = {"seconds": summary["stages"], "max_ms": summary["stage_max_ms"],
+                                "counters": summary["counters"]}
+        return status
+
+    def _trim_finished(self, now):
+        while self._finished_pages and now - self._finished_pages[0][0] > THROUGHPUT_WINDOW:
+            self._finished_pages.popleft()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                for path in self.watcher.poll(0):
+                    if not os.path.abspath(path).startswith(self._output_root + os.sep):
+                        self.debouncer.touch(path, now)
+                self._take_submissions(now)
+                for path, arrived in self.debouncer.ready(now, busy=self._active):
+                    self._start_file(path, arrived)
+                self._dispatch()
+                self._collect()
+        except Exception as e:
+            self.log(f"服务出错，已停止: {e}")
+        finally:
+            self.control.cancel()
+            self.pool.shutdown(cancel=True)
+            for future, (task, unit) in list(self._futures.items()):
+                if future.done() and not future.cancelled():
+                    self._finish_unit(future, task, unit)
+            self.watcher.close()
+            if self.options.cache:
+                self.options.cache.evict()
+
+    def _take_submissions(self, now):
+        while True:
+            try:
+                job, files = self._submitted.get_nowait()
+            except queue.Empty:
+                return
+            for path in files:
+                if path in self._active:
+                    self._active[path].jobs.append(job)  # 同一文件正在处理，随它一起完成
+                else:
+                    self._start_file(path, now, job)
+
+    def _start_file(self, path, arrived, job=None):
+        """读取页数、按任务清单过滤已完成的页并拆分任务单元"""
+        task = _FileTask(path, arrived, job)
+        self.manifest.forget(path)  # 文件可能已被重新写入
+        try:
+            page_count = engine.file_page_count(path)
+            pages = engine.file_pending_pages(self.manifest, path, page_count, self.output_dir, self.options)
+        except Exception as e:
+            task.error = e
+            self._finish_file(task)
+            return
+        units = engine.file_units(path, page_count, pages,
+                                  whole_file=encoders.is_container(self.options.output_format))
+        if not units:
+            self._finish_file(task)
+            return
+        task.units_left = len(units)
+        with self._lock:
+            self._active[path] = task
+            self._units.extend((task, unit) for unit in units)
+
+    def _dispatch(self):
+        """每个工作进程最多有 UNITS_PER_WORKER 个已提交的单元，其余单元留在队列中"""
+        with self._lock:
+            while self._units and len(self._futures) < self.workers * engine.UNITS_PER_WORKER:
+                task, unit = self._units.popleft()
+                self._futures[self.pool.submit(unit, self.output_dir, self.options)] = (task, unit)
+        if self.options.timer:
+            self.options.timer.gauge("pending_units", len(self._futures) + len(self._units))
+
+    def _collect(self):
+        if not self._futures:
+            self._wake.wait(TICK_SECONDS)
+            self._wake.clear()
+            if not self._units and self._evict and self.options.cache:
+                self._evict = False
+                self.options.cache.evict()  # 空闲时按容量上限淘汰旧缓存
+            return
+        done, _ = wait(list(self._futures), timeout=TICK_SECONDS, return_when=FIRST_COMPLETED)
+        for future in done:
+            with self._lock:
+                task, unit = self._futures.pop(future)
+            self._finish_unit(future, task, unit)
+
+    def _finish_unit(self, future, task, unit):
+        try:
+            count, cache_stats, unit_records, timer_stats = future.result()
+        except Exception as e:
+            engine.record_failure(self.records, unit, self.output_dir, self.options, e)
+            task.error = task.error or e
+            count, cache_stats, unit_records, timer_stats = 0, None, [], None
+        if cache_stats:
+            self.options.cache.merge_stats(cache_stats)
+            self._evict = True
+        if timer_stats:
+            self.options.timer.merge(timer_stats)
+        for record in unit_records:
+            self.records.append(record)
+        task.pages += count or 0
+        task.units_left -= 1
+        with self._lock:
+            self._finished_pages.append((time.monotonic(), count or 0))
+            self._trim_finished(time.monotonic())
+        if task.units_left == 0:
+            with self._lock:
+                self._active.pop(task.path, None)
+            self._finish_file(task)
+
+    def _finish_file(self, task):
+        name = task.path if task.jobs else os.path.relpath(task.path, self.input_dir)
+        latency = time.monotonic() - task.arrived
+        with self._lock:
+            if task.error is not None:
+                self.files_failed += 1
+            elif task.pages:
+                self.files_done += 1
+                self.pages_done += task.pages
+                self._latencies.append(latency)
+            for job in task.jobs:
+                if task.error is not None:
+                    job.failed += 1
+                else:
+                    job.done += 1
+                job.pages += task.pages
+                if job.state == "done":
+                    job.finished = time.time()
+        if task.error is not None:
+            self.log(f"处理文件 {name} 时出错: {task.error}")
+        elif task.pages:
+            self.log(f"已完成: {name}（{task.pages} 页，到达后 {latency:.1f} 秒）")
+        else:
+            self.log(f"跳过已完成的文件: {name}")
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """接口请求：JSON 输入输出，服务对象为 server.service"""
+
+    def _reply(self, code, data):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        service = self.server.service
+        path = self.path.rstrip("/")
+        if path == "/status":
+            self._reply(200, service.status())
+        elif path == "/jobs":
+            self._reply(200, service.job_status())
+        elif path.startswith("/jobs/"):
+            job_id = path[len("/jobs/"):]
+            job = service.jobs.get(int(job_id)) if job_id.isdigit() else None
+            if job is None:
+                self._reply(404, {"error": "没有这个任务"})
+            else:
+                self._reply(200, job.status())
+        else:
+            self._reply(404, {"error": "未知的地址"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._reply(404, {"error": "未知的地址"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            job = self.server.service.submit(body.get("path") if isinstance(body, dict) else None)
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+            return
+        self._reply(202, job.status())
+
+    def log_message(self, format, *args):
+        pass  # 不逐条输出请求日志（Unix 套接字上也没有客户端地址）
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_http(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    """在后台线程中启动接口，返回服务器对象（shutdown() 停止）；socket_path 不为 None 时改用 Unix 套接字"""
+    if socket_path:
+        if not hasattr(socketserver, "UnixStreamServer"):
+            raise OSError("此系统不支持 Unix 套接字")
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # 上次运行留下的套接字文件
+        server = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = http.server.ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+    server.service = service
+    threading.Thread(target=server.serve_forever, name="watch-service-http", daemon=True).start()
+    return server
+
+
+def close_http(server):
+    """停止接口，删除 Unix 套接字文件"""
+    server.shutdown()
+    server.server_close()
+    if isinstance(server, _UnixHTTPServer):
+        try:
+            os.remove(server.server_address)
+        except OSError:
+            pass
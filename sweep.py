@@ -0,0 +1,302 @@
+"""多阈值扫描：一次解码，多个阈值（不依赖 tkinter）
+
+每页只转换/解码一次并统计一次256级灰度直方图，然后每个阈值只做一次查找表运算，
+写出各阈值的结果和一张缩略对比图。N 个阈值的耗时约为一次解码加 N 次查找表运算（和各自的编码写出），
+而不是 N 遍完整的处理。直方图给出每个阈值下黑色像素的比例（标注在对比图上），
+相邻两个阈值之间没有任何灰度的像素时两者结果相同，直接沿用前一个。
+
+结果文件名是正常处理的文件名加 _t阈值，对比图加 _sheet（总是PNG），例如:
+    output/scan_t120.png   output/scan_t140.png   output/scan_sheet.png
+    output/book/page_3_t120.png   output/book/page_3_sheet.png
+多页输出格式每个阈值一个文件（output/book_t120.pdf），对比图仍按页保存。
+"""
+import contextlib
+import os
+
+import cv2
+import numpy as np
+
+import encoders
+import engine
+import pipeline
+import rasters
+
+DEFAULT_STEP = 10  # 区间写法省略步长时的默认步长
+SHEET_TILE_SIZE = 360  # 对比图中每个缩略图的长边（像素）
+SHEET_COLUMNS = 4  # 对比图每行的缩略图数
+SHEET_GAP = 8  # 缩略图之间的间隔（像素）
+LABEL_HEIGHT = 26  # 缩略图下方标注行的高度（像素）
+
+
+def _stage(timer, name):
+    return timer.stage(name) if timer else contextlib.nullcontext()
+
+
+def parse_thresholds(spec):
+    """解析阈值列表，返回升序去重的阈值
+
+    逗号分隔，每项为单个阈值或 起-止[:步长] 区间（从起点每隔步长取一个，不超过终点，步长默认 DEFAULT_STEP），
+    如 "120,140,160"、"100-200:20"、"90,100-160"。格式错误或超出 0-255 时抛出 ValueError。
+    """
+    values = set()
+    for item in spec.replace(" ", "").split(","):
+        if not item:
+            continue
+        span, colon, step = item.partition(":")
+        first, dash, last = span.partition("-")
+        try:
+            first = int(first)
+            last = int(last) if dash else first
+            step = int(step) if colon else DEFAULT_STEP
+        except ValueError:
+            raise ValueError(f"无效的阈值: {item}")
+        if step < 1 or not 0 <= first <= last <= 255:
+            raise ValueError(f"无效的阈值: {item}（阈值在 0-255 之间，区间的起点不大于终点）")
+        values.update(range(first, last + 1, step))
+    if not values:
+        raise ValueError("没有指定阈值")
+    return sorted(values)
+
+
+def variant_path(output_path, value):
+    """阈值 value 的结果路径：在正常处理的输出文件名后加 _t阈值"""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_t{value}{ext}"
+
+
+def sheet_path(output_path):
+    """对比图路径：在正常处理的输出文件名后加 _sheet，保存为PNG"""
+    return os.path.splitext(output_path)[0] + "_sheet.png"
+
+
+def page_histogram(gray_image):
+    return np.bincount(gray_image.ravel(), minlength=256)
+
+
+def ink_ratio(histogram, value):
+    """阈值 value 下变为黑色（灰度不大于阈值）的像素比例"""
+    return float(histogram[:value + 1].sum()) / max(1, int(histogram.sum()))
+
+
+def iter_variants(gray_image, values, histogram=None):
+    """按 values 的顺序产出 (阈值, 二值图)，每个阈值一次查找表运算，结果与 engine.apply_threshold 相同
+
+    values 为升序时，与前一个阈值之间没有像素的阈值直接沿用前一个结果（同一个数组，不要原地修改）。
+    """
+    if histogram is None:
+        histogram = page_histogram(gray_image)
+    previous = None
+    for value in values:
+        if previous is not None and previous[0] <= value and not histogram[previous[0] + 1:value + 1].any():
+            yield value, previous[1]
+            continue
+        binary = engine.apply_threshold_lut(gray_image, value)
+        previous = (value, binary)
+        yield value, binary
+
+
+def contact_sheet(gray_image, values, histogram=None, tile_size=SHEET_TILE_SIZE, columns=SHEET_COLUMNS):
+    """缩略对比图：整页缩小一次，每个阈值对缩略图做一次查找表运算后排成网格，
+    每格下方标注阈值和黑色像素比例（按整页直方图计算）"""
+    if histogram is None:
+        histogram = page_histogram(gray_image)
+    small = engine.fit_to_size(gray_image, tile_size)
+    height, width = small.shape
+    columns = max(1, min(columns, len(values)))
+    rows = -(-len(values) // columns)
+    cell_w, cell_h = width + SHEET_GAP, height + LABEL_HEIGHT + SHEET_GAP
+    sheet = np.full((rows * cell_h + SHEET_GAP, columns * cell_w + SHEET_GAP), 160, np.uint8)
+    for n, (value, tile) in enumerate(iter_variants(small, values)):
+        x = SHEET_GAP + (n % columns) * cell_w
+        y = SHEET_GAP + (n // columns) * cell_h
+        sheet[y:y + height, x:x + width] = tile
+        sheet[y + height:y + height + LABEL_HEIGHT, x:x + width] = 255
+        label = f"t={value}  ink {ink_ratio(histogram, value):.1%}"
+        cv2.putText(sheet, label, (x + 4, y + height + LABEL_HEIGHT - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 0, 1,
+                    cv2.LINE_AA)
+    return sheet
+
+
+def sweep_image(gray_image, output_path, values, progress=None, cancel=None):
+    """对内存中的一页做扫描，按 output_path 的扩展名写出各阈值的结果和对比图，返回对比图
+
+    progress(current, status) 在每个文件写出后调用；cancel（threading.Event）被设置时抛出 pipeline.Cancelled。
+    取消或出错时删除本次已写出的文件。
+    """
+    histogram = page_histogram(gray_image)
+    written = []
+    try:
+        for n, (value, binary) in enumerate(iter_variants(gray_image, values, histogram), 1):
+            if cancel is not None and cancel.is_set():
+                raise pipeline.Cancelled()
+            written.append(variant_path(output_path, value))
+            engine.write_image(written[-1], binary)
+            if progress:
+                progress(n, f"已保存阈值 {value}")
+        sheet = contact_sheet(gray_image, values, histogram)
+        engine.write_bytes(sheet_path(output_path), engine.encode_image(".png", sheet))
+    except BaseException:
+        for path in written:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        raise
+    if progress:
+        progress(len(values) + 1, "已保存对比图")
+    return sheet
+
+
+def _iter_gray_pages(file_path, page_count, options, sources=None):
+    """依次产出每页的 (页码, 灰度图)：PDF转换一次（各页来源记录到 sources），多页TIFF逐页解码，其他图片整张读取"""
+    timer = options.timer
+    if engine.is_pdf(file_path):
+        yield from engine.iter_pdf_gray_pages(file_path, page_count, thread_count=options.render_threads,
+                                              dpi=options.dpi, timer=timer,
+                                              embedded_images=options.embedded_images, sources=sources,
+                                              native_dpi=options.native_dpi)
+        return
+    if page_count > 1:
+        pages = rasters.iter_tiff_pages(file_path)
+        while True:
+            with _stage(timer, "gray"):
+                item = next(pages, None)
+            if item is None:
+                return
+            yield item[0], item[2]
+        return
+    with _stage(timer, "gray"):
+        gray_img = engine.read_image(file_path, grayscale=True)
+    yield 1, gray_img
+
+
+def sweep_file(file_path, page_count, output_dir, options, values, progress=None, control=None):
+    """对文件的每一页做扫描，结果保存到 output_dir（命名见模块说明），返回处理的页数
+
+    options（engine.BatchOptions）提供输出格式、DPI、转换线程数和各阶段线程数，阈值方法和阈值不使用。
+    各页的阈值结果经过 编码 -> 写入 的流水线（见 pipeline.run），线程数见 options.stage_workers；
+    多页输出格式的追加在调用线程中按页码顺序进行。progress(status) 在每页完成后调用；
+    control（engine.BatchControl）暂停时在页与页之间等待，取消时抛出 pipeline.Cancelled。
+    """
+    timer = options.timer
+    fmt = options.output_format
+    dpi = options.dpi if engine.is_pdf(file_path) else None
+    sources = {}  # PDF页码 -> (来源, 扫描分辨率或回退原因)，直接解码的页按扫描分辨率输出时用于各页的分辨率
+    filename = os.path.basename(file_path)
+    if engine.is_pdf(file_path) or page_count > 1:
+        os.makedirs(engine.pdf_output_dir(output_dir, file_path), exist_ok=True)
+
+    def page_path(i, output_format=fmt):
+        return engine.output_path_for(output_dir, file_path, i, output_format, page_count)
+
+    writers = {}
+    if encoders.is_container(fmt):
+        for value in values:
+            writers[value] = encoders.open_container(fmt, variant_path(page_path(1), value), dpi)
+
+    # 各阶段处理 [页码, 阈值, 数据]，阈值为 None 的是该页最后一项：对比图
+    def source():
+        for i, gray_img in _iter_gray_pages(file_path, page_count, options, sources):
+            if control:
+                control.checkpoint()
+            with _stage(timer, "threshold"):
+                histogram = page_histogram(gray_img)
+            variants = iter_variants(gray_img, values, histogram)
+            while True:
+                with _stage(timer, "threshold"):
+                    item = next(variants, None)
+                if item is None:
+                    break
+                yield [i, item[0], item[1]]
+            with _stage(timer, "threshold"):
+                sheet = contact_sheet(gray_img, values, histogram)
+            yield [i, None, sheet]
+
+    def encode_stage(item):
+        i, value, image = item
+        if value is None:
+            with _stage(timer, "encode"):
+                item[2] = engine.encode_image(".png", image)
+        elif not writers:
+            item[2] = engine.encode_output(page_path(i), image, options, engine.page_dpi(dpi, options, sources, i))
+        return item
+
+    def write_stage(item):
+        i, value, data = item
+        if value is None or not writers:
+            output_path = sheet_path(page_path(i, encoders.DEFAULT_FORMAT)) if value is None \
+                else variant_path(page_path(i), value)
+            with _stage(timer, "write"):
+                engine.write_bytes(output_path, data)
+            if timer:
+                timer.count("bytes_out", len(data))
+        return item
+
+    pages = 0
+
+    def sink(item):
+        nonlocal pages
+        i, value, data = item
+        if value is not None:
+            if writers:
+                with _stage(timer, "encode"):
+                    writers[value].add_page(data, engine.page_dpi(dpi, options, sources, i))
+            return
+        pages += 1
+        if timer:
+            timer.end_page()
+        if progress:
+            progress(f"阈值扫描: {filename} (第{i}/{page_count}页，{len(values)}个阈值)")
+
+    workers = options.stage_workers
+    stages = [pipeline.Stage("encode", encode_stage, workers.get("encode", 1)),
+              pipeline.Stage("write", write_stage, workers.get("write", 1))]
+    try:
+        pipeline.run(source(), stages, sink, options.queue_size, timer,
+                     cancel=control.cancelled if control else None)
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    for writer in writers.values():
+        with _stage(timer, "write"):
+            writer.close()
+        if timer:
+            timer.count("bytes_out", os.path.getsize(writer.file_path))
+    return pages
+
+
+def run_sweep(file_tasks, output_dir, options, values, progress=None, on_error=None, control=None, on_total=None):
+    """对 file_tasks（(文件, 页数) 的列表或迭代器，页数可以为 None）依次做阈值扫描，返回处理的页数
+
+    progress(current, status)、on_error(message)、on_total(total, complete) 和 control 同 engine.run_batch；
+    文件逐个处理（不分多进程），不使用缓存和任务清单。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    processed_count = 0
+    total = 0
+
+    def report(status):
+        nonlocal processed_count
+        processed_count += 1
+        if progress:
+            progress(processed_count, status)
+
+    for file_path, page_count in file_tasks:
+        try:
+            if page_count is None:
+                page_count = engine.file_page_count(file_path)
+            total += page_count
+            if on_total:
+                on_total(total, False)
+            target_dir = engine.file_output_dir(output_dir, file_path, options)
+            os.makedirs(target_dir, exist_ok=True)
+            sweep_file(file_path, page_count, target_dir, options, values, report, control)
+        except pipeline.Cancelled:
+            raise
+        except Exception as e:
+            if on_error:
+                on_error(f"处理文件 {os.path.basename(file_path)} 时出错: {str(e)}")
+    if on_total:
+        on_total(total, True)
+    return processed_count
@@ -0,0 +1,238 @@
+"""阈值处理方法（不依赖 tkinter）
+
+结果均为“保留白色”的二值图：灰度高于阈值的像素为255，其余为0。
+- global             固定阈值（滑块的值）
+- otsu / triangle    每页由直方图自动确定一个全局阈值
+- adaptive-mean      局部均值阈值（cv2.adaptiveThreshold），k 为常数 C
+- adaptive-gaussian  局部高斯加权均值阈值，k 为常数 C
+- sauvola / niblack  由积分图计算窗口内的均值和标准差，k 为系数
+局部方法按行分块处理（每块带半个窗口的重叠），大页面可以多线程并行，结果与整页处理相同。
+apply_strips 对不在内存中的超大页面逐条带处理，自动方法先统计整页的直方图。
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from defaults import DEFAULT_BLOCK_SIZE, DEFAULT_METHOD, THRESHOLD_METHODS as METHODS
+
+AUTO_METHODS = ("otsu", "triangle")  # 每页自动计算一个全局阈值
+LOCAL_METHODS = ("adaptive-mean", "adaptive-gaussian", "sauvola", "niblack")  # 每个像素有自己的阈值
+DEFAULT_K = {"adaptive-mean": 10, "adaptive-gaussian": 10, "sauvola": 0.2, "niblack": -0.2}
+SAUVOLA_R = 128.0  # Sauvola 的标准差动态范围
+TILE_ROWS = 256  # 局部方法每块的行数
+PARALLEL_MIN_PIXELS = 2 * 1024 * 1024  # 小于此像素数的页面不分线程处理
+
+_AUTO_FLAGS = {"otsu": cv2.THRESH_OTSU, "triangle": cv2.THRESH_TRIANGLE}
+
+
+def is_local(method):
+    """是否为逐像素阈值的局部方法"""
+    return method in LOCAL_METHODS
+
+
+def default_k(method):
+    return DEFAULT_K.get(method)
+
+
+def valid_block_size(block_size):
+    """窗口边长取不小于3的奇数"""
+    block_size = max(3, int(block_size))
+    return block_size if block_size % 2 else block_size + 1
+
+
+def method_key(method, threshold_value, block_size=DEFAULT_BLOCK_SIZE, k=None):
+    """用于缓存键和任务清单的参数描述；固定阈值时就是阈值本身，与旧的缓存键相同"""
+    if method == DEFAULT_METHOD:
+        return threshold_value
+    if method in AUTO_METHODS:
+        return method
+    if k is None:
+        k = default_k(method)
+    return f"{method}:{valid_block_size(block_size)}:{k}"
+
+
+def auto_threshold(gray_image, method):
+    """Otsu/三角法自动计算的阈值"""
+    value, _ = cv2.threshold(gray_image, 0, 255, cv2.THRESH_BINARY | _AUTO_FLAGS[method])
+    return int(value)
+
+
+def histogram_threshold(histogram, method):
+    """由256级灰度直方图计算 Otsu/三角法阈值，与 cv2.threshold 对整页计算的结果相同"""
+    hist = [int(count) for count in histogram]
+    if method == "otsu":
+        return _otsu_threshold(hist)
+    if method == "triangle":
+        return _triangle_threshold(hist)
+    raise ValueError(f"不是自动阈值方法: {method}")
+
+
+def _otsu_threshold(hist):
+    # 与 OpenCV 的 getThreshVal_Otsu_8u 相同
+    scale = 1.0 / max(1, sum(hist))
+    mu = sum(i * count for i, count in enumerate(hist)) * scale
+    mu1 = q1 = 0.0
+    max_sigma = 0.0
+    threshold = 0
+    epsilon = float(np.finfo(np.float32).eps)
+    for i, count in enumerate(hist):
+        p_i = count * scale
+        mu1 *= q1
+        q1 += p_i
+        q2 = 1.0 - q1
+        if min(q1, q2) < epsilon or max(q1, q2) > 1.0 - epsilon:
+            continue
+        mu1 = (mu1 + i * p_i) / q1
+        mu2 = (mu - q1 * mu1) / q2
+        sigma = q1 * q2 * (mu1 - mu2) * (mu1 - mu2)
+        if sigma > max_sigma:
+            max_sigma = sigma
+            threshold = i
+    return threshold
+
+
+def _triangle_threshold(hist):
+    # 与 OpenCV 的 getThreshVal_Triangle_8u 相同
+    n = len(hist)
+    nonzero = [i for i, count in enumerate(hist) if count > 0]
+    left = nonzero[0] if nonzero else 0
+    right = nonzero[-1] if nonzero and nonzero[-1] > 0 else 0
+    left = left - 1 if left > 0 else left
+    right = right + 1 if right < n - 1 else right
+    peak = max(range(n), key=lambda i: (hist[i], -i))
+    flipped = peak - left < right - peak
+    if flipped:
+        hist = hist[::-1]
+        left = n - 1 - right
+        peak = n - 1 - peak
+    threshold = left
+    a, b = hist[peak], left - peak
+    dist = 0
+    for i in range(left + 1, peak + 1):
+        d = a * i + b * hist[i]
+        if d > dist:
+            dist = d
+            threshold = i
+    threshold -= 1
+    return n - 1 - threshold if flipped else threshold
+
+
+def apply(gray_image, method=DEFAULT_METHOD, threshold_value=128, block_size=DEFAULT_BLOCK_SIZE, k=None,
+          out=None, threads=1):
+    """按 method 做阈值处理，返回二值图
+
+    out 为预先分配的同尺寸 uint8 数组时结果写入其中。全局方法可以传入 gray_image 本身原地处理；
+    局部方法需要读取邻近像素，out 与输入重叠时改为另外分配。
+    threads > 1 且页面较大时，局部方法的各行块在线程池中并行处理（OpenCV 和 numpy 计算时释放 GIL）。
+    """
+    if method == DEFAULT_METHOD:
+        _, binary = cv2.threshold(gray_image, threshold_value, 255, cv2.THRESH_BINARY, dst=out)
+        return binary
+    if method in AUTO_METHODS:
+        _, binary = cv2.threshold(gray_image, 0, 255, cv2.THRESH_BINARY | _AUTO_FLAGS[method], dst=out)
+        return binary
+    if method not in LOCAL_METHODS:
+        raise ValueError(f"不支持的阈值方法: {method}")
+
+    block_size = valid_block_size(block_size)
+    if k is None:
+        k = default_k(method)
+    if out is None or np.shares_memory(out, gray_image):
+        out = np.empty_like(gray_image)
+
+    height = gray_image.shape[0]
+    strips = [(top, min(top + TILE_ROWS, height)) for top in range(0, height, TILE_ROWS)]
+    if threads > 1 and len(strips) > 1 and gray_image.size >= PARALLEL_MIN_PIXELS:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda strip: _local_strip(gray_image, out, strip, method, block_size, k), strips))
+    else:
+        for strip in strips:
+            _local_strip(gray_image, out, strip, method, block_size, k)
+    return out
+
+
+def _local_strip(gray_image, out, strip, method, block_size, k):
+    """处理 [top, bottom) 行，读取上下各半个窗口的重叠行，结果写入 out 的对应行"""
+    top, bottom = strip
+    half = block_size // 2
+    src_top = max(0, top - half)
+    src_bottom = min(gray_image.shape[0], bottom + half)
+    source = gray_image[src_top:src_bottom]
+    rows = slice(top - src_top, bottom - src_top)
+
+    if method in ("adaptive-mean", "adaptive-gaussian"):
+        adaptive = cv2.ADAPTIVE_THRESH_MEAN_C if method == "adaptive-mean" else cv2.ADAPTIVE_THRESH_GAUSSIAN_C
+        binary = cv2.adaptiveThreshold(source, 255, adaptive, cv2.THRESH_BINARY, block_size, k)
+        out[top:bottom] = binary[rows]
+        return
+
+    mean, std = _local_mean_std(source, rows, half)
+    if method == "sauvola":
+        threshold = mean * (1.0 + k * (std / SAUVOLA_R - 1.0))
+    else:
+        threshold = mean + k * std
+    np.multiply(source[rows] > threshold, 255, out=out[top:bottom], casting="unsafe")
+
+
+def _local_mean_std(source, rows, half):
+    """用积分图求 rows 中每个像素周围窗口（在图像边缘处截断）的均值和标准差
+
+    积分图四周按边缘值扩展 half 格后，越界的窗口边界自动落在图像边界上，
+    四个角的取值都是连续切片，不需要逐像素索引。
+    """
+    integral, sq_integral = cv2.integral2(source, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+    height, width = source.shape[:2]
+    size = 2 * half + 1
+    count = rows.stop - rows.start
+    ys = np.arange(rows.start, rows.stop)
+    xs = np.arange(width)
+    row_area = np.clip(ys + half + 1, 0, height) - np.clip(ys - half, 0, height)
+    col_area = np.clip(xs + half + 1, 0, width) - np.clip(xs - half, 0, width)
+    area = np.outer(row_area, col_area).astype(np.float64)
+
+    def window_sum(table):
+        # 扩展后像素 (y, x) 的窗口四角为 (y, x) 和 (y + size, x + size)
+        table = np.pad(table, half, mode="edge")
+        top, bottom = table[rows.start:rows.start + count], table[rows.start + size:rows.start + size + count]
+        return bottom[:, size:size + width] - top[:, size:size + width] - bottom[:, :width] + top[:, :width]
+
+    mean = window_sum(integral) / area
+    variance = window_sum(sq_integral) / area - mean * mean
+    return mean, np.sqrt(np.maximum(variance, 0.0))
+
+
+def apply_strips(read_strips, method=DEFAULT_METHOD, threshold_value=128, block_size=DEFAULT_BLOCK_SIZE, k=None,
+                 threads=1):
+    """逐条带做阈值处理，按行依次产出 (上边界, 二值条带)，结果与整页调用 apply 相同
+
+    read_strips() 返回按行依次产出 (上边界, 灰度条带) 的新迭代器。自动方法先读一遍统计整页的直方图，
+    再读第二遍处理；局部方法处理每个条带时带上相邻条带的半个窗口的行，所以除最后一条外每条不应少于半个窗口的行数。
+    """
+    if method in AUTO_METHODS:
+        histogram = np.zeros(256, np.int64)
+        for _, strip in read_strips():
+            histogram += np.bincount(strip.ravel(), minlength=256)
+        method, threshold_value = DEFAULT_METHOD, histogram_threshold(histogram, method)
+    if not is_local(method):
+        for top, strip in read_strips():
+            yield top, apply(strip, method, threshold_value)
+        return
+
+    half = valid_block_size(block_size) // 2
+
+    def window(top, strip, above, below):
+        parts = [part for part in (above, strip, below) if part is not None]
+        binary = apply(np.concatenate(parts) if len(parts) > 1 else strip, method, threshold_value, block_size, k,
+                       threads=threads)
+        start = 0 if above is None else above.shape[0]
+        return top, binary[start:start + strip.shape[0]]
+
+    previous = above = None
+    for top, strip in read_strips():
+        if previous is not None:
+            yield window(*previous, above, strip[:half])
+            above = previous[1][-half:]
+        previous = (top, strip)
+    if previous is not None:
+        yield window(*previous, above, None)
@@ -0,0 +1,232 @@
+"""输入目录监视（只依赖标准库，不依赖 tkinter）
+
+Linux 上用 inotify（通过 ctypes 调用 libc）递归监视目录，其他系统、inotify 不可用（如监视数量达到
+fs.inotify.max_user_watches 上限）或指定轮询时，每隔 POLL_INTERVAL 秒扫描一遍目录，比较文件大小和修改时间。
+挂载的网络共享（CIFS/NFS）收不到其他机器写入的 inotify 事件，需要使用轮询。
+筛选规则与 discovery.iter_input_files 相同（扩展名、隐藏文件、include/exclude）。
+
+扫描仪和复制程序是边写边落盘的，Debouncer 等文件大小和修改时间连续 SETTLE_SECONDS 秒不变、
+并且能打开读取（Windows 上正在复制的文件被锁定）后，才把文件交给处理。
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+import discovery
+from defaults import POLL_INTERVAL, SETTLE_SECONDS
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")  # struct inotify_event: wd, mask, cookie, len，之后是 len 字节的文件名
+READ_SIZE = 64 * 1024
+
+
+class PollingWatcher:
+    """轮询：每隔 interval 秒扫描一遍目录，报告新出现或大小、修改时间变化的文件"""
+
+    mode = "polling"
+
+    def __init__(self, root, include=None, exclude=None, recursive=True, interval=POLL_INTERVAL):
+        self.root = root
+        self.include = include
+        self.exclude = exclude
+        self.recursive = recursive
+        self.interval = interval
+        self._seen = {}  # 路径 -> (大小, 修改时间)
+        self._next_scan = 0.0
+
+    def poll(self, timeout=0.0):
+        """等待最多 timeout 秒，返回有变化的文件路径列表（第一次调用返回目录中已有的全部文件）"""
+        delay = self._next_scan - time.monotonic()
+        if delay > 0:
+            if delay > timeout:
+                time.sleep(timeout)
+                return []
+            time.sleep(delay)
+        self._next_scan = time.monotonic() + self.interval
+        changed = []
+        seen = {}
+        for path in discovery.iter_input_files(self.root, self.include, self.exclude, self.recursive):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            seen[path] = (st.st_size, st.st_mtime_ns)
+            if self._seen.get(path) != seen[path]:
+                changed.append(path)
+        self._seen = seen
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify：监视 root 和其中会被扫描的子目录，新建的子目录自动加入监视"""
+
+    mode = "inotify"
+
+    def __init__(self, root, include=None, exclude=None, recursive=True):
+        self.root = root
+        self.include = include
+        self.exclude = exclude
+        self.recursive = recursive
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._dirs = {}  # 监视描述符 -> 目录
+        try:
+            self._initial = self._add_tree(root)  # 第一次 poll 返回目录中已有的文件
+        except OSError:
+            self.close()
+            raise
+
+    def _add_dir(self, path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            if code == errno.ENOSPC:  # 达到 max_user_watches 上限，改用轮询
+                raise OSError(code, "inotify 监视数量达到上限（fs.inotify.max_user_watches）")
+            return  # 目录已被删除或没有权限
+        self._dirs[wd] = path
+
+    def _add_tree(self, path):
+        """监视 path 及其中会被扫描的子目录，返回其中已有的文件
+
+        先加监视再列出文件，两者之间新建的文件不会漏掉（可能同时出现在事件中，由 Debouncer 合并）。
+        已在监视中的目录再次加入时描述符不变。
+        """
+        files = []
+        for directory, subdirs, names in os.walk(path):
+            self._add_dir(directory)
+            subdirs[:] = sorted(name for name in subdirs
+                                if discovery.accepts_dir(self.root, os.path.join(directory, name),
+                                                         self.exclude, self.recursive))
+            files.extend(file_path for file_path in (os.path.join(directory, name) for name in sorted(names))
+                         if self._accepts(file_path))
+        return files
+
+    def _accepts(self, path):
+        return discovery.accepts_file(self.root, path, self.include, self.exclude, self.recursive)
+
+    def poll(self, timeout=0.0):
+        """等待最多 timeout 秒，返回有变化的文件路径列表（第一次调用返回目录中已有的全部文件）"""
+        if self._initial is not None:
+            changed, self._initial = self._initial, None
+            return changed
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return []
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            data += chunk
+        changed = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                # 事件丢失：重新扫描整个目录（已处理过的文件由任务清单跳过）
+                return self._add_tree(self.root)
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and discovery.accepts_dir(self.root, path, self.exclude,
+                                                                             self.recursive):
+                    changed.extend(self._add_tree(path))
+            elif self._accepts(path):
+                changed.append(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def open_watcher(root, include=None, exclude=None, recursive=True, polling=False, interval=POLL_INTERVAL):
+    """Linux 上优先使用 inotify，不可用或 polling 时使用轮询"""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, include, exclude, recursive)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, include, exclude, recursive, interval)
+
+
+def _readable(path):
+    try:
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+class Debouncer:
+    """等待文件写入完成：大小和修改时间连续 settle 秒不变、大小不为0并且能打开读取"""
+
+    def __init__(self, settle=SETTLE_SECONDS):
+        self.settle = settle
+        self._pending = {}  # 路径 -> [大小, 修改时间, 最近一次变化的时刻, 首次发现的时刻]
+
+    def __len__(self):
+        return len(self._pending)
+
+    def touch(self, path, now=None):
+        """文件有变化（或刚发现）：从现在起重新计时"""
+        now = time.monotonic() if now is None else now
+        entry = self._pending.get(path)
+        if entry is None:
+            self._pending[path] = [None, None, now, now]
+        else:
+            entry[2] = now
+
+    def ready(self, now=None, busy=()):
+        """返回已经稳定的 [(路径, 首次发现的时刻)]，并不再跟踪它们；busy 中的路径（正在处理）继续等待
+
+        已被删除的文件不再跟踪。
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        for path, entry in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._pending[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (entry[0], entry[1]):
+                entry[0], entry[1], entry[2] = st.st_size, st.st_mtime_ns, now
+                continue
+            if now - entry[2] < self.settle or not st.st_size or path in busy or not _readable(path):
+                continue
+            del self._pending[path]
+            ready.append((path, entry[3]))
+        return ready